@@ -103,7 +103,46 @@ use shyloc_utils.amba.all;
 use shyloc_utils.shyloc_functions.all;
 
 --! ccsds_shyloc_tb entity Takes care of setting off configuration values, provide input samples and control signals received from the the IP core.
+--! The values that change between tests with the same generic configuration are also generics, with the
+--! values of ccsds123_tb_parameters as default (expanded names: a generic hides the package constant
+--! of the same name in its own declaration), so that several tests can be run on a single optimized
+--! design by overriding them when loading it (vsim -g).
 entity ccsds_shyloc_tb is
+  generic (
+    stim_file: string := work.ccsds123_tb_parameters.stim_file;  --! Raw image to compress.
+    ref_file: string := work.ccsds123_tb_parameters.ref_file;  --! Reference compressed image.
+    out_file: string := work.ccsds123_tb_parameters.out_file;  --! Output file with the compressed image.
+    test_id: integer := work.ccsds123_tb_parameters.test_id;  --! Indicates the test number (some tests have specific stimuli).
+    test_identifier: string := work.ccsds123_tb_parameters.test_identifier;  --! Indicates the test identifier.
+    clk_ip: time := work.ccsds123_tb_parameters.clk_ip;  --! IP core clock half period.
+    Nx_tb: integer := work.ccsds123_tb_parameters.Nx_tb;  --! Number of columns.
+    Ny_tb: integer := work.ccsds123_tb_parameters.Ny_tb;  --! Number of rows.
+    Nz_tb: integer := work.ccsds123_tb_parameters.Nz_tb;  --! Number of bands.
+    DISABLE_HEADER_tb: integer := work.ccsds123_tb_parameters.DISABLE_HEADER_tb;  --! Selects whether to disable (1) or not (0) the header generation.
+    ENCODER_SELECTION_tb: integer := work.ccsds123_tb_parameters.ENCODER_SELECTION_tb;  --! (0) Disables encoding; (1) Selects sample-adaptive coder; (2) Selects external encoder (block-adaptive).
+    D_tb: integer := work.ccsds123_tb_parameters.D_tb;  --! Dynamic range of the input samples.
+    IS_SIGNED_tb: integer := work.ccsds123_tb_parameters.IS_SIGNED_tb;  --! (0) Unsigned samples; (1) Signed samples.
+    ENDIANESS_tb: integer := work.ccsds123_tb_parameters.ENDIANESS_tb;  --! (0) Little-Endian; (1) Big-Endian.
+    BYPASS_tb: integer := work.ccsds123_tb_parameters.BYPASS_tb;  --! (0) Compression; (1) Bypass Compression.
+    P_tb: integer := work.ccsds123_tb_parameters.P_tb;  --! Number of bands used for prediction.
+    PREDICTION_tb: integer := work.ccsds123_tb_parameters.PREDICTION_tb;  --! Full (0) or reduced (1) mode.
+    LOCAL_SUM_tb: integer := work.ccsds123_tb_parameters.LOCAL_SUM_tb;  --! Neighbour (0) or column (1) oriented local sum.
+    OMEGA_tb: integer := work.ccsds123_tb_parameters.OMEGA_tb;  --! Weight component resolution.
+    R_tb: integer := work.ccsds123_tb_parameters.R_tb;  --! Register size.
+    VMAX_tb: integer := work.ccsds123_tb_parameters.VMAX_tb;  --! Factor for weight update.
+    VMIN_tb: integer := work.ccsds123_tb_parameters.VMIN_tb;  --! Factor for weight update.
+    TINC_tb: integer := work.ccsds123_tb_parameters.TINC_tb;  --! Weight update factor change interval.
+    WEIGHT_INIT_tb: integer := work.ccsds123_tb_parameters.WEIGHT_INIT_tb;  --! Weight initialization mode.
+    INIT_COUNT_E_tb: integer := work.ccsds123_tb_parameters.INIT_COUNT_E_tb;  --! Initial count exponent.
+    ACC_INIT_TYPE_tb: integer := work.ccsds123_tb_parameters.ACC_INIT_TYPE_tb;  --! Accumulator initialization type.
+    ACC_INIT_CONST_tb: integer := work.ccsds123_tb_parameters.ACC_INIT_CONST_tb;  --! Accumulator initialization constant.
+    RESC_COUNT_SIZE_tb: integer := work.ccsds123_tb_parameters.RESC_COUNT_SIZE_tb;  --! Rescaling counter size.
+    U_MAX_tb: integer := work.ccsds123_tb_parameters.U_MAX_tb;  --! Unary length limit.
+    W_BUFFER_tb: integer := work.ccsds123_tb_parameters.W_BUFFER_tb;  --! Bit width of the output buffer.
+    Q_tb: integer := work.ccsds123_tb_parameters.Q_tb;  --! Weight initialization resolution.
+    WR_tb: integer := work.ccsds123_tb_parameters.WR_tb;  --! Weight Reset.
+    CWI_tb: integer := work.ccsds123_tb_parameters.CWI_tb  --! Custom Weight Initialization mode.
+  );
 end ccsds_shyloc_tb;
 
 --! @brief Architecture of ccsds_shyloc_tb 
@@ -442,9 +481,9 @@ begin
             end if;
   --          sim_successful <= false;
             if (work.ccsds123_tb_parameters.EN_RUNCFG_G = 1) then
-                size := work.ccsds123_tb_parameters.W_BUFFER_tb;
+                size := W_BUFFER_tb;
             else
-                size := work.ccsds123_tb_parameters.W_BUFFER_tb;
+                size := W_BUFFER_tb;
             end if;
             for i in 0 to (size/8) -1 loop
                       probe:= DataOut((((size/8) -1-i)+1)*8-1 downto ((size/8) -1-i)*8);
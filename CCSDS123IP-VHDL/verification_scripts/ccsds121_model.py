@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Golden model of the CCSDS-121 block-adaptive encoder (CCSDS 121.0-B-2) used by ccsds123_model.py
+# for the rows with ENCODER_SELECTION = 2, where the mapped residuals of the CCSDS-123 predictor are
+# encoded by the CCSDS-121 IP core (configured by J, CODESET, REF_SAMPLE and W_BUFFER of the 121
+# columns of the *.csv file).
+#
+# The residuals are coded in blocks of J samples (the last block is completed with zeros) with the
+# option giving the shortest block: second extension, fundamental sequence and split-sample (k = 1 to
+# the maximum for the dynamic range, the lowest k on ties) or no compression (also chosen on ties).
+# Consecutive all-zeros blocks of the same segment (64 blocks) are coded together by the zero-block
+# option, with the remainder-of-segment codeword when 5 or more blocks reach the end of the segment or
+# of the image.
+# Whole arrays of blocks are coded at once with NumPy.
+#
+# Reference samples: the block encoder inserts a reference sample every REF_SAMPLE blocks only when it
+# predicts the samples itself (unit delay predictor). The residuals of the CCSDS-123 predictor are
+# coded without reference samples, so encode_blocks() only inserts them when it is given the
+# reference flags of the blocks. A reference sample is written after the option identifier and
+# replaces the first sample of the block (or the first pair of the second extension), also when the
+# block starts a run of zero blocks: such a block always starts a new run (behaviour of v2.3).
+#
+# Module usage (see ccsds123_model.py):
+#   ccsds121_model.encode(params, rows, bit_writer)
+
+import numpy as np
+
+SEGMENT_BLOCKS = 64
+
+def header(params):
+  # Block-adaptive entropy coder metadata appended to the CCSDS-123 header: block size, restricted code
+  # options flag and reference sample interval
+  if params.DISABLE_HEADER == 1:
+    return bytearray()
+  restricted = 1 if (params.CODESET == 1 and params.D <= 4) else 0
+  block_size = {8: 0, 16: 1, 32: 2, 64: 3}[params.J]
+  value = (block_size << 13) | (restricted << 12) | (params.REF_SAMPLE % 4096)
+  return bytearray([value >> 8, value & 255])
+
+class BlockAdaptiveEncoder(object):
+  def __init__(self, n, J, codeset=0):
+    self.n = n
+    self.J = J
+    if codeset == 1 and n <= 4:
+      self.id_bits = 2
+      self.k_max = 0 if n <= 2 else 1
+    elif n <= 8:
+      self.id_bits = 3
+      self.k_max = 5
+    elif n <= 16:
+      self.id_bits = 4
+      self.k_max = 13
+    else:
+      self.id_bits = 5
+      self.k_max = 29
+    # Samples of incomplete blocks and trailing zero blocks not coded yet, and number of blocks coded
+    self.pending = np.zeros(0, dtype=np.int64)
+    self.blocks = 0
+
+  def encode(self, samples, output, last=False):
+    # Codes the given mapped residuals (in order) into the BitWriter output. The samples of an
+    # incomplete block are kept until the next call; with last, they are completed with zeros
+    samples = np.concatenate([self.pending, np.asarray(samples, dtype=np.int64).ravel()])
+    count = len(samples) // self.J
+    if last and len(samples) % self.J:
+      samples = np.concatenate([samples, np.zeros(self.J - len(samples) % self.J, dtype=np.int64)])
+      count += 1
+    blocks = samples[:count * self.J].reshape(count, self.J)
+    self.pending = samples[count * self.J:]
+    if not last and count:
+      # Trailing zero blocks that do not reach the end of their segment may continue in the next call
+      zero = ~blocks.any(axis=1)
+      index = self.blocks + np.arange(count)
+      if zero[-1] and index[-1] % SEGMENT_BLOCKS != SEGMENT_BLOCKS - 1:
+        first = count - 1
+        while first > 0 and zero[first - 1] and index[first - 1] // SEGMENT_BLOCKS == index[-1] // SEGMENT_BLOCKS:
+          first -= 1
+        self.pending = np.concatenate([blocks[first:].ravel(), self.pending])
+        blocks = blocks[:first]
+    if len(blocks):
+      values, lengths = self.encode_blocks(blocks, self.blocks, last and not len(self.pending))
+      output.write(values, lengths)
+      self.blocks += len(blocks)
+
+  def encode_blocks(self, blocks, first_index, image_end, reference=None):
+    # Codewords (values, lengths) of complete blocks; first_index is the number of blocks before them
+    # and image_end tells if the last block is the last one of the image. reference flags the blocks
+    # whose first sample is a reference sample
+    J = self.J
+    count = len(blocks)
+    if reference is None:
+      reference = np.zeros(count, dtype=bool)
+    coded = np.where(reference[:, None] & (np.arange(J) == 0), 0, blocks)
+    index = first_index + np.arange(count)
+    segment = index // SEGMENT_BLOCKS
+    # Length of every option (without the reference sample): second extension, k = 0..k_max, no compression
+    pair_sum = coded[:, 0::2] + coded[:, 1::2]
+    gamma = (pair_sum * (pair_sum + 1)) // 2 + coded[:, 1::2]
+    options = [gamma.sum(axis=1) + J // 2 + 1]
+    for k in range(self.k_max + 1):
+      options.append((coded >> k).sum(axis=1) + J * (k + 1) - np.where(reference, k + 1, 0))
+    options = np.array(options)
+    option = np.argmin(options, axis=0)
+    # No compression is also chosen when it is as short as the best option
+    nc_option = self.k_max + 2
+    option[np.where(reference, (J - 1) * self.n, J * self.n) <= options.min(axis=0)] = nc_option
+    # Zero blocks and runs of zero blocks of the same segment; a block with a reference sample starts
+    # a new run
+    zero = ~coded.any(axis=1)
+    previous_zero = np.concatenate([[False], zero[:-1]])
+    previous_segment = np.concatenate([[-1], segment[:-1]])
+    run_start = zero & (~previous_zero | (segment != previous_segment) | reference)
+    run_id = np.cumsum(run_start) - 1
+    run_length = np.bincount(run_id[zero], minlength=int(run_id[-1]) + 1 if count else 0)
+    run_end = np.zeros(len(run_length), dtype=np.int64)
+    run_end[run_id[zero]] = index[zero]
+    ends_segment = (run_end % SEGMENT_BLOCKS == SEGMENT_BLOCKS - 1)
+    if image_end and len(run_end):
+      ends_segment[-1] |= run_end[-1] == index[-1]
+    # Fields of every block: identifier, reference sample, J codes and J split bits
+    width = 2 * J + 2
+    values = np.zeros((count, width), dtype=np.int64)
+    lengths = np.zeros((count, width), dtype=np.int64)
+    # Identifiers: k + 1 for split-sample, all ones for no compression, zeros and '1' for second extension
+    values[:, 0] = np.where(option == nc_option, (1 << self.id_bits) - 1, option)
+    lengths[:, 0] = self.id_bits
+    extension = option == 0
+    values[extension, 0] = 1
+    lengths[extension, 0] = self.id_bits + 1
+    values[:, 1] = blocks[:, 0]
+    lengths[:, 1] = np.where(reference, self.n, 0)
+    # Split-sample (and fundamental sequence)
+    k = option - 1
+    split = (option >= 1) & (option < nc_option)
+    k_split = k[split][:, None]
+    values[split, 2:J + 2] = 1
+    lengths[split, 2:J + 2] = (coded[split] >> k_split) + 1
+    values[split, J + 2:] = coded[split] & ((1 << k_split) - 1)
+    lengths[split, J + 2:] = k_split
+    # Second extension
+    values[extension, 2:J // 2 + 2] = 1
+    lengths[extension, 2:J // 2 + 2] = gamma[extension] + 1
+    # No compression
+    no_compression = option == nc_option
+    values[no_compression, 2:J + 2] = coded[no_compression]
+    lengths[no_compression, 2:J + 2] = self.n
+    # The reference sample is not coded again
+    skip = reference & ~extension
+    lengths[skip, 2] = 0
+    lengths[skip, J + 2] = 0
+    # Zero blocks: only the first block of a run is written, with the number of blocks of the run
+    values[zero] = 0
+    lengths[zero] = 0
+    starts = np.nonzero(run_start)[0]
+    run = run_id[starts]
+    blocks_in_run = run_length[run]
+    values[starts, 0] = 0
+    lengths[starts, 0] = self.id_bits + 1
+    values[starts, 1] = blocks[starts, 0]
+    lengths[starts, 1] = np.where(reference[starts], self.n, 0)
+    ros = (blocks_in_run >= 5) & ends_segment[run]
+    values[starts, 2] = 1
+    lengths[starts, 2] = np.where(ros, 5, np.where(blocks_in_run <= 4, blocks_in_run, blocks_in_run + 1))
+    return values.ravel(), lengths.ravel()
+
+def encode(params, rows, output):
+  # Codes the rows of mapped residuals given by ccsds123_model.Predictor.rows() (arrays indexed [z, x])
+  # into the BitWriter output, in the sample order of the image
+  output.write_bytes(header(params))
+  encoder = BlockAdaptiveEncoder(params.D, params.J, params.CODESET)
+  order = params.order()
+  if order == 'bsq':
+    dtype = np.uint16 if params.D <= 16 else np.uint32
+    image = np.empty((params.Nz, params.Ny, params.Nx), dtype=dtype)
+  for y, mapped in enumerate(rows):
+    if order == 'bip':
+      encoder.encode(mapped.T, output)
+    elif order == 'bil':
+      encoder.encode(mapped, output)
+    else:
+      image[:, y, :] = mapped
+  if order == 'bsq':
+    for z in range(params.Nz):
+      encoder.encode(image[z], output)
+  encoder.encode([], output, last=True)
@@ -0,0 +1,461 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Some command line examples:
+# ccsds123_model.py testcases_123_e_all.csv ../images/raw ../images/generated
+# ccsds123_model.py testcases_123_e_all.csv ../images/raw ../images/generated -t 20_test -t 24_test
+# ccsds123_model.py testcases_123_e_all.csv ../images/raw ../images/generated -c ../images/reference
+
+#How to run this script
+#  ccsds123_model.py
+#(1) *.csv file with the test cases (same format as the one given to run_vhdl_tests_123.py)
+#(2) path to the raw images folder
+#(3) path to the folder where the reference compressed images are written (file name from the
+#    "output" column)
+#-t, --test  process only the given test (can be repeated)
+#-c, --compare  compare the generated images with the ones of the given folder instead of writing them
+#
+# Golden model of the CCSDS-123 IP core (CCSDS 123.0-B-1): predictor (local sums, local differences,
+# weight update), residual mapper and sample-adaptive encoder, with the header written by
+# header123_gen.vhd. The configuration is taken from a row of the test cases *.csv file, from the
+# generic columns when EN_RUNCFG = 0 and from the run-time configuration columns when EN_RUNCFG = 1.
+# The output is the byte stream written by the testbench: header and codewords packed MSB first and
+# padded with zeros up to a multiple of W_BUFFER bits. When ENCODER_SELECTION = 0 (no encoder) the
+# mapped residuals are written instead, as 16-bit words, and when ENCODER_SELECTION = 2 they are
+# encoded with the CCSDS-121 block-adaptive encoder of ccsds121_model.py.
+#
+# The image is processed one row (y) at a time: local sums and differences, residual mapping and
+# codeword generation are computed with NumPy for all the bands and columns of the row. Only the weight
+# and accumulator updates, which depend on the previous sample of the same band, loop over the columns
+# of the row (vectorised across the bands). The image file is memory mapped, so large images do not
+# have to fit in memory.
+#
+# Module usage:
+#   import ccsds123_model
+#   data = ccsds123_model.compress_row(row, raw_folder)
+
+from __future__ import print_function
+import sys, os, csv, argparse
+import numpy as np
+
+# CCSDS-121 configuration values, used when ENCODER_SELECTION = 2 (see ccsds121_model.py)
+BLOCK_CONFIG_COLUMNS = [('J', 67, 71), ('CODESET', 68, 72), ('REF_SAMPLE', 69, 73), ('W_BUFFER_121', 70, 74)]
+
+# Values of PREDICTION_TYPE (column "PREDICTION_TYPE" of the *.csv file)
+PREDICTION_TYPES = {'bip': 0, 'bip-mem': 1, 'bsq': 2, 'bil': 3, 'bil-mem': 4}
+
+# Configuration values: (name, column when EN_RUNCFG = 0, column when EN_RUNCFG = 1)
+CONFIG_COLUMNS = [('DISABLE_HEADER', 16, 34), ('ENCODER_SELECTION', 61, 35), ('W_BUFFER', 17, 53), ('P', 18, 37),
+                  ('PREDICTION', 19, 38), ('LOCAL_SUM', 20, 39), ('OMEGA', 21, 40), ('R', 22, 41), ('VMAX', 23, 42),
+                  ('VMIN', 24, 43), ('TINC', 25, 44), ('INIT_COUNT_E', 28, 47), ('ACC_INIT_TYPE', 29, 48),
+                  ('ACC_INIT_CONST', 30, 49), ('RESC_COUNT_SIZE', 31, 50), ('U_MAX', 32, 51)]
+
+class Parameters(object):
+  # Configuration of a test, from a row of the test cases *.csv file
+  def __init__(self, row):
+    self.test_id = row[0]
+    self.raw_file = row[2]
+    self.output_file = row[62]
+    self.Ny = int(row[3])
+    self.Nx = int(row[4])
+    self.Nz = int(row[5])
+    self.D = int(row[6])
+    self.IS_SIGNED = 0 if row[7] == 'uint' else 1
+    self.ENDIANESS = 0 if row[8] == 'le' else 1
+    self.PREDICTION_TYPE = PREDICTION_TYPES[row[9]]
+    self.EN_RUNCFG = int(row[11])
+    self.BYPASS = int(row[36]) if self.EN_RUNCFG == 1 else 0
+    for name, generic_column, runtime_column in CONFIG_COLUMNS:
+      setattr(self, name, int(row[runtime_column if self.EN_RUNCFG == 1 else generic_column]))
+    if self.ENCODER_SELECTION == 2:
+      for name, generic_column, runtime_column in BLOCK_CONFIG_COLUMNS:
+        setattr(self, name, int(row[runtime_column if self.EN_RUNCFG == 1 else generic_column]))
+    if self.IS_SIGNED:
+      self.s_min = -(1 << (self.D - 1))
+      self.s_max = (1 << (self.D - 1)) - 1
+      self.s_mid = 0
+    else:
+      self.s_min = 0
+      self.s_max = (1 << self.D) - 1
+      self.s_mid = 1 << (self.D - 1)
+
+  def order(self):
+    # Sample order of the input image and of the compressed image
+    return ['bip', 'bip', 'bsq', 'bil', 'bil'][self.PREDICTION_TYPE]
+
+def read_image(path, params):
+  # Image samples as an array indexed [z, y, x] (a view of the memory mapped file, in file order)
+  if params.D <= 8:
+    dtype = np.dtype('u1')
+  else:
+    dtype = np.dtype('<u2' if params.ENDIANESS == 0 else '>u2')
+  count = params.Nx * params.Ny * params.Nz
+  data = np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+  order = params.order()
+  if order == 'bip':
+    return data.reshape(params.Ny, params.Nx, params.Nz).transpose(2, 0, 1)
+  elif order == 'bil':
+    return data.reshape(params.Ny, params.Nz, params.Nx).transpose(1, 0, 2)
+  return data.reshape(params.Nz, params.Ny, params.Nx)
+
+def sample_values(raw, params):
+  # Raw samples (D least significant bits of every sample of the file) to signed integers
+  values = raw.astype(np.int64) & ((1 << params.D) - 1)
+  if params.IS_SIGNED:
+    values = np.where(values >= (1 << (params.D - 1)), values - (1 << params.D), values)
+  return values
+
+def header(params):
+  # Header of the compressed image, as written by header123_gen.vhd
+  if params.DISABLE_HEADER == 1:
+    return bytearray()
+  data = bytearray(17)
+  data[1:3] = bytearray([(params.Nx >> 8) & 255, params.Nx & 255])
+  data[3:5] = bytearray([(params.Ny >> 8) & 255, params.Ny & 255])
+  data[5:7] = bytearray([(params.Nz >> 8) & 255, params.Nz & 255])
+  data[7] = (params.IS_SIGNED << 7) | ((params.D % 16) << 1) | (1 if params.PREDICTION_TYPE == 2 else 0)
+  if params.PREDICTION_TYPE in [0, 1]:
+    m = params.Nz % (1 << 16)
+  elif params.PREDICTION_TYPE in [3, 4]:
+    m = 1
+  else:
+    m = 0
+  data[8:10] = bytearray([m >> 8, m & 255])
+  data[10] = (((params.W_BUFFER // 8) % 8) << 3) | ((1 if params.ENCODER_SELECTION == 2 else 0) << 2)
+  data[12] = ((params.P & 15) << 2) | (params.PREDICTION << 1)
+  data[13] = (params.LOCAL_SUM << 7) | (params.R % 64)
+  data[14] = (((params.OMEGA - 4) & 15) << 4) | ((params.TINC - 4) & 15)
+  data[15] = (((params.VMIN + 6) & 15) << 4) | ((params.VMAX + 6) & 15)
+  if params.ENCODER_SELECTION == 1:
+    acc_init_const = params.ACC_INIT_CONST if params.ACC_INIT_TYPE == 0 else 1
+    data += bytearray([((params.U_MAX % 32) << 3) | ((params.RESC_COUNT_SIZE - 4) & 7),
+                       ((params.INIT_COUNT_E % 8) << 5) | ((acc_init_const & 15) << 1) | params.ACC_INIT_TYPE])
+  return data
+
+class BitWriter(object):
+  # Packs codewords (value, length in bits) MSB first. Complete bytes are kept in self.chunks and the
+  # last incomplete byte in self.pending (self.pending_bits bits)
+  def __init__(self):
+    self.chunks = []
+    self.pending = 0
+    self.pending_bits = 0
+    self.bits = 0
+
+  def write(self, values, lengths):
+    # Codewords as arrays of the same size (in output order). Codewords longer than 56 bits are unary
+    # codes: only their 56 least significant bits can be set
+    values = np.asarray(values, dtype=np.uint64).ravel()
+    lengths = np.asarray(lengths, dtype=np.int64).ravel()
+    if len(lengths) and lengths.max() > 56:
+      pieces = np.maximum((lengths + 55) // 56, 1)
+      last = np.cumsum(pieces) - 1
+      split_values = np.zeros(int(last[-1]) + 1, dtype=np.uint64)
+      split_lengths = np.full(len(split_values), 56, dtype=np.int64)
+      split_values[last] = values
+      split_lengths[last] = lengths - 56 * (pieces - 1)
+      values, lengths = split_values, split_lengths
+    if self.pending_bits:
+      values = np.concatenate([np.array([self.pending], dtype=np.uint64), values])
+      lengths = np.concatenate([np.array([self.pending_bits], dtype=np.int64), lengths])
+    keep = lengths > 0
+    values = values[keep]
+    lengths = lengths[keep]
+    if len(values) == 0:
+      return
+    ends = np.cumsum(lengths)
+    total = int(ends[-1])
+    ends_word = (ends - lengths) & 63
+    ends_word += lengths
+    words = np.zeros((total + 63) // 64 + 1, dtype=np.uint64)
+    index = (ends - lengths) >> 6
+    # Part of every codeword in the 64-bit word where it starts, and part spilling into the next word
+    fits = ends_word <= 64
+    shift = np.where(fits, 64 - ends_word, ends_word - 64).astype(np.uint64)
+    first = np.where(fits, values << shift, values >> shift)
+    self._or_words(words, index, first)
+    spill = np.nonzero(~fits)[0]
+    if len(spill):
+      second = values[spill] << (128 - ends_word[spill]).astype(np.uint64)
+      self._or_words(words, index[spill] + 1, second)
+    data = words.astype('>u8').tobytes()
+    self.chunks.append(data[:total // 8])
+    self.pending_bits = total % 8
+    self.pending = (bytearray(data[total // 8:total // 8 + 1])[0] >> (8 - self.pending_bits)) if self.pending_bits else 0
+    self.bits += total - (self.bits % 8)
+
+  def _or_words(self, words, index, parts):
+    # index is sorted: OR the parts of every word together
+    starts = np.concatenate([[0], np.nonzero(np.diff(index))[0] + 1])
+    words[index[starts]] |= np.bitwise_or.reduceat(parts, starts)
+
+  def write_bytes(self, data):
+    if self.pending_bits:
+      data = np.frombuffer(bytes(data), dtype=np.uint8)
+      for i in range(0, len(data), 1 << 22):
+        self.write(data[i:i + (1 << 22)], np.full(len(data[i:i + (1 << 22)]), 8, dtype=np.int64))
+    else:
+      self.chunks.append(bytes(data))
+      self.bits += 8 * len(data)
+
+  def append(self, other):
+    # Appends the bits written in another BitWriter
+    for chunk in other.chunks:
+      self.write_bytes(chunk)
+    if other.pending_bits:
+      self.write([other.pending], [other.pending_bits])
+
+  def getvalue(self, word_bits=8):
+    # Written bits padded with zeros up to a multiple of word_bits
+    padding = (-self.bits) % word_bits
+    if padding:
+      self.write([0], [padding])
+    return b''.join(self.chunks)
+
+class Predictor(object):
+  # CCSDS 123.0-B-1 predictor and residual mapper. rows() gives the mapped residuals of the image one row
+  # (y) at a time, as an array indexed [z, x]
+  def __init__(self, params):
+    self.params = params
+    p = params
+    self.P = p.P
+    self.full = p.PREDICTION == 0
+    self.components = self.P + (3 if self.full else 0)
+    self.omega_min = -(1 << (p.OMEGA + 2))
+    self.omega_max = (1 << (p.OMEGA + 2)) - 1
+    # Default weight initialization: spectral weights 7/8*2^OMEGA, 1/8 of the previous one for the next band
+    self.weights = np.zeros((p.Nz, self.components), dtype=np.int64)
+    offset = 3 if self.full else 0
+    for z in range(p.Nz):
+      weight = (7 << p.OMEGA) >> 3
+      for i in range(min(z, self.P)):
+        self.weights[z, offset + i] = weight
+        weight = weight >> 3
+
+  def local_sums(self, current, previous, y):
+    p = self.params
+    sums = np.zeros(current.shape, dtype=np.int64)
+    if y == 0:
+      sums[:, 1:] = 4 * current[:, :-1]
+    elif p.LOCAL_SUM == 1:
+      sums[:] = 4 * previous
+    else:
+      sums[:, 1:-1] = current[:, :-2] + previous[:, :-2] + previous[:, 1:-1] + previous[:, 2:]
+      sums[:, -1] = current[:, -2] + previous[:, -2] + 2 * previous[:, -1]
+      sums[:, 0] = 2 * (previous[:, 0] + previous[:, 1])
+    return sums
+
+  def local_differences(self, current, previous, sums, y):
+    # Local difference vectors of the row, indexed [x, z, component]
+    p = self.params
+    central = 4 * current - sums
+    vectors = np.zeros((p.Nx, p.Nz, self.components), dtype=np.int64)
+    offset = 0
+    if self.full:
+      offset = 3
+      if y > 0:
+        west = np.empty(current.shape, dtype=np.int64)
+        west[:, 1:] = current[:, :-1]
+        west[:, 0] = previous[:, 0]
+        north_west = np.empty(current.shape, dtype=np.int64)
+        north_west[:, 1:] = previous[:, :-1]
+        north_west[:, 0] = previous[:, 0]
+        vectors[:, :, 0] = (4 * previous - sums).T
+        vectors[:, :, 1] = (4 * west - sums).T
+        vectors[:, :, 2] = (4 * north_west - sums).T
+    for i in range(min(self.P, p.Nz - 1)):
+      # Component i: central local difference of band z-i-1
+      vectors[:, i + 1:, offset + i] = central[:p.Nz - i - 1].T
+    return vectors
+
+  def rows(self, image):
+    p = self.params
+    previous = None
+    scaled = np.zeros((p.Nz, p.Nx), dtype=np.int64)
+    register = p.R
+    t_inc = 1 << p.TINC
+    for y in range(p.Ny):
+      current = sample_values(image[:, y, :], p)
+      sums = self.local_sums(current, previous, y)
+      vectors = self.local_differences(current, previous, sums, y)
+      high = (sums - 4 * p.s_mid) << p.OMEGA
+      for x in range(p.Nx):
+        t = y * p.Nx + x
+        if t == 0:
+          scaled[:, 0] = 2 * p.s_mid
+          if self.P > 0:
+            scaled[1:, 0] = 2 * current[:-1, 0]
+          continue
+        u = vectors[x]
+        value = np.einsum('ij,ij->i', self.weights, u) + high[:, x]
+        if register < 63:
+          value = ((value + (1 << (register - 1))) & ((1 << register) - 1)) - (1 << (register - 1))
+        predicted = np.clip((value >> (p.OMEGA + 1)) + 2 * p.s_mid + 1, 2 * p.s_min, 2 * p.s_max + 1)
+        scaled[:, x] = predicted
+        # Weight update
+        rho = min(max(p.VMIN + (t - p.Nx) // t_inc, p.VMIN), p.VMAX) + p.D - p.OMEGA
+        sign = np.where(2 * current[:, x] >= predicted, 1, -1)[:, None]
+        if rho >= 0:
+          update = (sign * u + (1 << rho)) >> (rho + 1)
+        else:
+          update = ((sign * u) << (-rho)) + 1 >> 1
+        self.weights = np.clip(self.weights + update, self.omega_min, self.omega_max)
+      yield self.map_residuals(current, scaled)
+      previous = current
+
+  def map_residuals(self, samples, scaled):
+    p = self.params
+    predicted = scaled >> 1
+    residual = samples - predicted
+    theta = np.minimum(predicted - p.s_min, p.s_max - predicted)
+    magnitude = np.abs(residual)
+    signed = np.where(scaled & 1, -residual, residual)
+    mapped = np.where((signed >= 0) & (signed <= theta), 2 * magnitude, 2 * magnitude - 1)
+    return np.where(magnitude > theta, magnitude + theta, mapped)
+
+class SampleAdaptiveEncoder(object):
+  # CCSDS 123.0-B-1 sample-adaptive entropy coder. codewords() gives the codewords of a row of mapped
+  # residuals as (values, lengths) arrays indexed [z, x]
+  def __init__(self, params):
+    self.params = params
+    p = params
+    if p.ACC_INIT_TYPE != 0:
+      raise Exception('Test ' + p.test_id + ': accumulator initialization tables are not supported by the model')
+    self.counter = 1 << p.INIT_COUNT_E
+    initial = ((3 * (1 << (p.ACC_INIT_CONST + 6)) - 49) * self.counter) >> 7
+    self.accumulator = np.full(p.Nz, initial, dtype=np.int64)
+    self.counter_max = (1 << p.RESC_COUNT_SIZE) - 1
+
+  def codewords(self, mapped, y):
+    p = self.params
+    counters = np.empty(p.Nx, dtype=np.int64)
+    accumulators = np.empty(mapped.shape, dtype=np.int64)
+    for x in range(p.Nx):
+      if y == 0 and x == 0:
+        continue
+      counters[x] = self.counter
+      accumulators[:, x] = self.accumulator
+      if self.counter < self.counter_max:
+        self.accumulator = self.accumulator + mapped[:, x]
+        self.counter += 1
+      else:
+        self.accumulator = (self.accumulator + mapped[:, x] + 1) >> 1
+        self.counter = (self.counter + 1) >> 1
+    if y == 0:
+      counters[0] = 1
+      accumulators[:, 0] = 0
+    # k: largest k <= D-2 with counter*2^k <= accumulator + floor(49*counter/2^7), 0 if there is none
+    quotient = (accumulators + ((49 * counters) >> 7)) // counters
+    k = np.clip(np.frexp(np.maximum(quotient, 1).astype(np.float64))[1] - 1, 0, p.D - 2).astype(np.int64)
+    unary = mapped >> k
+    coded = unary < p.U_MAX
+    values = np.where(coded, (1 << k) | (mapped & ((1 << k) - 1)), mapped)
+    lengths = np.where(coded, unary + 1 + k, p.U_MAX + p.D)
+    if y == 0:
+      # First sample of every band: D bits, uncoded
+      values[:, 0] = mapped[:, 0]
+      lengths[:, 0] = p.D
+    return values, lengths
+
+def compress(params, image):
+  # Compressed image (bytes) for the given parameters and image (array indexed [z, y, x])
+  if params.BYPASS != 0:
+    raise Exception('Test ' + params.test_id + ': BYPASS is not supported by the model')
+  predictor = Predictor(params)
+  output = BitWriter()
+  output.write_bytes(header(params))
+  if params.ENCODER_SELECTION == 2:
+    # Mapped residuals encoded by the CCSDS-121 IP core
+    import ccsds121_model
+    ccsds121_model.encode(params, predictor.rows(image), output)
+    return output.getvalue(params.W_BUFFER_121)
+  encoder = SampleAdaptiveEncoder(params)
+  order = params.order()
+  if order == 'bsq':
+    bands = [BitWriter() for z in range(params.Nz)]
+  for y, mapped in enumerate(predictor.rows(image)):
+    if params.ENCODER_SELECTION == 0:
+      # Without encoder, the mapped residuals are written as 16-bit words
+      values, lengths = mapped, np.full(mapped.shape, 16, dtype=np.int64)
+    else:
+      values, lengths = encoder.codewords(mapped, y)
+    if order == 'bip':
+      output.write(values.T, lengths.T)
+    elif order == 'bil':
+      output.write(values, lengths)
+    else:
+      for z in range(params.Nz):
+        bands[z].write(values[z], lengths[z])
+  if order == 'bsq':
+    for band in bands:
+      output.append(band)
+  return output.getvalue(params.W_BUFFER)
+
+def compress_row(row, raw_folder):
+  params = Parameters(row)
+  return compress(params, read_image(os.path.join(raw_folder, params.raw_file), params))
+
+def main():
+  parser = argparse.ArgumentParser(description='Generates reference compressed images with the CCSDS-123 golden model')
+  parser.add_argument('csv_file', help='*.csv file with the test cases')
+  parser.add_argument('raw_folder', help='path to the raw images folder')
+  parser.add_argument('output_folder', help='folder where the compressed images are written')
+  parser.add_argument('-t', '--test', action='append', default=[], help='process only the given test (can be repeated)')
+  parser.add_argument('-c', '--compare', metavar='FOLDER', help='compare with the images of FOLDER instead of writing them')
+  args = parser.parse_args()
+
+  csv_handle = open(args.csv_file, 'r')
+  rows = list(csv.reader(csv_handle))
+  csv_handle.close()
+  failed = 0
+  for row in rows[1:]:
+    if len(row) < 63 or not row[9] in PREDICTION_TYPES:
+      continue
+    if args.test and not row[0] in args.test:
+      continue
+    try:
+      data = compress_row(row, args.raw_folder)
+    except Exception as e:
+      print(row[0] + ': ' + str(e))
+      failed += 1
+      continue
+    if args.compare:
+      reference_handle = open(os.path.join(args.compare, row[62]), 'rb')
+      reference = reference_handle.read()
+      reference_handle.close()
+      if reference == data:
+        print(row[0] + ': ' + row[62] + ' matches')
+      else:
+        print(row[0] + ': ' + row[62] + ' differs')
+        failed += 1
+    else:
+      if not os.path.exists(args.output_folder):
+        os.makedirs(args.output_folder)
+      output_handle = open(os.path.join(args.output_folder, row[62]), 'wb')
+      output_handle.write(data)
+      output_handle.close()
+      print(row[0] + ': ' + row[62] + ' (' + str(len(data)) + ' bytes)')
+  return 1 if failed else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Some command line examples:
+# compare_output.py ../images/compressed/comp_20.esa.vhd ../images/reference/comp_20.esa
+# compare_output.py ../images/compressed/comp_20.esa.vhd ../images/reference/comp_20.esa -c testcases_123.csv -t 20_Test -r ../images/raw
+# compare_output.py --test-folder ../modelsim/tb_stimuli/20_Test
+
+#How to run this script
+#  compare_output.py
+#(1) compressed image written by the testbench (*.esa.vhd file of images/compressed)
+#(2) reference compressed image
+#-c, --csv   *.csv file with the test cases, to locate the first difference in the image
+#-t, --test  test of the *.csv file (TestId) giving the configuration
+#-r, --raw   path to the raw images folder (default ../images/raw)
+#--test-folder  compare the output and reference files of a generated test (folder of tb_stimuli), with
+#               the configuration written there by run_vhdl_tests_123.py
+#
+# Post-simulation checker of the compressed images. Both files are memory mapped and compared in
+# chunks of CHUNK_BYTES with NumPy, so the comparison of large images does not depend on the
+# testbench. On a mismatch, the first differing bit is reported and, when the configuration of the
+# test is known, located in the compressed image: header field, or sample (x, y, z) whose codeword
+# (or CCSDS-121 block) contains it. The codeword lengths are those of the golden model of
+# ccsds123_model.py and ccsds121_model.py, computed one row at a time up to the first difference.
+#
+# StreamChecker compares the image while it is being simulated: the testbench writes its output to a
+# named pipe (out_file given as a generic), which the checker reads, compares with the reference as it
+# arrives and copies to the output file of the test. At the first mismatch the simulation is stopped
+# (see sim_runner.py --early-abort), so a failing test does not have to compress the whole image.
+#
+# Module usage (see sim_runner.py):
+#   import compare_output
+#   passed, report = compare_output.check_test(test_folder, output_file)
+
+from __future__ import print_function
+import sys, os, csv, argparse, threading
+import numpy as np
+
+CHUNK_BYTES = 1 << 24
+
+# Fields of the header written by header123_gen.vhd: (name, bits). Image and predictor metadata
+HEADER_FIELDS = [('User defined data', 8), ('X size', 16), ('Y size', 16), ('Z size', 16), ('Sample type', 1),
+                 ('Reserved', 2), ('Dynamic range', 4), ('Sample encoding order', 1), ('Sub-frame interleaving depth', 16),
+                 ('Reserved', 2), ('Output word size', 3), ('Entropy coder type', 1), ('Reserved', 10),
+                 ('Reserved', 2), ('Number of prediction bands', 4), ('Prediction mode', 1), ('Reserved', 1),
+                 ('Local sum type', 1), ('Reserved', 1), ('Register size', 6), ('Weight component resolution', 4),
+                 ('Weight update scaling exponent change interval', 4), ('Weight update scaling exponent initial parameter', 4),
+                 ('Weight update scaling exponent final parameter', 4), ('Reserved', 1), ('Weight initialization method', 1),
+                 ('Weight initialization table flag', 1), ('Weight initialization resolution', 5)]
+# Entropy coder metadata of the sample-adaptive encoder
+SAMPLE_ADAPTIVE_FIELDS = [('Unary length limit', 5), ('Rescaling counter size', 3), ('Initial count exponent', 3),
+                          ('Accumulator initialization constant', 4), ('Accumulator initialization table flag', 1)]
+# Entropy coder metadata of the block-adaptive encoder (see ccsds121_model.header)
+BLOCK_ADAPTIVE_FIELDS = [('Reserved', 1), ('Block size', 2), ('Restricted code options flag', 1),
+                         ('Reference sample interval', 12)]
+
+def open_bytes(path):
+  # Contents of the file as a read-only uint8 array (memory mapped unless it is empty)
+  if os.path.getsize(path) == 0:
+    return np.zeros(0, dtype=np.uint8)
+  return np.memmap(path, dtype=np.uint8, mode='r')
+
+def first_difference(output_file, reference_file):
+  # Offset in bits of the first difference between the files, None if they are equal. When one file
+  # is a prefix of the other, the offset is the end of the shorter one
+  output = open_bytes(output_file)
+  reference = open_bytes(reference_file)
+  size = min(len(output), len(reference))
+  for start in range(0, size, CHUNK_BYTES):
+    end = min(start + CHUNK_BYTES, size)
+    differ = np.flatnonzero(output[start:end] != reference[start:end])
+    if len(differ):
+      offset = start + int(differ[0])
+      xor = int(output[offset]) ^ int(reference[offset])
+      return 8 * offset + 8 - xor.bit_length()
+  if len(output) != len(reference):
+    return 8 * size
+  return None
+
+class StreamChecker(object):
+  # Compares the data written to the named pipe fifo with the reference file while it is written,
+  # copying it to output_file. Every time the writer opens the pipe again (a new compression) the
+  # comparison starts again from the beginning of the reference. mismatch is the offset in bits of the
+  # first difference found (None while there is none)
+  def __init__(self, fifo, output_file, reference_file):
+    self.fifo = fifo
+    self.output_file = output_file
+    self.reference = open_bytes(reference_file)
+    self.mismatch = None
+    self.finished = False
+    self.thread = None
+
+  def start(self, on_mismatch):
+    # Reads the pipe in a thread; on_mismatch() is called once, at the first difference
+    self.on_mismatch = on_mismatch
+    self.thread = threading.Thread(target=self.run)
+    self.thread.daemon = True
+    self.thread.start()
+
+  def run(self):
+    while True:
+      # Blocks until the writer opens the pipe (or stop() opens it to finish)
+      fifo_fd = os.open(self.fifo, os.O_RDONLY)
+      if self.finished:
+        os.close(fifo_fd)
+        return
+      output_handle = open(self.output_file, 'wb')
+      position = 0
+      while True:
+        chunk = os.read(fifo_fd, 1 << 20)
+        if not chunk:
+          break
+        output_handle.write(chunk)
+        if self.mismatch is None:
+          self.compare(np.frombuffer(chunk, dtype=np.uint8), position)
+        position += len(chunk)
+      output_handle.close()
+      os.close(fifo_fd)
+
+  def compare(self, data, position):
+    reference = self.reference[position:position + len(data)]
+    differ = np.flatnonzero(data[:len(reference)] != reference)
+    if len(differ):
+      offset = position + int(differ[0])
+      xor = int(data[int(differ[0])]) ^ int(reference[int(differ[0])])
+      self.mismatch = 8 * offset + 8 - xor.bit_length()
+    elif len(reference) < len(data):
+      self.mismatch = 8 * (position + len(reference))
+    if self.mismatch is not None:
+      self.on_mismatch()
+
+  def stop(self):
+    # Called when the writer has finished: unblocks the reader waiting for the pipe to be opened again
+    self.finished = True
+    while self.thread is not None and self.thread.is_alive():
+      try:
+        os.close(os.open(self.fifo, os.O_WRONLY | os.O_NONBLOCK))
+      except OSError:
+        pass
+      self.thread.join(0.1)
+
+def header_fields(params):
+  fields = []
+  if params.DISABLE_HEADER == 1:
+    return fields
+  fields += HEADER_FIELDS
+  if params.ENCODER_SELECTION == 1:
+    fields += SAMPLE_ADAPTIVE_FIELDS
+  elif params.ENCODER_SELECTION == 2:
+    fields += BLOCK_ADAPTIVE_FIELDS
+  return fields
+
+def sample_position(params, index):
+  # (x, y, z) of the sample at the given position of the sample order of the compressed image
+  Nx, Ny, Nz = params.Nx, params.Ny, params.Nz
+  order = params.order()
+  if order == 'bip':
+    return (index // Nz) % Nx, index // (Nz * Nx), index % Nz
+  elif order == 'bil':
+    return index % Nx, index // (Nx * Nz), (index // Nx) % Nz
+  return index % Nx, (index // Nx) % Ny, index // (Nx * Ny)
+
+class BlockLengths(object):
+  # Output of ccsds121_model.BlockAdaptiveEncoder that only keeps the length in bits of every block
+  def __init__(self, J):
+    self.width = 2 * J + 2
+    self.lengths = []
+
+  def write(self, values, lengths):
+    self.lengths.append(np.asarray(lengths).reshape(-1, self.width).sum(axis=1))
+
+def codeword_lengths(params, image):
+  # Yields arrays with the length of the codewords of consecutive samples of the compressed image, in
+  # its sample order. For the CCSDS-121 encoder the length of a block is given for its first sample (0
+  # for the other samples and for the blocks coded as part of a run of zero blocks)
+  import ccsds123_model
+  predictor = ccsds123_model.Predictor(params)
+  order = params.order()
+  if params.ENCODER_SELECTION == 2:
+    import ccsds121_model
+    encoder = ccsds121_model.BlockAdaptiveEncoder(params.D, params.J, params.CODESET)
+    output = BlockLengths(params.J)
+    if order == 'bsq':
+      mapped_image = np.empty((params.Nz, params.Ny, params.Nx), dtype=np.uint16 if params.D <= 16 else np.uint32)
+    for y, mapped in enumerate(predictor.rows(image)):
+      if order == 'bip':
+        encoder.encode(mapped.T, output)
+      elif order == 'bil':
+        encoder.encode(mapped, output)
+      else:
+        mapped_image[:, y, :] = mapped
+      yield block_lengths(output, params.J)
+    if order == 'bsq':
+      for z in range(params.Nz):
+        encoder.encode(mapped_image[z], output)
+        yield block_lengths(output, params.J)
+    encoder.encode([], output, last=True)
+    yield block_lengths(output, params.J)
+    return
+  encoder = ccsds123_model.SampleAdaptiveEncoder(params)
+  if order == 'bsq':
+    band_lengths = np.zeros((params.Nz, params.Ny, params.Nx), dtype=np.uint8)
+  for y, mapped in enumerate(predictor.rows(image)):
+    if params.ENCODER_SELECTION == 0:
+      lengths = np.full(mapped.shape, 16, dtype=np.int64)
+    else:
+      lengths = encoder.codewords(mapped, y)[1]
+    if order == 'bip':
+      yield lengths.T.ravel()
+    elif order == 'bil':
+      yield lengths.ravel()
+    else:
+      band_lengths[:, y, :] = lengths
+  if order == 'bsq':
+    for z in range(params.Nz):
+      yield band_lengths[z].ravel().astype(np.int64)
+
+def block_lengths(output, J):
+  # Lengths of the blocks written since the last call, given for the first sample of every block
+  if not output.lengths:
+    return np.zeros(0, dtype=np.int64)
+  blocks = np.concatenate(output.lengths)
+  output.lengths = []
+  lengths = np.zeros(len(blocks) * J, dtype=np.int64)
+  lengths[::J] = blocks
+  return lengths
+
+def locate(params, image, bit):
+  # Description of what the given bit of the compressed image belongs to: header field, sample
+  # codeword or padding. image is the raw image indexed [z, y, x] (see ccsds123_model.read_image)
+  position = 0
+  for name, width in header_fields(params):
+    if bit < position + width:
+      return 'header field "%s" (bit %d of %d)' % (name, bit - position, width)
+    position += width
+  if params.BYPASS != 0:
+    return 'compressed data (bit %d after the header)' % (bit - position)
+  index = 0
+  kind = 'block' if params.ENCODER_SELECTION == 2 else 'codeword'
+  for lengths in codeword_lengths(params, image):
+    ends = position + np.cumsum(lengths)
+    found = int(np.searchsorted(ends, bit, side='right'))
+    if found < len(lengths):
+      x, y, z = sample_position(params, index + found)
+      start = int(ends[found] - lengths[found])
+      return '%s of sample (x=%d, y=%d, z=%d) (bit %d of %d)' % (kind, x, y, z, bit - start, lengths[found])
+    if len(ends):
+      position = int(ends[-1])
+    index += len(lengths)
+  return 'padding after the last codeword (bit %d)' % (bit - position)
+
+def compare(output_file, reference_file, params=None, raw_folder=None):
+  # Returns (passed, report). With the configuration (ccsds123_model.Parameters) and the raw images
+  # folder, the first difference is located in the image
+  if not os.path.exists(output_file):
+    return False, 'Output file ' + output_file + ' not found'
+  bit = first_difference(output_file, reference_file)
+  if bit is None:
+    return True, 'Output matches the reference (' + str(os.path.getsize(reference_file)) + ' bytes)'
+  report = 'First difference at bit %d (byte %d, bit %d from the MSB)' % (bit, bit // 8, bit % 8)
+  sizes = (os.path.getsize(output_file), os.path.getsize(reference_file))
+  if sizes[0] != sizes[1]:
+    report += '; output has %d bytes, reference %d bytes' % sizes
+  if params is not None and raw_folder is not None:
+    try:
+      import ccsds123_model
+      image = ccsds123_model.read_image(os.path.join(raw_folder, params.raw_file), params)
+      report += '\n' + 'Location: ' + locate(params, image, bit)
+    except Exception as e:
+      report += '\n' + 'Location not available: ' + str(e)
+  return False, report
+
+def read_test_config(test_folder):
+  # Row of the *.csv file of a generated test (test_config.csv) as ccsds123_model.Parameters, and raw
+  # images folder
+  import ccsds123_model
+  config_handle = open(os.path.join(test_folder, 'test_config.csv'), 'r')
+  rows = list(csv.reader(config_handle))
+  config_handle.close()
+  return ccsds123_model.Parameters(rows[1]), rows[0][0]
+
+def check_test(test_folder, output_file=None):
+  # Compares the output and reference files of a generated test; returns (passed, report). The output
+  # file is the out_file of its ccsds123_tb_parameters unless another one is given (the output of the
+  # test in sim_runner.py)
+  from vhdl_deps import read_tb_parameters
+  files = dict((name, value.strip('"')) for name, value in read_tb_parameters(test_folder) if name in ['ref_file', 'out_file'])
+  if output_file is not None:
+    files['out_file'] = output_file
+  params, raw_folder = None, None
+  if os.path.exists(os.path.join(test_folder, 'test_config.csv')):
+    params, raw_folder = read_test_config(test_folder)
+  return compare(files['out_file'], files['ref_file'], params, raw_folder)
+
+def main():
+  parser = argparse.ArgumentParser(description='Compares a compressed image with the reference and locates the first difference')
+  parser.add_argument('output_file', nargs='?', help='compressed image written by the testbench')
+  parser.add_argument('reference_file', nargs='?', help='reference compressed image')
+  parser.add_argument('-c', '--csv', help='*.csv file with the test cases')
+  parser.add_argument('-t', '--test', help='test of the *.csv file giving the configuration')
+  parser.add_argument('-r', '--raw', default=os.path.join('..', 'images', 'raw'), help='path to the raw images folder')
+  parser.add_argument('--test-folder', help='folder of a generated test (tb_stimuli/<TestId>)')
+  args = parser.parse_args()
+  if args.test_folder:
+    passed, report = check_test(args.test_folder)
+  else:
+    if not args.output_file or not args.reference_file:
+      parser.error('the output and reference files are required')
+    params = None
+    if args.csv:
+      import ccsds123_model
+      csv_handle = open(args.csv, 'r')
+      rows = [row for row in csv.reader(csv_handle) if row and row[0] == args.test]
+      csv_handle.close()
+      if not rows:
+        parser.error('test ' + str(args.test) + ' not found in ' + args.csv)
+      params = ccsds123_model.Parameters(rows[0])
+    passed, report = compare(args.output_file, args.reference_file, params, args.raw)
+  print(report)
+  return 0 if passed else 1
+
+if __name__ == '__main__':
+  sys.exit(main())
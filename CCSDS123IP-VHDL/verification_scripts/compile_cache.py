@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Compile cache used by sim_runner.py.
+#
+# The compile commands of a test are read from the *.do scripts generated by run_vhdl_tests_123.py
+# (the test script itself and the setGRLIB.do, ip_core.do, ip_core_block.do and testbench*.do
+# scripts it calls), so they are exactly the same commands used by all_tests.do.
+# Every compile unit is fingerprinted with its command line and the contents of its source file
+# (sources listed in targets_list.csv, parameter packages of the test and testbench files), so tests
+# with the same generic configuration share the compiled IP core.
+# A cache folder keeps the list of units compiled in it, in compile order, with their fingerprints.
+# The next compilation in the same folder only runs the units whose fingerprint changed and the units
+# depending on them, found with the VHDL dependency graph of vhdl_deps.py (without the graph, every
+# unit from the first changed one onwards is compiled again).
+#
+# The vendor libraries (GRLIB, techmap, gaisler) are compiled once in modelsim/lib_cache and
+# shared (read-only) by all the simulator processes.
+# With an open-source simulator (see open_simulators.py), the same units are analysed with the
+# commands of the simulator instead of vcom/vlog, every library in its own folder.
+
+import os, json, shlex, hashlib, subprocess
+import vhdl_deps
+
+VENDOR_LIBRARIES = ['grlib', 'techmap', 'gaisler']
+# Libraries in dependency order: a library only uses libraries placed before it
+LIBRARY_ORDER = ['shyloc_utils', 'shyloc_123', 'shyloc_121', 'post_syn_lib', 'work']
+
+def tool_path(name):
+  # Questa tools are taken from $MODEL_TECH when defined (as in the makefile), otherwise from $PATH
+  model_tech = os.environ.get('MODEL_TECH')
+  if model_tech:
+    return os.path.join(model_tech, name)
+  return name
+
+def read_variables(tb_scripts_folder):
+  # Values of $SRC, $SRC121 and $GRLIB as set by sim_env.do
+  variables = {}
+  env_handle = open(os.path.join(tb_scripts_folder, 'sim_env.do'), 'r')
+  for line in env_handle:
+    tokens = line.split()
+    if len(tokens) == 3 and tokens[0] == 'set' and tokens[1] in ['SRC', 'SRC121', 'GRLIB']:
+      variables[tokens[1]] = tokens[2]
+  env_handle.close()
+  if variables.get('GRLIB', '$GRLIB') == '$GRLIB' and 'GRLIB' in os.environ:
+    variables['GRLIB'] = os.environ['GRLIB']
+  return variables
+
+def expand(text, variables):
+  # Longest names first, so that $SRC121 is not taken as $SRC
+  for name in sorted(variables, key=len, reverse=True):
+    text = text.replace('$' + name, variables[name])
+  return text
+
+class CompileUnit(object):
+  def __init__(self, command, variables):
+    self.command = command
+    self.arguments = shlex.split(expand(command, variables))
+    if '-work' in self.arguments:
+      self.library = self.arguments[self.arguments.index('-work') + 1]
+    else:
+      self.library = 'work'
+    self.source = self.arguments[-1]
+    self._fingerprint = None
+
+  def fingerprint(self):
+    # Command line (with the source file name but not its folder) and contents of the source file,
+    # without the "-- TEST:" comment of the generated parameter packages: the packages of two tests
+    # with the same configuration give the same compiled unit
+    if self._fingerprint is None:
+      digest = hashlib.sha1(' '.join(self.arguments[:-1] + [os.path.basename(self.source)]).encode('utf-8'))
+      try:
+        source_handle = open(self.source, 'rb')
+        for line in source_handle:
+          if not line.startswith(b'-- TEST:'):
+            digest.update(line)
+        source_handle.close()
+      except IOError:
+        digest.update(b'missing')
+      self._fingerprint = digest.hexdigest()
+    return self._fingerprint
+
+  def key(self):
+    return [self.library, os.path.basename(self.source), self.fingerprint()]
+
+def read_script(script, variables):
+  # Returns the compile units of a generated *.do script (nested do scripts included) and the
+  # simulation commands found after them (from vsim onwards)
+  units = []
+  sim_lines = []
+  script_handle = open(expand(script, variables), 'r')
+  lines = script_handle.read().splitlines()
+  script_handle.close()
+  for line in lines:
+    stripped = line.strip()
+    if sim_lines or stripped.startswith('vsim '):
+      sim_lines.append(line)
+    elif stripped.startswith('vcom ') or stripped.startswith('vlog '):
+      units.append(CompileUnit(stripped, variables))
+    elif stripped.startswith('do '):
+      units += read_script(stripped[3:].strip(), variables)[0]
+  return units, sim_lines
+
+def library_rank(library):
+  if library in LIBRARY_ORDER:
+    return LIBRARY_ORDER.index(library)
+  return len(LIBRARY_ORDER)
+
+def test_units(tb_scripts_folder, script, variables):
+  # Compile units of a test without the vendor libraries, sorted by library (stable, so the order
+  # of targets_list.csv is kept inside every library) to share the longest possible prefix between
+  # tests: shyloc_utils first, then the parameter package and shyloc_123, shyloc_121 and the testbench
+  units, sim_lines = read_script(os.path.join(tb_scripts_folder, script), variables)
+  units = [u for u in units if not u.library in VENDOR_LIBRARIES]
+  units.sort(key=lambda u: library_rank(u.library))
+  return units, sim_lines
+
+def vendor_units(tb_scripts_folder, variables):
+  return read_script(os.path.join(tb_scripts_folder, 'setGRLIB.do'), variables)[0]
+
+def units_fingerprint(units):
+  digest = hashlib.sha1()
+  for unit in units:
+    digest.update(unit.fingerprint().encode('utf-8'))
+  return digest.hexdigest()
+
+class CompileCache(object):
+  # base identifies what the libraries of the folder were compiled against (e.g. the vendor
+  # libraries): when it changes, everything is compiled again
+  def __init__(self, folder, base=''):
+    self.folder = folder
+    self.base = base
+    self.state_file = os.path.join(folder, 'compile_cache.json')
+    self.compiled = []
+    if os.path.exists(self.state_file):
+      state_handle = open(self.state_file, 'r')
+      try:
+        state = json.load(state_handle)
+        if state.get('base') == base:
+          self.compiled = state.get('units', [])
+      except ValueError:
+        pass
+      state_handle.close()
+
+  def save(self):
+    state_handle = open(self.state_file, 'w')
+    json.dump({'base': self.base, 'units': self.compiled}, state_handle, indent=1)
+    state_handle.close()
+
+  def first_outdated(self, units):
+    # Units before the returned index were compiled in this folder with the same inputs and in the
+    # same order, so they and everything they depend on are up to date
+    for i, unit in enumerate(units):
+      if i >= len(self.compiled) or self.compiled[i] != unit.key() or not os.path.isdir(os.path.join(self.folder, unit.library)):
+        return i
+    return len(units)
+
+  def outdated(self, units, use_graph=True):
+    # Units that have to be compiled: the ones not compiled in this folder with the same fingerprint and
+    # the ones depending on them
+    compiled = set([tuple(key) for key in self.compiled])
+    changed = [u.source for u in units if not tuple(u.key()) in compiled or not os.path.isdir(os.path.join(self.folder, u.library))]
+    if not use_graph:
+      first = self.first_outdated(units)
+      return set([u.source for u in units[first:]])
+    return vhdl_deps.DesignGraph(units).dependents(changed)
+
+  def compile(self, units, log_handle, use_graph=True, simulator=None, shared_libraries={}):
+    # Compiles the outdated units; returns the number of units compiled, or -1 on error.
+    # Only the units of the list are kept as compiled: units compiled before that are not in the list
+    # may depend on units compiled now. simulator is an open-source simulator of open_simulators.py
+    # (None for QuestaSim), with the shared libraries it can use (name -> folder)
+    outdated = self.outdated(units, use_graph)
+    self.compiled = [u.key() for u in units if not u.source in outdated]
+    self.save()
+    count = 0
+    for unit in units:
+      if not unit.source in outdated:
+        continue
+      if simulator is not None:
+        if not os.path.isdir(os.path.join(self.folder, unit.library)):
+          os.makedirs(os.path.join(self.folder, unit.library))
+        command = simulator.analyse_command(unit, self.folder, shared_libraries)
+      else:
+        if not os.path.isdir(os.path.join(self.folder, unit.library)):
+          subprocess.call([tool_path('vlib'), unit.library], cwd=self.folder, stdout=log_handle, stderr=subprocess.STDOUT)
+        command = [tool_path(unit.arguments[0])] + unit.arguments[1:]
+      log_handle.write('# ' + ' '.join(command) + '\n')
+      log_handle.flush()
+      try:
+        ret = subprocess.call(command, cwd=self.folder, stdout=log_handle, stderr=subprocess.STDOUT)
+      except OSError as e:
+        log_handle.write('Could not launch ' + command[0] + ': ' + str(e) + '\n')
+        ret = 1
+      if ret != 0:
+        self.save()
+        return -1
+      self.compiled.append(unit.key())
+      count += 1
+    self.compiled = [u.key() for u in units]
+    self.save()
+    return count
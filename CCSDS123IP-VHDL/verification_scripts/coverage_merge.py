@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Coverage merging and reporting used by sim_runner.py, also runnable as a script to write the
+# coverage reports of some tests on request.
+#
+# The coverage databases of the tests (cover/<TestId>_cover.ucdb, saved by eval_result) are merged
+# while the simulations run: every database added to a TreeMerger is merged with another one of the
+# same level as soon as there is one (pairwise, with several vcover processes in parallel), so only
+# a few partial databases (one per level) are left when the last test finishes. The final merge
+# writes cover/merged_result.ucdb and cover/merged_result.txt, as all_tests.do does for serial runs,
+# with the databases of the cover folder that were not added during the run (tests simulated
+# before, not selected now) included, as the serial merge does.
+# The per-test reports written by eval_result of the serial flow (report_coverage.txt and
+# report_coverage_details.txt of tb_stimuli/<TestId>) are not written by sim_runner.py: they are
+# generated from the saved databases only when asked for, with this script. The total coverage of a
+# test stored in the results database (see results_db.py) is the summary of its saved database.
+#
+# Some command line examples:
+# coverage_merge.py ../modelsim 20_Test 24_test
+# coverage_merge.py ../modelsim 20_Test --details
+# coverage_merge.py ../modelsim --merge
+
+#How to run this script
+#  coverage_merge.py
+#(1) path to the modelsim folder of the IP core database
+#(2..) identifiers of the tests whose coverage reports are written to tb_stimuli/<TestId>
+#--details  write also report_coverage_details.txt
+#--merge    merge all the coverage databases of the cover folder into cover/merged_result.ucdb
+
+from __future__ import print_function
+import sys, os, glob, shutil, argparse, subprocess, threading
+from compile_cache import tool_path
+from results_db import total_coverage
+
+MERGED = 'merged_result.ucdb'
+
+def test_database(modelsim_folder, test_id):
+  return os.path.join(modelsim_folder, 'cover', test_id + '_cover.ucdb')
+
+def vcover(arguments, log_handle):
+  # Runs vcover, returns its exit code (-1 if it can not be launched)
+  try:
+    return subprocess.call([tool_path('vcover')] + arguments, stdout=log_handle, stderr=subprocess.STDOUT)
+  except OSError as e:
+    log_handle.write('Could not launch vcover: ' + str(e) + '\n')
+    return -1
+
+class TreeMerger(object):
+  def __init__(self, modelsim_folder, jobs=1):
+    self.cover_folder = os.path.join(modelsim_folder, 'cover')
+    self.temp_folder = os.path.join(self.cover_folder, 'tree_merge')
+    if os.path.exists(self.temp_folder):
+      shutil.rmtree(self.temp_folder)
+    os.makedirs(self.temp_folder)
+    self.log_handle = open(os.path.join(self.cover_folder, 'vcover.log'), 'w')
+    # Databases waiting for a partner, by level (0: databases of the tests)
+    self.levels = {}
+    self.added = set()
+    self.count = 0
+    self.running = 0
+    self.failed = False
+    self.slots = threading.Semaphore(max(1, jobs))
+    self.condition = threading.Condition()
+
+  def add(self, database, level=0):
+    # Adds a database to merge; merges it at once with a database of the same level, if there is one
+    self.condition.acquire()
+    if level == 0:
+      self.added.add(os.path.abspath(database))
+    partner = self.levels.pop(level, None)
+    if partner is None:
+      self.levels[level] = database
+    else:
+      self.count += 1
+      self.running += 1
+      merged = os.path.join(self.temp_folder, 'merge' + str(self.count) + '.ucdb')
+      t = threading.Thread(target=self.merge, args=(partner, database, merged, level + 1))
+      t.daemon = True
+      t.start()
+    self.condition.release()
+
+  def merge(self, first, second, merged, level):
+    self.slots.acquire()
+    self.condition.acquire()
+    self.log_handle.write('# vcover merge ' + first + ' ' + second + ' -out ' + merged + '\n')
+    self.log_handle.flush()
+    self.condition.release()
+    returncode = vcover(['merge', first, second, '-out', merged], self.log_handle)
+    self.slots.release()
+    # Partial databases are deleted once merged, those of the tests are kept
+    for database in [first, second]:
+      if os.path.dirname(database) == self.temp_folder:
+        os.remove(database)
+    if returncode != 0:
+      self.condition.acquire()
+      self.failed = True
+      self.running -= 1
+      self.condition.notify_all()
+      self.condition.release()
+      return
+    self.add(merged, level)
+    self.condition.acquire()
+    self.running -= 1
+    self.condition.notify_all()
+    self.condition.release()
+
+  def finish(self):
+    # Waits for the running merges and writes merged_result.ucdb and merged_result.txt. Returns False
+    # if vcover failed
+    self.condition.acquire()
+    while self.running:
+      self.condition.wait(1)
+    self.condition.release()
+    merged = os.path.join(self.cover_folder, MERGED)
+    others = [f for f in sorted(glob.glob(os.path.join(self.cover_folder, '*.ucdb')))
+              if f != merged and not os.path.abspath(f) in self.added]
+    inputs = [self.levels[level] for level in sorted(self.levels)] + others
+    if inputs and not self.failed:
+      self.failed = (vcover(['merge'] + inputs + ['-out', merged], self.log_handle) != 0 or
+                     vcover(['report', merged, '-file', os.path.join(self.cover_folder, 'merged_result.txt')], self.log_handle) != 0)
+    self.log_handle.close()
+    shutil.rmtree(self.temp_folder)
+    return not self.failed
+
+def summary_coverage(modelsim_folder, test_id):
+  # Total coverage (%) of the saved database of a test (vcover report -summary), or None
+  database = test_database(modelsim_folder, test_id)
+  if not os.path.exists(database):
+    return None
+  try:
+    process = subprocess.Popen([tool_path('vcover'), 'report', '-summary', database], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+  except OSError:
+    return None
+  text = process.communicate()[0].decode('utf-8', 'replace')
+  return total_coverage(text) if process.returncode == 0 else None
+
+def write_reports(modelsim_folder, test_id, details=False, log_handle=sys.stdout):
+  # Coverage reports of a test from its database, as eval_result of sim_env.do writes them
+  test_folder = os.path.join(modelsim_folder, 'tb_stimuli', test_id)
+  database = test_database(modelsim_folder, test_id)
+  if not os.path.exists(database):
+    return False
+  options = ['-byfile', '-assert', '-directive', '-cvg', '-codeAll']
+  returncode = vcover(['report', '-file', os.path.join(test_folder, 'report_coverage.txt')] + options + [database], log_handle)
+  if details and returncode == 0:
+    returncode = vcover(['report', '-file', os.path.join(test_folder, 'report_coverage_details.txt'), '-details'] + options + [database], log_handle)
+  return returncode == 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Write the coverage reports of tests or merge the coverage databases')
+  parser.add_argument('modelsim_folder', help='modelsim folder of the IP core database')
+  parser.add_argument('tests', nargs='*', help='tests whose coverage reports are written')
+  parser.add_argument('--details', action='store_true', help='write also the detailed coverage reports')
+  parser.add_argument('--merge', action='store_true', help='merge all the coverage databases of the cover folder')
+  args = parser.parse_args()
+  modelsim_folder = os.path.abspath(args.modelsim_folder)
+  for test_id in args.tests:
+    if write_reports(modelsim_folder, test_id, args.details):
+      print('Coverage reports of ' + test_id + ' written to tb_stimuli/' + test_id)
+    else:
+      print('Coverage reports of ' + test_id + ' could not be written (no cover/' + test_id + '_cover.ucdb or vcover failed)')
+  if args.merge:
+    if TreeMerger(modelsim_folder).finish():
+      print('Coverage merged into cover/' + MERGED)
+    else:
+      print('Coverage could not be merged, see cover/vcover.log')
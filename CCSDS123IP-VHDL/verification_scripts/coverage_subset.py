@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Coverage-equivalent subset of a *.csv file of tests: the smallest (estimated fastest) set of rows
+# whose tests cover all the coverage bins covered by the tests of all the rows, written as a new *.csv
+# file for quick regressions (e.g. before merging changes).
+#
+# The covered bins of a test are read from its detailed coverage report (report_coverage_details.txt
+# of tb_stimuli/<TestId>), which is written from cover/<TestId>_cover.ucdb (see coverage_merge.py)
+# when it does not exist. A bin is a statement, a branch (IF/CASE alternative or "All False"), an FSM
+# state or an FSM transition of a source file; bins are identified by file and line, so they are the
+# same for all the tests whatever their configuration (as in the merged report by file).
+# Every row is weighted by the last simulation time of its test (test_times.json of the result cache,
+# written by sim_runner.py). Rows without a measured time are weighted by their number of samples
+# (Nx*Ny*Nz) scaled by the average time per sample of the measured rows.
+# The subset is computed with the greedy algorithm for the weighted set cover (the row with the most
+# new bins per second is taken first), followed by the removal of the selected rows whose bins are
+# all covered by the rest (slowest first). Rows whose test has no coverage data (failed or not
+# simulated yet) are not taken, and are listed.
+# The first two lines of the *.csv file (index and names of the columns) and the selected rows are
+# copied as they are, in their original order.
+#
+# Some command line examples:
+# coverage_subset.py testcases_123_coverage.csv ../modelsim
+# coverage_subset.py testcases_123_coverage_edac3.csv ../modelsim -o testcases_123_premerge.csv
+
+#How to run this script
+#  coverage_subset.py
+#(1) *.csv file of tests, all of them simulated with coverage (e.g. with sim_runner.py)
+#(2) path to the modelsim folder of the IP core database
+#-o, --output  *.csv file to write (default: <name>_subset.csv)
+
+from __future__ import print_function
+import os, re, argparse
+import coverage_merge
+from result_cache import read_times
+
+# Columns of Ny, Nx and Nz in the *.csv files of tests
+NY, NX, NZ = 3, 4, 5
+
+def source_name(path):
+  # Source file path without the folder of the database, which depends on where it was simulated
+  path = path.replace('\\', '/')
+  match = re.search(r'/(src|images)/', path)
+  return path[match.start() + 1:] if match else os.path.basename(path)
+
+def read_bins(report_file):
+  # Covered and uncovered bins of a detailed coverage report of vcover (by file)
+  covered = set()
+  bins = set()
+  source = kind = fsm = section = None
+  block = 0
+  seen = {}
+  report_handle = open(report_file, 'r')
+  for line in report_handle:
+    line = line.rstrip()
+    match = re.match(r'=== File: (.*)', line)
+    if match:
+      source = source_name(match.group(1))
+      continue
+    match = re.match(r'(Branch|Statement|FSM) Coverage for file', line)
+    if match:
+      kind = match.group(1)
+      continue
+    if re.match(r'(Branch|Statement|FSM) Coverage:|ASSERTION RESULTS|Total Coverage', line):
+      kind = None
+      continue
+    if source is None or kind is None:
+      continue
+    key = None
+    hit = False
+    if kind in ['Branch', 'Statement']:
+      if re.match(r'-+(IF|CASE) Branch-+', line):
+        block += 1
+        continue
+      match = re.match(r'\s+(?:(\d+)\s+)?(?:(\d+)\s+)?(\d+|\*\*\*0\*\*\*)\s*(.*)$', line)
+      if not match or match.group(4).startswith('Count coming in'):
+        continue
+      key = (source, kind, block if kind == 'Branch' else 0, match.group(1), match.group(2), match.group(4))
+      hit = match.group(3) != '***0***'
+    else:
+      match = re.match(r'FSM_ID: (\S+)', line)
+      if match:
+        fsm = match.group(1)
+        continue
+      match = re.match(r'\s+(Covered|Uncovered) (States|Transitions) :', line)
+      if match:
+        section = match.groups()
+        continue
+      if re.match(r'\s+(State Value MapInfo|Summary)', line):
+        section = None
+        continue
+      if section is None or re.match(r'\s*(-[-\s]*$|State\b|Line\b)', line):
+        continue
+      fields = line.split()
+      if section[1] == 'States' and len(fields) in [1, 2]:
+        key = (source, 'State', fsm, fields[0])
+      elif section[1] == 'Transitions' and len(fields) >= 3 and fields[1].isdigit():
+        key = (source, 'Transition', fsm, fields[1])
+      hit = section[0] == 'Covered'
+    if key is not None:
+      # Bins with the same fields in the same file (same line and item) are told apart by their order
+      seen[key] = seen.get(key, 0) + 1
+      key = key + (seen[key],)
+      bins.add(key)
+      if hit:
+        covered.add(key)
+  report_handle.close()
+  return covered, bins
+
+def test_bins(modelsim_folder, test_id):
+  # Covered bins of a test, or None if it has no coverage data
+  report_file = os.path.join(modelsim_folder, 'tb_stimuli', test_id, 'report_coverage_details.txt')
+  database = coverage_merge.test_database(modelsim_folder, test_id)
+  if os.path.exists(database) and (not os.path.exists(report_file) or os.path.getmtime(report_file) < os.path.getmtime(database)):
+    log_handle = open(os.devnull, 'w')
+    coverage_merge.write_reports(modelsim_folder, test_id, True, log_handle)
+    log_handle.close()
+  if not os.path.exists(report_file):
+    return None
+  return read_bins(report_file)[0]
+
+def weights(rows, times):
+  # Weight (seconds) of every row: measured time, or number of samples times the average time per sample
+  samples = dict([(row[0], float(int(row[NX]) * int(row[NY]) * int(row[NZ]))) for row in rows])
+  measured = [row[0] for row in rows if row[0] in times]
+  rate = 1.0
+  if measured:
+    rate = sum([times[t] for t in measured]) / max(1.0, sum([samples[t] for t in measured]))
+  return dict([(t, times[t] if t in times else samples[t] * rate) for t in samples])
+
+def greedy_cover(bins, weight):
+  # Weighted set cover: bins maps every test to its covered bins. Returns the selected tests
+  uncovered = set()
+  for test_bins in bins.values():
+    uncovered |= test_bins
+  selected = []
+  while uncovered:
+    best = max(sorted(bins), key=lambda t: (len(bins[t] & uncovered) / max(weight[t], 1e-3), -weight[t]))
+    if not bins[best] & uncovered:
+      break
+    selected.append(best)
+    uncovered -= bins[best]
+  # Rows made redundant by the ones selected after them
+  for test in sorted(selected, key=lambda t: -weight[t]):
+    rest = set()
+    for other in selected:
+      if other != test:
+        rest |= bins[other]
+    if bins[test] <= rest:
+      selected.remove(test)
+  return selected
+
+def split_rows(csv_file):
+  # Lines of the *.csv file: the two first ones and the lines of the tests with their fields
+  csv_handle = open(csv_file, 'rb')
+  lines = csv_handle.read().decode('latin-1').splitlines(True)
+  csv_handle.close()
+  rows = []
+  for line in lines[2:]:
+    fields = line.strip().split(',')
+    if fields[0]:
+      rows.append((fields, line))
+  return lines[:2], rows
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Write the coverage-equivalent subset of the rows of a *.csv file of tests with the shortest simulation time')
+  parser.add_argument('csv_file', help='*.csv file of tests')
+  parser.add_argument('modelsim_folder', help='modelsim folder of the IP core database')
+  parser.add_argument('-o', '--output', help='*.csv file to write')
+  args = parser.parse_args()
+  modelsim_folder = os.path.abspath(args.modelsim_folder)
+  output = args.output or os.path.splitext(args.csv_file)[0] + '_subset.csv'
+  head, rows = split_rows(args.csv_file)
+  bins = {}
+  missing = []
+  for fields, line in rows:
+    covered = test_bins(modelsim_folder, fields[0])
+    if covered is None:
+      missing.append(fields[0])
+    else:
+      bins[fields[0]] = covered
+  times = read_times(os.path.join(modelsim_folder, 'result_cache'))
+  weight = weights([fields for fields, line in rows], times)
+  selected = set(greedy_cover(bins, weight))
+  output_handle = open(output, 'wb')
+  output_handle.write(''.join(head + [line for fields, line in rows if fields[0] in selected]).encode('latin-1'))
+  output_handle.close()
+  total_bins = set()
+  for test_bins in bins.values():
+    total_bins |= test_bins
+  total = sum([weight[t] for t in bins])
+  subset = sum([weight[t] for t in selected])
+  print('%d of %d rows selected, covering the %d bins covered by all of them' % (len(selected), len(bins), len(total_bins)))
+  if [t for t in bins if t in times]:
+    print('Estimated simulation time: %.1f s of %.1f s (%.1f%%)' % (subset, total, 100.0 * subset / max(total, 1e-3)))
+  else:
+    print('No simulation times measured, samples to simulate: %d of %d (%.1f%%)' % (subset, total, 100.0 * subset / max(total, 1e-3)))
+  if missing:
+    print('Rows without coverage data, not selected: ' + ' '.join(missing))
+  print('Subset written to ' + output)
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+
+# Design-space exploration of the generics of the IP core: the configurations (candidates) obtained by
+# sweeping PREDICTION_TYPE, P_MAX, OMEGA_GEN, R_GEN, Nz_GEN, W_BUFFER_GEN, EDAC and HMAXBURST over
+# the given values, from a base row of a *.csv file of synthesis configurations, are synthesized with
+# synthesis_farm.py and compared by throughput, area and on-chip memory.
+#
+# Every combination of the values is a candidate row (a copy of the base row with the swept columns
+# changed), named after its values, e.g. dse_bip-mem_p3_o19_r64_nz256_w64_e0_h1. The candidates that
+# break a rule of the generator or of the generics of the IP core are rejected before synthesis:
+#   - PREDICTION_TYPE: bip, bip-mem, bsq, bil or bil-mem (the generator takes any other one as bil)
+#   - HMAXBURST from 0 (16 beats) to 16 (the generator disables the bursts for any other value)
+#   - P_MAX from 0 to 15, OMEGA_GEN from 4 to 19, R_GEN from max(32, D_GEN + OMEGA_GEN + 2) to 64
+#   - Nz_GEN from 1 to 2^16 - 1 (16-bit image addresses)
+#   - W_BUFFER_GEN multiple of 8 from 8 to 64, and not lower than U_MAX_GEN + D_GEN (longest
+#     codeword) with the sample-adaptive encoder (ENCODER_SELECTION_GEN = 1)
+#   - EDAC from 0 to 3
+#   - widths of the FIFOs with EDAC supported by fifop2_EDAC (see memory_estimator.py)
+# As the generator does, the image columns (Nz, D) are used instead of the generics when the column
+# "Parameter set" is 0, and the swept Nz_GEN is written in both of them.
+# The candidates are written to synthesis/dse/<name>.csv and run_vhdl_tests_123.py generates their
+# parameter packages and the scripts of the tool (with the interpreter running this script). The
+# candidates with the same configuration hash as another one (e.g. HMAXBURST 0 and 16) are
+# synthesized once. A (candidate, target) pair is not synthesized when the on-chip memory of the
+# candidate estimated by memory_estimator.py needs more block RAMs than the device has.
+#
+# Completed points are cached in synthesis/synthesis_results.db (see synthesis_metrics.py): a
+# (candidate, target) pair is synthesized only when the database has no result of its configuration
+# hash for the target and tool (no achieved Fmax with --fmax), so a sweep widened afterwards only
+# synthesizes the new configurations. The pairs to synthesize run in parallel as jobs of
+# synthesis_farm.py (with a maximum frequency search of every pair with --fmax).
+#
+# For every target, the Pareto front of the candidates with a result is computed over the throughput
+# (MS/s: achieved, or else estimated, Fmax times the samples per clock cycle of the architecture, see
+# synthesis_metrics.throughput), the area (LUTs, or cell area for Design Compiler) and the on-chip
+# memory (block RAMs); an objective that is not reported for all the candidates of the target (e.g.
+# block RAMs with Design Compiler) is not compared. A candidate is on the front when no other one is
+# as good in every objective and better in one. The points are printed by target, front first, and
+# written to synthesis/dse/<name>_points.csv.
+#
+# Some command line examples:
+# design_space.py synthesis_params_123_e.csv ../ ../../CCSDS121IP-VHDL synplify -t 01_teletel --sweep PREDICTION_TYPE=bip,bip-mem,bsq --sweep P_MAX=0:15:3 --target RT4G4150
+# design_space.py synthesis_params_123_e.csv ../ ../../CCSDS121IP-VHDL vivado -t 01_teletel --sweep OMEGA_GEN=13,19 --sweep Nz_GEN=256,1024 --fmax -j 16
+# design_space.py synthesis_params_123_e.csv ../ ../../CCSDS121IP-VHDL dc --sweep EDAC=0:3 --name edac --dry-run
+#
+#How to run this script
+#  design_space.py
+#(1) *.csv file with the base configuration
+#(2) path to the IP core database
+#(3) path to the CCSDS-121 IP core database (needed by run_vhdl_tests_123.py)
+#(4) synthesis tool: synplify, ise, vivado, dc or brave
+#-t, --test  base configuration (default: first row of the *.csv file)
+#--sweep     generic and its values, as a list (P_MAX=1,3,7) or a range with an optional step
+#            (P_MAX=0:15:3); can be repeated, the generics not swept keep their base value
+#--name      name of the exploration: *.csv file of the candidates and prefix of their TestId (default: dse)
+#--target    synthesize only for the given target (can be repeated)
+#-j, --jobs  number of synthesis processes launched concurrently (default: number of cores)
+#--fmax      search the maximum frequency of every candidate and target (--range, --tolerance,
+#            --probes and --rounds as in synthesis_farm.py)
+#--dry-run   only write the candidates, list the rejected and cached ones and show the current front
+#
+# Module usage:
+#   candidates, rejected = design_space.candidates(header, base, {'P_MAX': ['1', '3']}, 'dse')
+#   front = design_space.pareto_front(points)
+
+from __future__ import print_function
+import sys, os, time, argparse, itertools, subprocess, multiprocessing
+import runtime_model
+import memory_estimator
+import synthesis_metrics
+import synthesis_farm
+
+# Generics of the exploration (columns of the *.csv files), and their names in the TestId
+PARAMETERS = ['PREDICTION_TYPE', 'P_MAX', 'OMEGA_GEN', 'R_GEN', 'Nz_GEN', 'W_BUFFER_GEN', 'EDAC', 'HMAXBURST']
+SHORT_NAMES = {'PREDICTION_TYPE': '', 'P_MAX': 'p', 'OMEGA_GEN': 'o', 'R_GEN': 'r', 'Nz_GEN': 'nz', 'W_BUFFER_GEN': 'w',
+               'EDAC': 'e', 'HMAXBURST': 'h'}
+# Image columns read by run_vhdl_tests_123.py instead of the generics when "Parameter set" is 0
+IMAGE_COLUMNS = {'Nz_GEN': 'Nz', 'D_GEN': 'D'}
+PARAMETER_SET = 'Parameter set'
+# Objectives of the Pareto front: name, metric, sense (1 maximized, -1 minimized)
+OBJECTIVES = [('MS/s', 'msps', 1), ('Area', 'size', -1), ('BRAMs', 'brams', -1)]
+
+def split_rows(csv_file):
+  # First two lines of the *.csv file, names of its columns and fields of its rows
+  csv_handle = open(csv_file, 'rb')
+  lines = csv_handle.read().decode('latin-1').splitlines(True)
+  csv_handle.close()
+  header = lines[1].rstrip('\r\n').split(',')
+  rows = [line.rstrip('\r\n').split(',') for line in lines[2:] if line.split(',')[0].strip()]
+  return lines[:2], header, rows
+
+def parse_values(name, text):
+  # Values of a generic given as a list (a,b,c) or as a range (first:last or first:last:step), each
+  # value once (in order of appearance), so no candidate is generated twice
+  if name == 'PREDICTION_TYPE':
+    # Architectures by name or by the value of the generic
+    values = [runtime_model.ARCHITECTURES.get(v.strip(), v.strip()) for v in text.split(',')]
+  elif ':' in text:
+    bounds = [int(v) for v in text.split(':')]
+    step = bounds[2] if len(bounds) > 2 else 1
+    if step <= 0 or bounds[1] < bounds[0]:
+      raise ValueError('empty range ' + text)
+    values = [str(v) for v in range(bounds[0], bounds[1] + 1, step)]
+  else:
+    values = [str(int(v)) for v in text.split(',')]
+  return [v for i, v in enumerate(values) if not v in values[:i]]
+
+def column(header, name):
+  return header.index(name)
+
+def generic(fields, header, name):
+  # Value of a generic in the parameter package generated by run_vhdl_tests_123.py
+  if fields[column(header, PARAMETER_SET)] == '0' and name in IMAGE_COLUMNS:
+    return fields[column(header, IMAGE_COLUMNS[name])]
+  return fields[column(header, name)]
+
+def set_generic(fields, header, name, value):
+  fields[column(header, name)] = value
+  if fields[column(header, PARAMETER_SET)] == '0' and name in IMAGE_COLUMNS:
+    fields[column(header, IMAGE_COLUMNS[name])] = value
+
+def violations(fields, header):
+  # Rules broken by a candidate (see the description of the module)
+  broken = []
+  if not fields[column(header, 'PREDICTION_TYPE')] in runtime_model.ARCHITECTURES.values():
+    broken.append('PREDICTION_TYPE not in ' + ', '.join(sorted(runtime_model.ARCHITECTURES.values())))
+  try:
+    value = dict([(name, int(generic(fields, header, name))) for name in
+                  ['P_MAX', 'OMEGA_GEN', 'R_GEN', 'Nz_GEN', 'W_BUFFER_GEN', 'EDAC', 'HMAXBURST', 'D_GEN', 'U_MAX_GEN', 'ENCODER_SELECTION_GEN']])
+  except ValueError:
+    return broken + ['generics not integer']
+  if not 0 <= value['HMAXBURST'] <= 16:
+    broken.append('HMAXBURST not in 0..16')
+  if not 0 <= value['P_MAX'] <= 15:
+    broken.append('P_MAX not in 0..15')
+  if not 4 <= value['OMEGA_GEN'] <= 19:
+    broken.append('OMEGA_GEN not in 4..19')
+  r_min = max(32, value['D_GEN'] + value['OMEGA_GEN'] + 2)
+  if not r_min <= value['R_GEN'] <= 64:
+    broken.append('R_GEN not in %d..64' % r_min)
+  if not 1 <= value['Nz_GEN'] <= 65535:
+    broken.append('Nz_GEN not in 1..65535')
+  if value['W_BUFFER_GEN'] % 8 or not 8 <= value['W_BUFFER_GEN'] <= 64:
+    broken.append('W_BUFFER_GEN not a multiple of 8 in 8..64')
+  elif value['ENCODER_SELECTION_GEN'] == 1 and value['W_BUFFER_GEN'] < value['U_MAX_GEN'] + value['D_GEN']:
+    broken.append('W_BUFFER_GEN < U_MAX_GEN + D_GEN')
+  if not 0 <= value['EDAC'] <= 3:
+    broken.append('EDAC not in 0..3')
+  try:
+    memory_estimator.estimate(memory_estimator.row_constants(fields, header))
+  except ValueError as e:
+    broken.append(str(e))
+  return broken
+
+def test_id(name, fields, header):
+  return '_'.join([name] + [SHORT_NAMES[p] + generic(fields, header, p) for p in PARAMETERS])
+
+def candidates(header, base, sweep, name):
+  # Rows of every combination of the swept values (sweep: generic -> values), as (TestId, fields),
+  # and the rejected ones as (TestId, broken rules)
+  names = [p for p in PARAMETERS if p in sweep]
+  accepted, rejected = [], []
+  for values in itertools.product(*[sweep[p] for p in names]):
+    fields = list(base) + [''] * (len(header) - len(base))
+    for p, v in zip(names, values):
+      set_generic(fields, header, p, v)
+    fields[0] = test_id(name, fields, header)
+    broken = violations(fields, header)
+    if broken:
+      rejected.append((fields[0], broken))
+    else:
+      accepted.append((fields[0], fields))
+  return accepted, rejected
+
+def write_candidates(csv_file, head, rows):
+  csv_handle = open(csv_file, 'wb')
+  newline = '\r\n' if head[0].endswith('\r\n') else '\n'
+  csv_handle.write(''.join(head + [','.join(fields) + newline for test_id, fields in rows]).encode('latin-1'))
+  csv_handle.close()
+
+def generate(csv_file, database_folder, database_121_folder, tool):
+  # Parameter packages and synthesis scripts of the candidates, written by run_vhdl_tests_123.py
+  images = os.path.join(database_folder, 'images')
+  command = [sys.executable, 'run_vhdl_tests_123.py', csv_file, os.path.join(images, 'raw'), os.path.join(images, 'compressed'),
+             os.path.join(images, 'reference'), database_folder, database_121_folder, tool]
+  log_handle = open(os.path.splitext(csv_file)[0] + '_generate.log', 'w')
+  returncode = subprocess.call(command, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=log_handle, stderr=subprocess.STDOUT)
+  log_handle.close()
+  return returncode
+
+def result(database, key, device, tool):
+  # (Fmax, MS/s, area, block RAMs, achieved Fmax) of a configuration hash, or None
+  rows = database.query('SELECT fmax_mhz, msps, luts, area, brams, achieved_mhz FROM synthesis WHERE config_hash = ? AND device = ? AND tool = ?',
+                        (key, device, tool))
+  if not rows:
+    return None
+  fmax, msps, luts, area, brams, achieved = rows[0]
+  return {'fmax': achieved or fmax, 'msps': msps, 'size': luts or area, 'brams': brams, 'achieved': achieved}
+
+def dominates(a, b):
+  # Whether the objectives a (higher is better) are as good as b in all and better in one
+  return all([x >= y for x, y in zip(a, b)]) and a != b
+
+def pareto_front(points):
+  # Points (objectives, item) not dominated by any other one
+  return [p for p in points if not [q for q in points if dominates(q[0], p[0])]]
+
+def device_front(results):
+  # Objectives compared for the results (TestId, metrics) of a device, and TestIds on its front
+  results = [(t, m) for t, m in results if m['msps'] is not None]
+  objectives = [o for o in OBJECTIVES if results and not [m for t, m in results if m[o[1]] is None]]
+  points = [(tuple([sense * m[metric] for label, metric, sense in objectives]), t) for t, m in results]
+  return objectives, set([t for objective, t in pareto_front(points)])
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Synthesize the configurations of a sweep of the generics and compute the Pareto front of throughput, area and on-chip memory')
+  parser.add_argument('csv_file', help='*.csv file with the base configuration')
+  parser.add_argument('database_folder', help='path to the IP core database')
+  parser.add_argument('database_121_folder', help='path to the CCSDS-121 IP core database')
+  parser.add_argument('tool', choices=sorted(synthesis_farm.SYNTHESIS_TOOLS), help='synthesis tool')
+  parser.add_argument('-t', '--test', help='base configuration (default: first row)')
+  parser.add_argument('--sweep', action='append', default=[], metavar='GENERIC=VALUES', help='values of a generic: list (a,b,c) or range (first:last[:step])')
+  parser.add_argument('--name', default='dse', help='name of the exploration')
+  parser.add_argument('--target', action='append', default=[], help='synthesize only for this target (can be repeated)')
+  parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='number of synthesis processes launched concurrently')
+  parser.add_argument('--fmax', action='store_true', help='search the maximum frequency of every candidate and target')
+  parser.add_argument('--range', type=float, nargs=2, default=[20.0, 400.0], metavar=('LOW', 'HIGH'), help='frequencies (MHz) searched by --fmax')
+  parser.add_argument('--tolerance', type=float, default=1.0, metavar='MHZ', help='precision of the maximum frequency found by --fmax')
+  parser.add_argument('--probes', type=int, default=1, metavar='N', help='frequencies synthesized in parallel in every round of a search')
+  parser.add_argument('--rounds', type=int, default=8, metavar='N', help='maximum number of rounds of a search')
+  parser.add_argument('--dry-run', action='store_true', help='only write the candidates and show the cached results')
+  args = parser.parse_args()
+  database_folder = os.path.abspath(args.database_folder)
+  tool = synthesis_farm.SYNTHESIS_TOOLS[args.tool](database_folder)
+  if args.fmax and not tool.frequency_constraint:
+    parser.error('--fmax needs a frequency constraint, only available with ' + ', '.join(sorted([n for n, t in synthesis_farm.SYNTHESIS_TOOLS.items() if t.frequency_constraint])))
+  head, header, rows = split_rows(args.csv_file)
+  base = [r for r in rows if args.test is None or r[0] == args.test]
+  if not base:
+    parser.error('configuration %s not found in %s' % (args.test, args.csv_file))
+  sweep = {}
+  for item in args.sweep:
+    name, _, text = item.partition('=')
+    if not name in PARAMETERS:
+      parser.error('generic %s cannot be swept, the generics are: %s' % (name, ', '.join(PARAMETERS)))
+    try:
+      sweep[name] = parse_values(name, text)
+    except ValueError as e:
+      parser.error('wrong values of %s: %s' % (name, e))
+  accepted, rejected = candidates(header, base[0], sweep, args.name)
+  print('*****************************************\n')
+  print('%d candidates from %s, %d rejected' % (len(accepted), base[0][0], len(rejected)))
+  for candidate, broken in rejected:
+    print('  rejected %s: %s' % (candidate, ', '.join(broken)))
+  if not accepted:
+    sys.exit(1)
+  dse_folder = os.path.join(database_folder, 'synthesis', 'dse')
+  if not os.path.isdir(dse_folder):
+    os.makedirs(dse_folder)
+  csv_file = os.path.join(dse_folder, args.name + '.csv')
+  write_candidates(csv_file, head, accepted)
+  if generate(csv_file, database_folder, os.path.abspath(args.database_121_folder), args.tool) != 0:
+    print('Generation of the synthesis scripts failed, see ' + os.path.splitext(csv_file)[0] + '_generate.log')
+    sys.exit(1)
+  # Candidates of the same configuration are synthesized once
+  keys = {}
+  for candidate, fields in accepted:
+    keys.setdefault(synthesis_metrics.config_hash(synthesis_metrics.parameters_file(database_folder, candidate)), candidate)
+  test_ids = sorted(keys.values())
+  key_of = dict([(candidate, key) for key, candidate in keys.items()])
+  farm = synthesis_farm.SynthesisFarm(tool)
+  jobs = synthesis_farm.farm_jobs(tool, test_ids, args.target)
+  # Pairs whose estimated block RAMs exceed the device are not synthesized
+  memories = dict([(candidate, memory_estimator.estimate(memory_estimator.row_constants(fields, header))) for candidate, fields in accepted])
+  oversized = [j for j in jobs if j['Target'] in memory_estimator.DEVICES and not memory_estimator.fits(memories[j['TestId']], j['Target'])]
+  for job in oversized:
+    print('  not fitting %s on %s: %g of %d block RAMs' % (job['TestId'], job['Target'], memory_estimator.block_rams(memories[job['TestId']], job['Target']),
+          memory_estimator.DEVICES[job['Target']][1]))
+  jobs = [j for j in jobs if not j in oversized]
+  pending = []
+  for job in jobs:
+    cached = result(farm.database, key_of[job['TestId']], job['Target'], tool.tool)
+    if cached is None or (args.fmax and cached['achieved'] is None):
+      pending.append(job)
+  print('%d configurations, %d targets: %d not fitting, %d results cached, %d to synthesize\n' % (len(test_ids), len(set([j['Target'] for j in jobs])),
+        len(oversized), len(jobs) - len(pending), len(pending)))
+  start = time.time()
+  if pending and not args.dry_run:
+    search = (args.range[0], args.range[1], args.tolerance, max(1, args.probes), args.rounds) if args.fmax else None
+    farm.run(pending, args.jobs, search)
+    farm.write_report(pending)
+    passed = len([j for j in pending if farm.results.get(j['Job']) == 'passed'])
+    print('\nSynthesized: %d passed, %d not passed  Total time: %.1f s\n' % (passed, len(pending) - passed, time.time() - start))
+  # Pareto front of every target
+  points_handle = open(os.path.join(dse_folder, args.name + '_points.csv'), 'w')
+  points_handle.write('Target,TestId,' + ','.join(PARAMETERS) + ',Fmax,MS/s,Area,BRAMs,Pareto\n')
+  for target in sorted(set([j['Target'] for j in jobs])):
+    results = []
+    for candidate in test_ids:
+      metrics = result(farm.database, key_of[candidate], target, tool.tool)
+      if metrics is not None:
+        results.append((candidate, metrics))
+    objectives, front = device_front(results)
+    print('%s: %d results, Pareto front of %d over %s' % (target, len(results), len(front), ', '.join([o[0] for o in objectives]) or '-'))
+    if not results:
+      continue
+    print('  %-44s %10s  %8s  %10s  %6s' % ('TestId', 'Fmax (MHz)', 'MS/s', 'Area', 'BRAMs'))
+    for candidate, metrics in sorted(results, key=lambda r: (not r[0] in front, -(r[1]['msps'] or 0))):
+      print('%s %-44s %10s  %8s  %10s  %6s' % ('*' if candidate in front else ' ', candidate, synthesis_metrics.value(metrics['fmax'], '%.1f'),
+            synthesis_metrics.value(metrics['msps'], '%.2f'), synthesis_metrics.value(metrics['size']), synthesis_metrics.value(metrics['brams'], '%g')))
+      fields = dict(accepted)[candidate]
+      points_handle.write(','.join([target, candidate] + [generic(fields, header, p) for p in PARAMETERS] +
+                                   ['' if metrics[m] is None else '%g' % metrics[m] for m in ['fmax', 'msps', 'size', 'brams']] +
+                                   ['1' if candidate in front else '0']) + '\n')
+  points_handle.close()
+  farm.database.close()
+  print('\n**** Points written to ' + os.path.join('synthesis', 'dse', args.name + '_points.csv'))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+
+# Search of the maximum frequency of a configuration on a target, used by synthesis_farm.py --fmax.
+#
+# The serial flows synthesize every configuration with a fixed frequency constraint (FREQUENCY of
+# synthesis_metrics.py), whose estimated frequency only tells whether the constraint is met. The
+# search synthesizes the configuration with different frequency constraints (probes) and keeps the
+# highest constraint met (worst slack >= 0, or estimated frequency >= constraint when the reports
+# have no slack) below the lowest constraint not met, within the searched range:
+#   - the first round probes FREQUENCY (and, with several probes per round, frequencies spread over
+#     the searched range)
+#   - the second round probes the frequency estimated by the tool in the first one, which is
+#     usually close to the result
+#   - the next rounds split the interval between the highest frequency met and the lowest not met
+#     in probes + 1 equal parts (bisection with one probe per round)
+# A probe whose synthesis failed or ended with an error tells nothing about the constraint: it is
+# kept out of the interval and synthesized again (up to RETRIES times) in the next round.
+# The search stops when the interval is narrower than the tolerance (MHz), when the slack of the
+# highest frequency met is smaller than the slack of the tolerance (the frequency reached with zero
+# slack is within tolerance), or after the maximum number of rounds. The probes of a round run in
+# parallel, and the searches of all the (configuration, target) pairs share the pool of workers of
+# the farm.
+#
+# Module usage (see synthesis_farm.py):
+#   search = fmax_search.FmaxSearch(low, high, tolerance, probes, rounds)
+#   frequencies = search.next_frequencies()
+#   search.add(frequency, status, metrics, hierarchy)
+#   frequency, metrics, hierarchy = search.achieved()
+
+from synthesis_metrics import FREQUENCY, fmax_from_slack
+
+# Resolution of the probed frequencies (MHz)
+RESOLUTION = 0.1
+# Times a probe that failed or ended with an error is synthesized again
+RETRIES = 1
+
+def met(frequency, status, metrics):
+  # Whether a probe met its frequency constraint
+  if status != 'passed':
+    return False
+  if metrics.get('slack_ns') is not None:
+    return metrics['slack_ns'] >= 0
+  return metrics.get('fmax_mhz') is not None and metrics['fmax_mhz'] >= frequency
+
+class FmaxSearch(object):
+  def __init__(self, low, high, tolerance=1.0, probes=1, rounds=8):
+    self.low = low
+    self.high = high
+    self.tolerance = tolerance
+    self.probes = probes
+    self.rounds = rounds
+    self.round = 0
+    self.outstanding = 0
+    # (frequency, met, status, metrics, hierarchy) of every finished probe
+    self.results = []
+
+  def interval(self):
+    # Highest frequency met (or low) and lowest frequency not met (or high), from the passed probes
+    met_frequencies = [r[0] for r in self.results if r[1]]
+    failed_frequencies = [r[0] for r in self.results if not r[1] and r[2] == 'passed']
+    return max(met_frequencies + [self.low]), min(failed_frequencies + [self.high])
+
+  def done(self):
+    if self.outstanding:
+      return False
+    if self.round >= self.rounds:
+      return True
+    low, high = self.interval()
+    if high - low <= self.tolerance:
+      return True
+    best = self.achieved()
+    if best is not None:
+      fmax = fmax_from_slack(1000.0 / best[0], best[1].get('slack_ns'))
+      if fmax is not None and fmax - best[0] <= self.tolerance:
+        return True
+    return False
+
+  def next_frequencies(self):
+    # Frequencies of the next round (none while the current round runs or when the search is done)
+    if self.outstanding or self.done():
+      return []
+    low, high = self.interval()
+    # Probes that failed or ended with an error are retried first
+    errors = [r[0] for r in self.results if r[2] != 'passed']
+    candidates = [f for f in errors if errors.count(f) <= RETRIES]
+    if not self.results:
+      candidates.append(FREQUENCY)
+    elif self.round == 1:
+      estimates = [r[3].get('fmax_mhz') for r in self.results if r[2] == 'passed' and r[3].get('fmax_mhz') is not None]
+      if estimates:
+        candidates.append(max(estimates))
+    parts = self.probes + 1
+    candidates += [low + (high - low) * n / parts for n in range(1, parts)]
+    probed = set([r[0] for r in self.results if r[2] == 'passed'] + [f for f in errors if errors.count(f) > RETRIES])
+    frequencies = []
+    for frequency in candidates:
+      frequency = round(round(frequency / RESOLUTION) * RESOLUTION, 3)
+      if low < frequency < high and not frequency in probed and not frequency in frequencies:
+        frequencies.append(frequency)
+    frequencies = frequencies[:self.probes]
+    if not frequencies:
+      self.round = self.rounds
+      return []
+    self.round += 1
+    self.outstanding = len(frequencies)
+    return frequencies
+
+  def add(self, frequency, status, metrics, hierarchy=[]):
+    self.outstanding -= 1
+    self.results.append((frequency, met(frequency, status, metrics), status, metrics, hierarchy))
+
+  def errors(self):
+    # Probes (frequency, status) that failed or ended with an error
+    return [(r[0], r[2]) for r in self.results if r[2] != 'passed']
+
+  def achieved(self):
+    # (frequency, metrics, hierarchy) of the highest frequency met, or None
+    met_results = sorted([r for r in self.results if r[1]], key=lambda r: r[0])
+    if not met_results:
+      return None
+    return met_results[-1][0], met_results[-1][3], met_results[-1][4]
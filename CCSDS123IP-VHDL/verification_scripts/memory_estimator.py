@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+
+# Analytic estimation of the on-chip memory of the IP core for a configuration: the FIFOs (and
+# register banks) inferred by the RTL for the generics of a row of a *.csv file, with their depth
+# and bit width, and the block RAMs they take on the targets of synthesis_farm.py. It runs in
+# milliseconds, so the configurations that do not fit a device are rejected before synthesis
+# (design_space.py skips them).
+#
+# The memories are the instances of fifop2 (2^W_ADDR elements of W bits), async_fifo (2^log2(NE)
+# elements) and reg_bank of the predictor of the architecture, of the sample-adaptive encoder
+# (ENCODING_TYPE = 1), of the dispatcher and of the AHB slave, with the sizes of
+# ccsds123_constants.vhd (log2, log2_floor and ceil as in shyloc_functions.vhd):
+#   - all the architectures: FIFO of current samples (W_ADDR_CURR)
+#   - bip: left, top and top-left neighbours (log2(Nz_GEN)), top-right neighbours (log2(Nx_GEN*Nz_GEN))
+#   - bip-mem: as bip, the top-right neighbours are in the external memory (two AHB async_fifo)
+#   - bsq: top-right neighbours (log2(Nx_GEN)), record_2d_fifo, two AHB async_fifo of the local
+#     differences, central local differences and weights (log2(P_MAX)), directional local differences
+#   - bil: top-right neighbours (log2((Nx_GEN+1)*Nz_GEN)), record_2d_fifo, ld_2d_fifo_bil of the
+#     central local differences (P_MAX FIFOs of log2(Nx_GEN))
+#   - bil-mem: as bil, the top-right neighbours are in the external memory (two AHB async_fifo)
+#   - bip, bip-mem, bil, bil-mem: ld_2d_fifo and wei_2d_fifo (Cz FIFOs) between dot product and
+#     weight update, and wei_2d_fifo of the weights (log2(Nz_GEN))
+# The FIFOs with EDAC (EDAC = 1 or 3, where the RTL passes it) store the data aligned to 4, 8, 16,
+# 24, 32, 40, 48 or 64 bits plus 4 or 8 check bits (fifop2_EDAC); wider data is not supported by
+# the EDAC and the configuration is rejected.
+#
+# A memory of at least BLOCK_DEPTH elements is expected in block RAM (smaller ones are implemented
+# with flip-flops or distributed RAM by the synthesis tools), and takes the fewest blocks of the
+# aspect ratios (depth x width) of the RAM block of the device. The blocks are an estimation (the
+# tools may pack or split memories differently); the memory bits are exact.
+#
+# Some command line examples:
+# memory_estimator.py synthesis_params_123_e.csv
+# memory_estimator.py synthesis_params_123_e.csv -t 01_teletel -v
+# memory_estimator.py testcases_123_e_all.csv --target RT4G4150 --target zedboard
+#
+#How to run this script
+#  memory_estimator.py
+#(1) *.csv file with the configurations
+#-t, --test     estimate only the given configuration (can be repeated)
+#--target       check only the given device (can be repeated, default: all the devices of DEVICES)
+#-v, --verbose  list the memories of every configuration
+#
+# Module usage:
+#   memories = memory_estimator.estimate(memory_estimator.row_constants(fields, header))
+#   memories = memory_estimator.estimate(runtime_model.read_constants(parameters_file))
+#   blocks = memory_estimator.block_rams(memories, 'RT4G4150')
+
+from __future__ import print_function
+import sys, argparse
+import runtime_model
+
+PARAMETER_SET = 'Parameter set'
+# Image columns written by run_vhdl_tests_123.py instead of the generics when "Parameter set" is 0
+IMAGE_COLUMNS = {'Nx_GEN': 'Nx', 'Nz_GEN': 'Nz', 'D_GEN': 'D'}
+# Generics of the IP core used by the estimation
+GENERICS = ['PREDICTION_TYPE', 'ENCODING_TYPE', 'EDAC', 'Nx_GEN', 'Nz_GEN', 'D_GEN', 'P_MAX', 'PREDICTION_GEN', 'OMEGA_GEN', 'W_BUFFER_GEN']
+
+# Smallest memory (elements) expected in block RAM
+BLOCK_DEPTH = 64
+# Aspect ratios (depth, width, blocks) of the RAM blocks
+RAM_BLOCKS = {
+  'RAMB36': [(32768, 1, 1), (16384, 2, 1), (8192, 4, 1), (4096, 9, 1), (2048, 18, 1), (1024, 36, 1), (512, 72, 1),
+             (16384, 1, 0.5), (8192, 2, 0.5), (4096, 4, 0.5), (2048, 9, 0.5), (1024, 18, 0.5), (512, 36, 0.5)],
+  'RAM4K9': [(4096, 1, 1), (2048, 2, 1), (1024, 4, 1), (512, 9, 1), (256, 18, 1)],
+  'RAM64K36': [(4096, 1, 1), (2048, 2, 1), (1024, 4, 1), (512, 9, 1), (256, 18, 1), (128, 36, 1)],
+  'LSRAM': [(16384, 1, 1), (8192, 2, 1), (4096, 4, 1), (2048, 9, 1), (1024, 18, 1), (512, 36, 1)],
+  'NX-RAM': [(16384, 3, 1), (8192, 6, 1), (4096, 12, 1), (2048, 24, 1)]}
+# RAM block and number of blocks of the targets of synthesis_farm.py
+DEVICES = {'XC5VFX130T': ('RAMB36', 298), 'XQR5VFX130': ('RAMB36', 298), 'ZC706': ('RAMB36', 545), 'zedboard': ('RAMB36', 140),
+           'A3PE3000': ('RAM4K9', 112), 'RTAX4000S': ('RAM64K36', 120), 'RT4G4150': ('LSRAM', 209),
+           'NX1H35S': ('NX-RAM', 56), 'NX1H140TSP': ('NX-RAM', 192)}
+
+def log2(i):
+  # Bits needed to represent i (log2 of shyloc_functions.vhd: log2(16) = 5)
+  return max(i, 0).bit_length()
+
+def log2_floor(i):
+  # Smallest j with 2^j >= i (log2_floor of shyloc_functions.vhd)
+  j = 0
+  while 2 ** j < i:
+    j += 1
+  return j
+
+def ceil(a, b):
+  return -(-a // b)
+
+def edac_width(width):
+  # Bit width stored by fifop2_EDAC: data aligned to the EDAC widths plus the check bits
+  aligned = [w for w in [4, 8, 16, 24, 32, 40, 48, 64] if width <= w]
+  if not aligned:
+    raise ValueError('%d bits not supported by the EDAC' % width)
+  return aligned[0] + (4 if aligned[0] == 4 else 8)
+
+def fifo(instance, width, w_addr, edac=0, count=1):
+  # count fifop2 FIFOs of 2^W_ADDR elements: (instance, count, depth, stored width)
+  return (instance, count, 2 ** w_addr, edac_width(width) if edac in (1, 3) else width)
+
+def record_fifo(instance, constants, w_addr):
+  # FIFOs of record_2d_fifo (fields of ld_record_type), without EDAC in all the architectures
+  full = 0 if runtime_model.integer(constants, 'PREDICTION_GEN') == 1 else 1
+  d = runtime_model.integer(constants, 'D_GEN')
+  return [fifo(instance + '/fifo_0_2d_ld', d + 4, w_addr, 0, full * 3 + 1), fifo(instance + '/fifo_1_opcode', 5, w_addr),
+          fifo(instance + '/fifo_2_s_predict', d + 1, w_addr), fifo(instance + '/fifo_3_ls_predict', d + 3, w_addr),
+          fifo(instance + '/fifo_4_z_predict', 16, w_addr), fifo(instance + '/fifo_5_t_predict', 32, w_addr)]
+
+def estimate(constants):
+  # Memories inferred by the RTL for the generics (constants of ccsds123_parameters.vhd), as
+  # (instance, count, depth, width)
+  value = dict([(name, runtime_model.integer(constants, name)) for name in GENERICS])
+  arch = runtime_model.ARCHITECTURES.get(str(value['PREDICTION_TYPE']), 'bil')
+  d, nx, nz, p_max, edac = value['D_GEN'], value['Nx_GEN'], value['Nz_GEN'], value['P_MAX'], value['EDAC']
+  w_ld, w_wei = d + 4, value['OMEGA_GEN'] + 3
+  full = 0 if value['PREDICTION_GEN'] == 1 else 1
+  cz = full * 3 + p_max
+  height_tree = log2_floor(ceil(cz, 2)) + 1
+  ahb_fifo = 2 ** log2(max(2 * 5, 16))
+  memories = [fifo('fifo_0_curr', d, max(1, log2(16)))]
+  if arch in ('bip', 'bip-mem'):
+    memories += [fifo('fifo_1_left', d, log2(nz), edac), fifo('fifo_2_top', d, log2(nz), edac), fifo('fifo_3_top_left', d, log2(nz), edac)]
+    if arch == 'bip':
+      memories.append(fifo('fifo_4_top_right', d, log2(nz * nx), edac))
+    else:
+      memories.append(('fifo_top_right_ahb', 2, ahb_fifo, 32))
+    if cz > 0:
+      w_addr = log2(height_tree + 1 + 2)
+      memories += [fifo('ld_vector_temp_storage', w_ld, w_addr, 0, cz), fifo('wei_vector_temp_storage', w_wei, w_addr, 0, cz),
+                   fifo('wei_update_storage', w_wei, log2(nz), edac, cz)]
+  elif arch == 'bsq':
+    memories += [fifo('fifo_1_top_right', d, log2(nx), edac)] + record_fifo('record_fifo_2', constants, 4)
+    memories += [('fifo_ld_ahb', 2, 2 ** log2(32), 32), fifo('fifo_3_ld', w_ld, log2(p_max))]
+    if full:
+      memories.append(fifo('localdiff_dir_fifo_4', w_ld, log2(height_tree + 1), 0, 3))
+    if p_max > 0:
+      memories.append(fifo('fifo_5_weight_update', w_wei, log2(p_max)))
+  else:
+    if arch == 'bil':
+      memories.append(fifo('fifo_1_top_right', d, log2((nx + 1) * nz), edac))
+    else:
+      memories.append(('fifo_top_right_ahb', 2, ahb_fifo, 32))
+    memories += record_fifo('record_fifo_2', constants, 4)
+    if p_max > 0:
+      memories.append(fifo('ld_central_vector_fifo_3', w_ld, log2(nx), 0, p_max))
+    if cz > 0:
+      memories += [fifo('fifo_4_ld_store_to_update', w_ld, 2, 0, cz),
+                   fifo('fifo_5_wei_storage_from_dot_to_update', w_wei, 2, edac if arch == 'bil-mem' else 0, cz),
+                   fifo('fifo_6_wei_update_storage', w_wei, log2(nz), edac, cz)]
+  if value['ENCODING_TYPE'] == 1:
+    memories.append(fifo('sample/fifo_curr', d, max(1, log2(16))))
+    if arch != 'bsq':
+      memories.append(fifo('sample/fifoacc', 32, log2(nz), edac if arch in ('bil', 'bil-mem') else 0))
+  memories += [fifo('dispatcher/fifo_0_header', value['W_BUFFER_GEN'], log2_floor(8)), fifo('dispatcher/fifo_1_n_bits', 7, log2_floor(8)),
+               fifo('dispatcher/fifo_2_mapped', d, log2_floor(16)), fifo('dispatcher/fifo_3_sample', value['W_BUFFER_GEN'], log2_floor(16)),
+               ('ahbs/aram2', 1, 8, 32)]
+  return memories
+
+def memory_bits(memories):
+  return sum([count * depth * width for instance, count, depth, width in memories])
+
+def blocks(depth, width, ram_block):
+  # Fewest RAM blocks of a memory of depth x width
+  return min([ceil(depth, d) * ceil(width, w) * b for d, w, b in RAM_BLOCKS[ram_block]])
+
+def block_rams(memories, device):
+  # Estimated RAM blocks of the memories on a device
+  ram_block = DEVICES[device][0]
+  return sum([count * blocks(depth, width, ram_block) for instance, count, depth, width in memories if depth >= BLOCK_DEPTH])
+
+def fits(memories, device):
+  return block_rams(memories, device) <= DEVICES[device][1]
+
+def row_constants(fields, header):
+  # Generics of a row of a *.csv file, as written by run_vhdl_tests_123.py in ccsds123_parameters.vhd
+  architectures = dict([(name, number) for number, name in runtime_model.ARCHITECTURES.items()])
+  constants = {}
+  for name in GENERICS:
+    if fields[header.index(PARAMETER_SET)] == '0' and name in IMAGE_COLUMNS:
+      constants[name] = fields[header.index(IMAGE_COLUMNS[name])]
+    else:
+      constants[name] = fields[header.index(name)]
+  constants['PREDICTION_TYPE'] = architectures.get(constants['PREDICTION_TYPE'], '3')
+  return constants
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Estimate the on-chip memory of the configurations of a *.csv file and check that it fits the devices')
+  parser.add_argument('csv_file', help='*.csv file with the configurations')
+  parser.add_argument('-t', '--test', action='append', default=[], help='estimate only this configuration (can be repeated)')
+  parser.add_argument('--target', action='append', default=[], help='check only this device (can be repeated)')
+  parser.add_argument('-v', '--verbose', action='store_true', help='list the memories of every configuration')
+  args = parser.parse_args()
+  unknown = [t for t in args.target if not t in DEVICES]
+  if unknown:
+    parser.error('unknown device %s, the devices are: %s' % (', '.join(unknown), ', '.join(sorted(DEVICES))))
+  devices = args.target or sorted(DEVICES)
+  csv_handle = open(args.csv_file, 'rb')
+  lines = csv_handle.read().decode('latin-1').splitlines()
+  csv_handle.close()
+  header = lines[1].split(',')
+  rows = [line.split(',') for line in lines[2:] if line.split(',')[0].strip() and (not args.test or line.split(',')[0] in args.test)]
+  if not rows:
+    parser.error('no configuration selected in ' + args.csv_file)
+  print('%-24s %-8s %12s %s' % ('TestId', 'Arch', 'Memory bits', ' '.join(['%11s' % d for d in devices])))
+  not_fitting = 0
+  for fields in rows:
+    try:
+      constants = row_constants(fields, header)
+      memories = estimate(constants)
+    except ValueError as e:
+      print('%-24s %s' % (fields[0], e))
+      not_fitting += 1
+      continue
+    usage = []
+    for device in devices:
+      used = block_rams(memories, device)
+      usage.append('%g/%d%s' % (used, DEVICES[device][1], '' if used <= DEVICES[device][1] else '!'))
+    if [u for u in usage if u.endswith('!')]:
+      not_fitting += 1
+    print('%-24s %-8s %12d %s' % (fields[0], runtime_model.ARCHITECTURES.get(constants['PREDICTION_TYPE']), memory_bits(memories), ' '.join(['%11s' % u for u in usage])))
+    if args.verbose:
+      for instance, count, depth, width in memories:
+        print('    %-42s %3d x %6d x %3d bits  %s' % (instance, count, depth, width, 'block RAM' if depth >= BLOCK_DEPTH else 'registers'))
+  print('\n%d configurations, %d not fitting all the devices (block RAMs used/available, ! over the device)' % (len(rows), not_fitting))
+  sys.exit(1 if not_fitting else 0)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Open-source simulator backends (GHDL and nvc) used by sim_runner.py --simulator ghdl|nvc.
+#
+# The compile units are the ones of the *.do scripts generated by run_vhdl_tests_123.py (see
+# compile_cache.py), so the compile order of targets_list.csv and the parameter packages of every
+# test are the same as with QuestaSim. Every vcom command is translated into an analysis command of
+# the simulator, with every library in its own folder (<folder>/<library>, as the Questa libraries):
+# the libraries of the folder and the shared ones (vendor libraries compiled once in lib_cache) are
+# given as search paths.
+# Everything is analysed as VHDL-2008 (the testbench uses std.env), with relaxed rules and the
+# Synopsys packages needed by GRLIB. The testbench is elaborated and run in the same command, with
+# generics of ccsds_shyloc_tb given on the command line (-g) and the bound of its simulated time
+# (--stop-time, see runtime_model.simulation_bound); with a wave file, all the signals are dumped to
+# it (GHW format for GHDL, FST for nvc).
+# Code coverage and the examine command are not available: a test passes when the simulator ends
+# without error after the "Testbench done" note of the testbench (and, as with QuestaSim, when its
+# compressed image matches the reference, see compare_output.py).
+#
+# Module usage (see sim_runner.py):
+#   simulator = open_simulators.SIMULATORS['ghdl']()
+#   command = simulator.analyse_command(unit, folder, shared_libraries)
+#   command = simulator.run_command(folder, shared_libraries, generics, wave_file, bound_us)
+
+import os, subprocess
+
+TOP = 'ccsds_shyloc_tb'
+ARCHITECTURE = 'arch'
+
+def library_folders(folder, shared_libraries):
+  # Folders of all the libraries available in folder: its own ones and the shared ones
+  libraries = {}
+  if os.path.isdir(folder):
+    for name in sorted(os.listdir(folder)):
+      if os.path.isdir(os.path.join(folder, name)):
+        libraries[name] = os.path.abspath(os.path.join(folder, name))
+  libraries.update(shared_libraries)
+  return libraries
+
+class OpenSimulator(object):
+  tool = None
+  wave_extension = None
+
+  def version(self):
+    try:
+      process = subprocess.Popen([self.tool, '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+      return process.communicate()[0].decode('utf-8', 'replace').strip()
+    except OSError:
+      return 'unknown'
+
+  def passed(self, returncode, log):
+    # Pass/fail of a simulation from its exit code and transcript
+    return returncode == 0 and 'Testbench done' in log and not 'severity failure' in log.lower()
+
+class Ghdl(OpenSimulator):
+  tool = 'ghdl'
+  wave_extension = '.ghw'
+  options = ['--std=08', '-frelaxed', '-fsynopsys', '-fexplicit']
+
+  def search_paths(self, folder, shared_libraries):
+    return ['-P' + path for name, path in sorted(library_folders(folder, shared_libraries).items())]
+
+  def analyse_command(self, unit, folder, shared_libraries):
+    workdir = os.path.abspath(os.path.join(folder, unit.library))
+    return ([self.tool, '-a'] + self.options + ['--work=' + unit.library, '--workdir=' + workdir] +
+            self.search_paths(folder, shared_libraries) + [unit.source])
+
+  def run_command(self, folder, shared_libraries, generics, wave_file=None, bound_us=None):
+    workdir = os.path.abspath(os.path.join(folder, 'work'))
+    wave = ['--wave=' + wave_file] if wave_file else []
+    stop = ['--stop-time=%dus' % bound_us] if bound_us else []
+    return ([self.tool, '--elab-run'] + self.options + ['--work=work', '--workdir=' + workdir] +
+            self.search_paths(folder, shared_libraries) + [TOP, ARCHITECTURE] +
+            ['-g' + name + '=' + value for name, value in sorted(generics.items())] + ['--ieee-asserts=disable-at-0'] + wave + stop)
+
+class Nvc(OpenSimulator):
+  tool = 'nvc'
+  wave_extension = '.fst'
+
+  def global_options(self, folder, library, shared_libraries):
+    options = ['--std=2008']
+    for path in sorted(set([os.path.dirname(p) for p in library_folders(folder, shared_libraries).values()])):
+      options += ['-L', path]
+    return options + ['--work=' + library + ':' + os.path.abspath(os.path.join(folder, library))]
+
+  def analyse_command(self, unit, folder, shared_libraries):
+    return [self.tool] + self.global_options(folder, unit.library, shared_libraries) + ['-a', '--relaxed', unit.source]
+
+  def run_command(self, folder, shared_libraries, generics, wave_file=None, bound_us=None):
+    wave = ['--wave=' + wave_file] if wave_file else []
+    stop = ['--stop-time=%dus' % bound_us] if bound_us else []
+    return ([self.tool] + self.global_options(folder, 'work', shared_libraries) + ['-e'] +
+            ['-g' + name + '=' + value for name, value in sorted(generics.items())] + [TOP, '-r'] + wave + stop)
+
+SIMULATORS = {'ghdl': Ghdl, 'nvc': Nvc}
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Result cache used by sim_runner.py.
+#
+# The result of a test (passed/failed and coverage database) is stored in
+# modelsim/result_cache under a key computed by sim_runner.py from all the inputs of the
+# simulation: fingerprints of the compiled units (sources of targets_list.csv, generated parameter
+# packages and testbench), simulation commands, stimulus and reference images and simulator version.
+# A test whose key is already in the cache is not simulated again: its stored result is reported
+# and its coverage files are copied back to their usual place.
+#
+# Hashes of the (possibly large) image files are kept in file_hashes.json and only computed again
+# when the size or modification time of the file changes.
+# The wall-clock time (in seconds) and the simulated time (in ns, when found in the transcript) of
+# the last simulation of every test are kept in test_times.json, used to weight the tests
+# (coverage_subset.py) and to predict their duration (runtime_model.py).
+
+import os, json, shutil, hashlib, threading
+
+def read_measurements(folder):
+  # Measurements of the tests stored in the result cache folder: test identifier -> {'wall': seconds,
+  # 'simulated_ns': simulated time or None}
+  times_file = os.path.join(folder, 'test_times.json')
+  measurements = {}
+  if os.path.exists(times_file):
+    times_handle = open(times_file, 'r')
+    try:
+      measurements = json.load(times_handle)
+    except ValueError:
+      pass
+    times_handle.close()
+  for test_id in measurements:
+    if not isinstance(measurements[test_id], dict):
+      measurements[test_id] = {'wall': measurements[test_id], 'simulated_ns': None}
+  return measurements
+
+def read_times(folder):
+  # Wall-clock simulation times of the tests stored in the result cache folder (test identifier -> seconds)
+  return dict([(t, m['wall']) for t, m in read_measurements(folder).items()])
+
+class ResultCache(object):
+  def __init__(self, folder):
+    self.folder = folder
+    if not os.path.exists(folder):
+      os.makedirs(folder)
+    self.hashes_file = os.path.join(folder, 'file_hashes.json')
+    self.hashes = {}
+    if os.path.exists(self.hashes_file):
+      hashes_handle = open(self.hashes_file, 'r')
+      try:
+        self.hashes = json.load(hashes_handle)
+      except ValueError:
+        pass
+      hashes_handle.close()
+    self.times_file = os.path.join(folder, 'test_times.json')
+    self.times = read_measurements(folder)
+    self.lock = threading.Lock()
+
+  def file_hash(self, path):
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+      return 'missing'
+    stat = os.stat(path)
+    known = self.hashes.get(path)
+    if known and known[0] == stat.st_size and known[1] == stat.st_mtime:
+      return known[2]
+    digest = hashlib.sha1()
+    file_handle = open(path, 'rb')
+    block = file_handle.read(1 << 20)
+    while block:
+      digest.update(block)
+      block = file_handle.read(1 << 20)
+    file_handle.close()
+    self.hashes[path] = [stat.st_size, stat.st_mtime, digest.hexdigest()]
+    return digest.hexdigest()
+
+  def save_hashes(self):
+    hashes_handle = open(self.hashes_file, 'w')
+    json.dump(self.hashes, hashes_handle, indent=1)
+    hashes_handle.close()
+
+  def set_time(self, test_id, seconds, simulated_ns=None):
+    self.lock.acquire()
+    self.times[test_id] = {'wall': round(seconds, 1), 'simulated_ns': simulated_ns}
+    self.lock.release()
+
+  def save_times(self):
+    times_handle = open(self.times_file, 'w')
+    json.dump(self.times, times_handle, indent=1, sort_keys=True)
+    times_handle.close()
+
+  def entry(self, key):
+    return os.path.join(self.folder, key[:2], key)
+
+  def get(self, key):
+    # Stored status ('passed' or 'failed') of the key, or None
+    status_file = os.path.join(self.entry(key), 'status.txt')
+    if not os.path.exists(status_file):
+      return None
+    status_handle = open(status_file, 'r')
+    status = status_handle.read().strip()
+    status_handle.close()
+    if status in ['passed', 'failed']:
+      return status
+    return None
+
+  def restore(self, key, files):
+    # Copies the stored files back; files maps the stored name to its destination path
+    for name in files:
+      stored = os.path.join(self.entry(key), name)
+      if os.path.exists(stored):
+        if not os.path.exists(os.path.dirname(files[name])):
+          os.makedirs(os.path.dirname(files[name]))
+        shutil.copyfile(stored, files[name])
+
+  def put(self, key, status, files):
+    # Stores the status and the existing files (name -> current path) of a simulated test. The entry is
+    # written in a temporary folder and renamed, so an interrupted run does not leave partial entries
+    if not status in ['passed', 'failed']:
+      return
+    entry = self.entry(key)
+    temp = entry + '.tmp' + str(threading.current_thread().ident)
+    if os.path.exists(temp):
+      shutil.rmtree(temp)
+    os.makedirs(temp)
+    for name in files:
+      if os.path.exists(files[name]):
+        shutil.copyfile(files[name], os.path.join(temp, name))
+    status_handle = open(os.path.join(temp, 'status.txt'), 'w')
+    status_handle.write(status + '\n')
+    status_handle.close()
+    self.lock.acquire()
+    try:
+      if os.path.exists(entry):
+        shutil.rmtree(entry)
+      os.rename(temp, entry)
+    finally:
+      self.lock.release()
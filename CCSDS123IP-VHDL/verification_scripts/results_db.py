@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Database of the results of the regression runs (SQLite, modelsim/results.db) written by
+# sim_runner.py, also runnable as a script to query it or to add the results of a serial run.
+#
+# Every run of sim_runner.py adds a row to the runs table (start time, git revision of the database,
+# simulator and command line) and a row to the results table for every test as soon as it finishes:
+# status, how it was obtained (simulated, cached or resumed, see sim_runner.py), its generic
+# configuration (ConfigHash of the manifest) and result key, and for the simulated tests the
+# wall-clock time, the simulated time, the elaboration time (load of the testbench, QuestaSim only)
+# and the compile time of the units that changed, in seconds. Failed tests keep the first bit of
+# their output that differs from the reference (see compare_output.py), and passed tests with a
+# saved coverage database their total coverage (vcover report -summary of cover/<TestId>_cover.ucdb,
+# see coverage_merge.py; from tb_stimuli/<TestId>/report_coverage.txt for the serial runs). Unlike
+# verification_report.txt, the results of all the runs are kept.
+# The results of a serial run (all_tests.do) are added with the import command, from
+# verification_report.txt and verification_report_not_performed.txt.
+#
+# Queries:
+#   slowest    tests with the longest wall-clock time in their last simulation
+#   regressed  tests whose last wall-clock time is more than PERCENT % longer than their last one
+#              simulated at least DAYS days before
+#   flaky      tests that both passed and failed with the same result key (same inputs)
+#   history    results of a test in every run
+#
+# Some command line examples:
+# results_db.py ../modelsim slowest
+# results_db.py ../modelsim slowest -n 50
+# results_db.py ../modelsim regressed --percent 20 --days 7
+# results_db.py ../modelsim flaky
+# results_db.py ../modelsim history 20_Test
+# results_db.py ../modelsim import
+
+#How to run this script
+#  results_db.py
+#(1) path to the modelsim folder of the IP core database
+#(2) query: slowest, regressed, flaky, history or import
+#(3) test identifier (history only)
+#-n N          number of tests listed by slowest (default 20)
+#--percent P   runtime increase reported by regressed (default 20)
+#--days D      age of the reference time of regressed (default 7)
+#
+# Module usage (see sim_runner.py):
+#   database = results_db.ResultsDatabase(modelsim_folder)
+#   run_id = database.start_run(simulator, command)
+#   database.add(run_id, test_id, status, source, config_hash, result_key, measures)
+#   database.close()
+
+from __future__ import print_function
+import os, re, csv, time, sqlite3, argparse, subprocess, threading
+
+DATABASE_FILE = 'results.db'
+# Measures of a result, columns of the results table
+MEASURES = ['wall_s', 'simulated_ns', 'elaboration_s', 'compile_s', 'coverage', 'failure_bit']
+SCHEMA = ['CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started TEXT, revision TEXT, simulator TEXT, command TEXT)',
+          'CREATE TABLE IF NOT EXISTS results (run_id INTEGER, test_id TEXT, finished TEXT, status TEXT, source TEXT, '
+          'config_hash TEXT, result_key TEXT, ' + ', '.join([m + ' REAL' for m in MEASURES]) + ')',
+          'CREATE INDEX IF NOT EXISTS results_test ON results (test_id, finished)']
+
+def now(seconds=None):
+  return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seconds))
+
+def git_revision(folder):
+  # Commit of the git working copy of folder, with "-dirty" for uncommitted changes ('' without git)
+  try:
+    process = subprocess.Popen(['git', 'describe', '--always', '--dirty'], cwd=folder, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return process.communicate()[0].decode('utf-8', 'replace').strip()
+  except OSError:
+    return ''
+
+def total_coverage(text):
+  # Total coverage (%) of a vcover report (by file, by instance or summary), or None
+  match = re.search(r'Total Coverage By \w+.*:\s*([\d.]+)%', text)
+  return float(match.group(1)) if match else None
+
+def report_coverage(test_folder, since=0):
+  # Total coverage (%) of the per-test coverage report written after since (seconds), or None
+  report_file = os.path.join(test_folder, 'report_coverage.txt')
+  if not os.path.exists(report_file) or os.path.getmtime(report_file) < since:
+    return None
+  report_handle = open(report_file, 'r')
+  coverage = total_coverage(report_handle.read())
+  report_handle.close()
+  return coverage
+
+class ResultsDatabase(object):
+  def __init__(self, modelsim_folder):
+    self.modelsim_folder = modelsim_folder
+    # The results are added by the worker threads of sim_runner.py
+    self.connection = sqlite3.connect(os.path.join(modelsim_folder, DATABASE_FILE), check_same_thread=False)
+    for statement in SCHEMA:
+      self.connection.execute(statement)
+    self.connection.commit()
+    self.lock = threading.Lock()
+
+  def execute(self, statement, values=()):
+    self.lock.acquire()
+    try:
+      cursor = self.connection.execute(statement, values)
+      self.connection.commit()
+      return cursor
+    finally:
+      self.lock.release()
+
+  def query(self, statement, values=()):
+    return self.connection.execute(statement, values).fetchall()
+
+  def start_run(self, simulator, command=''):
+    return self.execute('INSERT INTO runs (started, revision, simulator, command) VALUES (?, ?, ?, ?)',
+                        (now(), git_revision(self.modelsim_folder), simulator, command)).lastrowid
+
+  def add(self, run_id, test_id, status, source, config_hash='', result_key='', measures={}):
+    # Result of a test, committed at once so it is kept when the run is interrupted. measures maps
+    # names of MEASURES to their values (None or missing when not known)
+    self.execute('INSERT INTO results (run_id, test_id, finished, status, source, config_hash, result_key, ' + ', '.join(MEASURES) + ') '
+                 'VALUES (' + ', '.join(['?'] * (7 + len(MEASURES))) + ')',
+                 (run_id, test_id, now(), status, source, config_hash, result_key) + tuple([measures.get(m) for m in MEASURES]))
+
+  def close(self):
+    self.connection.close()
+
+def last_times(database, before=None):
+  # Last simulated wall-clock time of every test (finished before the given time): TestId -> (finished, seconds)
+  condition = '' if before is None else ' AND finished < ?'
+  rows = database.query('SELECT test_id, finished, wall_s FROM results WHERE source = \'simulated\' AND wall_s IS NOT NULL' + condition +
+                        ' ORDER BY finished', () if before is None else (before,))
+  return dict([(test_id, (finished, seconds)) for test_id, finished, seconds in rows])
+
+def slowest(database, count=20):
+  times = last_times(database)
+  return sorted([(seconds, test_id, finished) for test_id, (finished, seconds) in times.items()], reverse=True)[:count]
+
+def regressed(database, percent=20.0, days=7.0):
+  # Tests whose last time is more than percent % longer than their last time at least days old:
+  # (increase %, TestId, reference seconds, last seconds), largest increase first
+  reference = last_times(database, now(time.time() - days * 86400))
+  tests = []
+  for test_id, (finished, seconds) in last_times(database).items():
+    if test_id in reference and reference[test_id][1] > 0:
+      increase = 100.0 * (seconds / reference[test_id][1] - 1)
+      if increase > percent:
+        tests.append((increase, test_id, reference[test_id][1], seconds))
+  return sorted(tests, reverse=True)
+
+def flaky(database):
+  # Tests that passed and failed with the same inputs: (TestId, passes, failures, last finished)
+  return database.query('SELECT test_id, SUM(status = \'passed\'), SUM(status = \'failed\'), MAX(finished) FROM results '
+                        'WHERE source = \'simulated\' AND result_key != \'\' AND status IN (\'passed\', \'failed\') '
+                        'GROUP BY test_id, result_key HAVING COUNT(DISTINCT status) > 1 ORDER BY test_id')
+
+def history(database, test_id):
+  return database.query('SELECT runs.started, runs.revision, results.status, results.source, ' + ', '.join(['results.' + m for m in MEASURES]) +
+                        ' FROM results JOIN runs ON runs.id = results.run_id WHERE results.test_id = ? ORDER BY results.finished', (test_id,))
+
+def import_serial(database, modelsim_folder):
+  # Adds the results of the last serial run (verification_report*.txt of tb_scripts) as a new run;
+  # returns the number of results
+  tb_scripts_folder = os.path.join(modelsim_folder, 'tb_scripts')
+  config_hashes = {}
+  manifest = os.path.join(tb_scripts_folder, 'test_manifest.csv')
+  if os.path.exists(manifest):
+    manifest_handle = open(manifest, 'r')
+    config_hashes = dict([(row['TestId'], row['ConfigHash']) for row in csv.DictReader(manifest_handle)])
+    manifest_handle.close()
+  results = []
+  # Lines "<TestId> passed|failed" of eval_result and "<TestId>\t: Can't perform simulation..." of
+  # run_vhdl_tests_123.py
+  for name in ['verification_report.txt', 'verification_report_not_performed.txt']:
+    report_file = os.path.join(tb_scripts_folder, name)
+    if os.path.exists(report_file):
+      report_handle = open(report_file, 'r')
+      for line in report_handle:
+        result = line.split()
+        if len(result) == 2 and result[1] in ['passed', 'failed']:
+          results.append((result[0], result[1]))
+        elif len(result) > 2 and result[1] == ':':
+          results.append((result[0], 'not performed'))
+      report_handle.close()
+  if results:
+    run_id = database.start_run('questa', 'all_tests.do')
+    for test_id, status in results:
+      coverage = report_coverage(os.path.join(modelsim_folder, 'tb_stimuli', test_id))
+      database.add(run_id, test_id, status, 'serial', config_hashes.get(test_id, ''), '', {'coverage': coverage})
+  return len(results)
+
+def value(number, format='%.1f'):
+  return '-' if number is None else format % number
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Query the database of regression results or add the results of a serial run')
+  parser.add_argument('modelsim_folder', help='modelsim folder of the IP core database')
+  parser.add_argument('query', choices=['slowest', 'regressed', 'flaky', 'history', 'import'], help='query')
+  parser.add_argument('test', nargs='?', help='test identifier (history)')
+  parser.add_argument('-n', type=int, default=20, help='number of tests listed by slowest')
+  parser.add_argument('--percent', type=float, default=20.0, help='runtime increase reported by regressed')
+  parser.add_argument('--days', type=float, default=7.0, help='age in days of the reference time of regressed')
+  args = parser.parse_args()
+  if args.query == 'history' and not args.test:
+    parser.error('history needs a test identifier')
+  modelsim_folder = os.path.abspath(args.modelsim_folder)
+  database = ResultsDatabase(modelsim_folder)
+  if args.query == 'slowest':
+    for seconds, test_id, finished in slowest(database, args.n):
+      print('%-24s %10.1f s  (%s)' % (test_id, seconds, finished))
+  elif args.query == 'regressed':
+    for increase, test_id, reference, seconds in regressed(database, args.percent, args.days):
+      print('%-24s %+7.1f %%  %10.1f s -> %.1f s' % (test_id, increase, reference, seconds))
+  elif args.query == 'flaky':
+    for test_id, passes, failures, finished in flaky(database):
+      print('%-24s passed %d times, failed %d times with the same inputs (last %s)' % (test_id, passes, failures, finished))
+  elif args.query == 'history':
+    print('Started              Revision        Status   Source     Wall (s)  Simulated (ns)  Elab (s)  Compile (s)  Coverage  Failure bit')
+    for row in history(database, args.test):
+      started, revision, status, source, wall, simulated, elaboration, compile, coverage, failure = row
+      print('%-20s %-15s %-8s %-10s %8s  %14s  %8s  %11s  %8s  %11s' % (started, revision, status, source, value(wall), value(simulated, '%.0f'),
+            value(elaboration), value(compile), value(coverage, '%.2f%%'), value(failure, '%d')))
+  else:
+    print('%d results added to ' % import_serial(database, modelsim_folder) + DATABASE_FILE)
+  database.close()
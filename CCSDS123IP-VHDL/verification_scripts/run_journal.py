@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Append-only journal of the regression runs (modelsim/run_journal.csv), written by sim_runner.py and
+# by the all_tests.do script of run_vhdl_tests_123.py.
+#
+# Every run writes a 'start' row with the identifiers of its tests, a 'result' row as soon as every
+# test finishes (with its status, wall-clock time and result key, see sim_runner.py) and an 'end' row
+# when all its tests are completed (passed or failed: a run with errors can be resumed too). Rows are
+# only appended, and flushed to disk one by one, so the outcome of every finished test is kept when
+# the run is interrupted (crash, license drop, Ctrl-C).
+#
+# A run without 'end' row was interrupted: sim_runner.py --resume runs the tests of the last run again
+# (with a 'resume' row instead of 'start', so the rows of the interrupted run still count), except the
+# ones whose result row has the same result key as now (the inputs of the test did not change) and a
+# passed or failed status. The rows of all_tests.do have no result key, so the tests of a serial run
+# are always simulated again.
+#
+# Row format (comma separated):
+#   start,<time>,<TestId> <TestId> ...,<command line>
+#   resume,<time>,<TestId> <TestId> ...,<command line>
+#   result,<time>,<TestId>,<status>,<seconds>,<result key>
+#   end,<time>
+#
+# Module usage (see sim_runner.py):
+#   journal = run_journal.RunJournal(modelsim_folder)
+#   test_ids, completed = journal.interrupted_run()
+#   journal.start(test_ids, command, resume)
+#   journal.record(test_id, status, seconds, key)
+#   journal.end()
+
+import os, csv, time, threading
+
+JOURNAL_FILE = 'run_journal.csv'
+
+def now():
+  return time.strftime('%Y-%m-%d %H:%M:%S')
+
+class RunJournal(object):
+  def __init__(self, modelsim_folder):
+    self.path = os.path.join(modelsim_folder, JOURNAL_FILE)
+    self.lock = threading.Lock()
+
+  def rows(self):
+    if not os.path.exists(self.path):
+      return []
+    journal_handle = open(self.path, 'r')
+    rows = [row for row in csv.reader(journal_handle) if row]
+    journal_handle.close()
+    return rows
+
+  def interrupted_run(self):
+    # Tests of the last run when it was interrupted (None when it is complete) and its completed tests:
+    # TestId -> (status, result key) of their last result row. A 'start' row begins a new run, a
+    # 'resume' row continues the previous one
+    test_ids = None
+    completed = {}
+    for row in self.rows():
+      if row[0] == 'end':
+        test_ids = None
+        completed = {}
+      elif row[0] in ['start', 'resume'] and len(row) > 2:
+        if row[0] == 'start':
+          completed = {}
+        test_ids = row[2].split()
+      elif row[0] == 'result' and len(row) > 5 and row[3] in ['passed', 'failed']:
+        completed[row[2]] = (row[3], row[5])
+    if test_ids is None:
+      return None, {}
+    return test_ids, completed
+
+  def append(self, row):
+    # Rows are written and synced one by one, so they survive an interrupted run
+    self.lock.acquire()
+    try:
+      journal_handle = open(self.path, 'a')
+      csv.writer(journal_handle, lineterminator='\n').writerow(row)
+      journal_handle.flush()
+      os.fsync(journal_handle.fileno())
+      journal_handle.close()
+    finally:
+      self.lock.release()
+
+  def start(self, test_ids, command='', resume=False):
+    self.append(['resume' if resume else 'start', now(), ' '.join(test_ids), command])
+
+  def record(self, test_id, status, seconds, key=''):
+    self.append(['result', now(), test_id, status, '%.1f' % seconds, key])
+
+  def end(self):
+    self.append(['end', now()])
@@ -24,6 +24,8 @@
 
 # Some command line examples:
 # run_vhdl_tests_123.py testcases_123.csv ../images/raw ../images/compressed ../images/reference ../ ../../CCSDS121IP-VHDL modelsim
+# run_vhdl_tests_123.py testcases_123.csv ../images/raw ../images/compressed ../images/reference ../ ../../CCSDS121IP-VHDL ghdl
+# run_vhdl_tests_123.py testcases_123_e_all.csv ../images/raw ../images/compressed ../images/reference ../ ../../CCSDS121IP-VHDL modelsim --shard 2/4
 # run_vhdl_tests_123.py synthesis_params_123.csv ../images/raw ../images/compressed ../images/reference ../ ../../CCSDS121IP-VHDL synplify
 # run_vhdl_tests_123.py synthesis_params_123.csv ../images/raw ../images/compressed ../images/reference ../ ../../CCSDS121IP-VHDL ise
 # run_vhdl_tests_123.py synthesis_params_123.csv ../images/raw ../images/compressed ../images/reference ../ ../../CCSDS121IP-VHDL vivado
@@ -43,12 +45,15 @@
 #(6) IP core database folder CCSDS121
 #(7) select one among the possible options: 
 #modelsim --> generates TCL scripts for simulations
+#ghdl, nvc --> generates the same scripts, to be run with sim_runner.py --simulator ghdl|nvc
 #synplify --> generates TCL scripts for synthesis with synplify
 #ise --> generates TCL scripts for synthesis with ise
 #vivado --> generates TCL scripts for synthesis with vivado
 #dc --> generates TCL scripts for synthesis with dc (Design Compiler)
 #modelsim-ps --> generates TCL scripts for post-synthesis simulations
 #synplify-ps --> generates TCL scripts for synthesis with synplify, stores post-synthesis model
+#--shard i/N (options modelsim, modelsim-ps, ghdl and nvc) only simulate the tests of shard i of N, with the
+#            same predicted simulation time in every shard (see shards.py)
 #(7) if specified, select on which technology to perform the synthesis or post-synthesis simulations (applicable to options: 
 # modelsim-ps, synplify-ps. It can be one among these options
 #XC5VFX130T
@@ -61,13 +66,22 @@
 # Now the parameter HMAXBURST is configured from the csv file instead of being set to a fixed value
 ############################################################################
 
-import sys, os, csv, glob, filecmp, shutil
+import sys, os, csv, glob, filecmp, shutil, hashlib
+import shards
+import runtime_model
 from shutil import copyfile
 from os.path import sep
 
 if __name__ == "__main__":
   #print len(sys.argv)
   print('*****************************************\n')
+  shard = None
+  if '--shard' in sys.argv:
+    position = sys.argv.index('--shard')
+    if position + 1 >= len(sys.argv):
+      raise Exception('Error, --shard needs the shard to generate as i/N (e.g. --shard 2/4)')
+    shard = shards.parse_shard(sys.argv[position + 1])
+    del sys.argv[position:position + 2]
   if len(sys.argv) < 6:
     raise Exception('Error, the command line for running the tests is: run_vhdl_tests_123.py (1) csv_parameters_file (2) original_img_folder (3) compressed_img_folder (4) reference_img_folder (5) IP core 123 database folder (6) IP core 121 database folder (7) modelsim')
   try:
@@ -104,6 +118,11 @@ if __name__ == "__main__":
     if sys.argv[7]== "modelsim" or sys.argv[7]== "modelsim-ps":
       gen_simulation = True
       print "Generating parameters files (*.vhd) and simulation files for QuestaSim (*.do)"
+    elif sys.argv[7] == "ghdl" or sys.argv[7] == "nvc":
+      # Same scripts as for QuestaSim: sim_runner.py --simulator ghdl|nvc translates their compile
+      # commands and runs the testbench with the open-source simulator (see open_simulators.py)
+      gen_simulation = True
+      print "Generating parameters files (*.vhd) and simulation files to run with " + sys.argv[7] + " (sim_runner.py --simulator " + sys.argv[7] + ")"
     elif sys.argv[7] == "synplify" or sys.argv[7] == "synplify-ps":
       gen_synplify = True
       print "Generating parameters files (*.vhd) and synthesis scripts for Synplify (*.tcl)"
@@ -394,6 +413,8 @@ if __name__ == "__main__":
   csv_reader = csv.reader(csv_file_handle, delimiter=',')
   csv_reader.next()
   csv_reader.next()
+  # Hash of the generic configuration of every test to simulate (see test_manifest.csv)
+  config_hashes = {}
   print('*****************************************\n')
   for row in csv_reader:
     print(' Test: ' + row[0] + ';'),
@@ -565,7 +586,14 @@ if __name__ == "__main__":
       ref_file = os.path.join(reference_folder, row[62])
       file_conf_param.write('     constant ref_file: string := "' + ref_file + '";\n')
       file_name = row[62] + ".vhd"
-      file_conf_param.write('     constant out_file: string := "' + compressed_folder + '\\' + file_name + '";\n')
+      file_conf_param.write('     constant out_file: string := "' + os.path.join(compressed_folder, file_name) + '";\n')
+      # Configuration of the test for the post-simulation checker (compare_output.py): raw images
+      # folder and row of the *.csv file
+      config_handle = open(os.path.join(destination_folder, 'test_config.csv'), 'wb')
+      config_writer = csv.writer(config_handle, delimiter=',')
+      config_writer.writerow([raw_folder])
+      config_writer.writerow(row)
+      config_handle.close()
       
       file_conf_param.write('\n-- TEST: ' + row [0]  + '\n')
       if row[0] == "04_test" or row[0] == "04_testPS" or row[0] == "04_Test" or row[0] == "04_TestPS":
@@ -838,12 +866,30 @@ if __name__ == "__main__":
         else:
           test_id_2perform.append(row[0])
         #print "Generating scripts for simulation: " + raw_file + '\n'
+        # Tests whose parameter packages are identical (apart from the test name) use the same
+        # compiled IP core: they are grouped by this hash in test_manifest.csv
+        if row[35] == "2":
+          config_digest = hashlib.sha1('ccsds123+ccsds121\n')
+          config_files = ['ccsds123_parameters.vhd', 'ccsds121_parameters.vhd']
+        else:
+          config_digest = hashlib.sha1('ccsds123\n')
+          config_files = ['ccsds123_parameters.vhd']
+        for config_file in config_files:
+          file_config = open(os.path.join(stimuli_folder, row[0], config_file), 'r')
+          for line in file_config:
+            if not line.startswith('-- TEST:'):
+              config_digest.update(line.strip() + '\n')
+          file_config.close()
+        config_hashes[row[0]] = config_digest.hexdigest()[:12]
         parameters_folder = os.path.join(stimuli_folder, row[0])
         if gen_post_syn == True: 
           filename_scripts = os.path.join(database_folder , 'modelsim','tb_scripts', row[0] + '_ps.do')
         else:
           filename_scripts = os.path.join(database_folder , 'modelsim','tb_scripts', row[0] + '.do')
         file_scripts = open(filename_scripts, 'w')
+        # Watchdog: the simulation stops at an upper bound of its simulated time, so a test that hangs
+        # does not block the run (see runtime_model.simulation_bound)
+        run_bound = 'run ' + str(runtime_model.simulation_bound(runtime_model.test_parameters(os.path.join(database_folder, 'modelsim'), row[0]))) + ' us\n'
         
         if row[35] == "2":
           #CCSDS123 + CCSDS121
@@ -896,7 +942,7 @@ if __name__ == "__main__":
           'do $SRC/modelsim/tb_scripts/testbench_shyloc.do\n' + 
           'vsim -coverage work.ccsds_shyloc_tb(arch) -voptargs=+acc=bcglnprst+ccsds_shyloc_tb\n' + 
           '#do waves/wave_shyloc.do\n' + 
-          'onbreak {resume}\n' + 'run -all\n')
+          'onbreak {resume}\n' + run_bound)
           file_scripts.close()
         else:
           #CCSDS123 only
@@ -943,7 +989,7 @@ if __name__ == "__main__":
           'vcom -work work -93 -explicit '+ '$SRC/modelsim/tb_stimuli/'+ row[0] + '/ccsds123_tb_parameters.vhd\n' +
           'do $SRC/modelsim/tb_scripts/testbench.do\n' +
           'vsim -coverage work.ccsds_shyloc_tb(arch) -voptargs=+acc=bcglnprst+ccsds_shyloc_tb\n'
-          'onbreak {resume}\n' + '#do wave.do\n' + 'run -all\n')
+          'onbreak {resume}\n' + '#do wave.do\n' + run_bound)
         ########################################################################
         # End of Generate file *.do files for CCSDS123+CCSDS121
         ########################################################################
@@ -1175,6 +1221,15 @@ if __name__ == "__main__":
 # Verification_report creation and coverage management
   if gen_simulation:
     ########################################################################
+    # Keep only the tests of the shard (see shards.py)
+    ########################################################################
+    shard_file = os.path.join(database_folder, 'modelsim', 'tb_scripts', shards.SHARD_FILE)
+    if os.path.exists(shard_file):
+      os.remove(shard_file)
+    if shard is not None and 'test_id_2perform' in locals():
+      test_id_2perform = shards.select(os.path.join(database_folder, 'modelsim'), test_id_2perform, shard[0], shard[1])
+      print('Shard %d/%d: %d tests selected' % (shard[0], shard[1], len(test_id_2perform)))
+    ########################################################################
     # Generate all_tests.do
     ########################################################################
     csv_file_handle = open(sys.argv[1], 'rb')
@@ -1184,38 +1239,49 @@ if __name__ == "__main__":
     database_folder_changed = database_folder.replace(sep, '/')
     database_121_folder_changed = database_121_folder.replace(sep, '/')
     stimuli_folder_c = stimuli_folder.replace(sep, '/')
-    all_tests.write('set SRC ' + database_folder_changed + '\n')
-    all_tests.write('set SRC121 ' + database_121_folder_changed + '\n')
-    all_tests.write('set GRLIB ' + os.path.expandvars('$GRLIB').replace(sep, '/') + '\n')
+    # The environment (paths and eval_result procedure) is shared by all_tests.do and by the
+    # parallel runner (sim_runner.py), which sources sim_env.do in every simulator process
+    sim_env = 'set SRC ' + database_folder_changed + '\n'
+    sim_env += 'set SRC121 ' + database_121_folder_changed + '\n'
+    sim_env += 'set GRLIB ' + os.path.expandvars('$GRLIB').replace(sep, '/') + '\n'
     # Modified by AS: In post-synthesis simulations, call script to properly map required libraries
     if gen_post_syn == True:
-      all_tests.write('do $SRC121/modelsim/tb_scripts/ps_libs.do\n')
+      sim_env += 'do $SRC121/modelsim/tb_scripts/ps_libs.do\n'
     ########################
-    all_tests.write('proc pause {{message "Hit Enter to continue ==> "}} {\n')
-    all_tests.write('puts -nonewline $message\n')
-    all_tests.write('flush stdout\n')
-    all_tests.write('gets stdin\n}\n')
-    all_tests.write('proc eval_result {SRC fp test_id} {\n')
-    all_tests.write('set result_test [examine sim:/ccsds_shyloc_tb/sim_successful]\n')
-    all_tests.write('if $result_test==TRUE {echo "Simulation finished, test $test_id PASSED"; puts $fp "$test_id passed";\n')
-    all_tests.write('coverage report -file ' + stimuli_folder_c + '/$test_id/report_coverage.txt -byfile -assert -directive -cvg -codeAll;\n')
-    all_tests.write('coverage report -file ' + stimuli_folder_c  + '/$test_id/report_coverage_details.txt -byfile -detail -assert -directive -cvg -codeAll;\n')
+    sim_env += 'proc pause {{message "Hit Enter to continue ==> "}} {\n'
+    sim_env += 'puts -nonewline $message\n'
+    sim_env += 'flush stdout\n'
+    sim_env += 'gets stdin\n}\n'
+    sim_env += 'proc eval_result {SRC fp test_id} {\n'
+    sim_env += 'set result_test [examine sim:/ccsds_shyloc_tb/sim_successful]\n'
+    sim_env += 'if $result_test==TRUE {echo "Simulation finished, test $test_id PASSED"; puts $fp "$test_id passed";\n'
+    sim_env += 'coverage report -file ' + stimuli_folder_c + '/$test_id/report_coverage.txt -byfile -assert -directive -cvg -codeAll;\n'
+    sim_env += 'coverage report -file ' + stimuli_folder_c  + '/$test_id/report_coverage_details.txt -byfile -detail -assert -directive -cvg -codeAll;\n'
     cover_folder = os.path.join(database_folder , 'modelsim', 'cover')
     if not os.path.exists(cover_folder):
       print ("\n\nCreating folder for COVER results: " + cover_folder)
       os.makedirs(cover_folder)
-    if not os.path.exists(cover_folder):
-      print ("\n\nCreating folder for COVER results: " + cover_folder)
-      os.makedirs(cover_folder)
-    all_tests.write('set file /../cover/$test_id;\nappend file _cover.ucdb;\n')
+    sim_env += 'set file /../cover/$test_id;\nappend file _cover.ucdb;\n'
     if gen_post_syn == True:
-      all_tests.write('coverage save -assert -directive -cvg -codeAll -instance /ccsds_shyloc_tb/gen_syn/shyloc ' + cover_folder  + '$file; return false}\n')
+      sim_env += 'coverage save -assert -directive -cvg -codeAll -instance /ccsds_shyloc_tb/gen_syn/shyloc ' + cover_folder  + '$file; return false}\n'
     else:
-      all_tests.write('coverage save -assert -directive -cvg -codeAll -instance /ccsds_shyloc_tb/gen_beh/shyloc ' + cover_folder  + '$file; return false}\n')
-    all_tests.write('if $result_test==FALSE {echo "Simulation finished, test FAILED"; puts $fp "$test_id failed"; return true}}\n')
+      sim_env += 'coverage save -assert -directive -cvg -codeAll -instance /ccsds_shyloc_tb/gen_beh/shyloc ' + cover_folder  + '$file; return false}\n'
+    sim_env += 'if $result_test==FALSE {echo "Simulation finished, test FAILED"; puts $fp "$test_id failed"; return true}}\n'
+    all_tests.write(sim_env)
+    file_sim_env = open(os.path.join(destination_folder, 'sim_env.do'), 'w')
+    file_sim_env.write(sim_env)
+    file_sim_env.close()
     all_tests.write('set fp [open "$SRC/modelsim/tb_scripts/verification_report.txt" w+]\n')
     all_tests.write('set quit_flag false\n')
     all_tests.write('set num_tests 0\n')
+    # A failed test does not stop the run, unless stop_on_failure is set to true before all_tests.do
+    # (vsim -c -do "set stop_on_failure true" -do tb_scripts/all_tests.do). The outcome of every test is
+    # appended to the run journal as soon as it is known (see run_journal.py)
+    all_tests.write('if {![info exists stop_on_failure]} {set stop_on_failure false}\n')
+    journal_time = '[clock format [clock seconds] -format {%Y-%m-%d %H:%M:%S}]'
+    all_tests.write('set journal [open "$SRC/modelsim/run_journal.csv" a]\n')
+    all_tests.write('puts $journal "start,' + journal_time + ',' + ' '.join(locals().get('test_id_2perform', [])) + ',all_tests.do"\n')
+    all_tests.write('flush $journal\n')
     csv_reader = csv.reader(csv_file_handle, delimiter=',')
     csv_reader.next()
     csv_reader.next()
@@ -1241,7 +1307,10 @@ if __name__ == "__main__":
         else:
           all_tests.write(' do $SRC/modelsim/tb_scripts/' + row + '.do\n')
         all_tests.write(' onbreak resume\n') 
-        all_tests.write(' set quit_flag [eval_result $SRC $fp ' + row + ']\n')  
+        all_tests.write(' set test_failed [eval_result $SRC $fp ' + row + ']\n')
+        all_tests.write(' puts $journal "result,' + journal_time + ',' + row + ',[expr {$test_failed ? {failed} : {passed}}],,"\n')
+        all_tests.write(' flush $journal\n')
+        all_tests.write(' if {$test_failed && $stop_on_failure} {set quit_flag true}\n')
         all_tests.write('}\n')
         all_tests.write('incr num_tests\n')
         all_tests.write('puts "End of Tests\tTotal Tests: $num_tests"\n')
@@ -1288,6 +1357,8 @@ if __name__ == "__main__":
       cover_file = os.path.join(cover_folder,'merged_result.txt')
       if (os.path.exists(cover_file)):
         os.remove(cover_file)
+    all_tests.write('if $quit_flag!=true {puts $journal "end,' + journal_time + '"}\n')
+    all_tests.write('close $journal\n')
     all_tests.write('quit -sim\nclose $fp\n')
     cover_folder_changed = cover_folder.replace(sep, '/')
     all_tests.write('vcover merge ' + cover_folder_changed + '/*.ucdb -out ' + cover_folder_changed + '/merged_result.ucdb\n')
@@ -1296,6 +1367,36 @@ if __name__ == "__main__":
     ########################################################################
     # End of Generate all_tests.do
     ########################################################################
+    ########################################################################
+    # Generate test_manifest.csv (list of tests for the parallel runner sim_runner.py)
+    ########################################################################
+    manifest_handle = open(os.path.join(destination_folder, 'test_manifest.csv'), 'wb')
+    manifest_writer = csv.writer(manifest_handle, delimiter=',')
+    manifest_writer.writerow(['TestId', 'Script', 'ConfigHash'])
+    config_groups = {}
+    if 'test_id_2perform' in locals():
+      for row in test_id_2perform:
+        if gen_post_syn == True:
+          manifest_writer.writerow([row, row + '_ps.do', config_hashes[row]])
+        else:
+          manifest_writer.writerow([row, row + '.do', config_hashes[row]])
+        if not config_hashes[row] in config_groups:
+          config_groups[config_hashes[row]] = [row]
+        else:
+          config_groups[config_hashes[row]].append(row)
+    manifest_handle.close()
+    ########################################################################
+    ## Report the grouping of the tests by generic configuration
+    groups_handle = open(os.path.join(destination_folder, 'config_groups.txt'), 'w')
+    groups_handle.write('ConfigHash\tTests\tTestIds\n')
+    for config_hash in sorted(config_groups, key=lambda h: (-len(config_groups[h]), h)):
+      groups_handle.write(config_hash + '\t' + str(len(config_groups[config_hash])) + '\t' + ' '.join(config_groups[config_hash]) + '\n')
+    groups_handle.close()
+    print('\n**** Generic configurations: ' + str(len(config_groups)) + ' different configurations (IP core compilations) for ' + str(sum([len(tests) for tests in config_groups.values()])) + ' tests')
+    print('**** Grouping of the tests has been written to modelsim/tb_scripts/config_groups.txt')
+    ########################################################################
+    # End of Generate test_manifest.csv
+    ########################################################################
     csv_file_handle.close()
   if gen_synplify:
     ########################################################################
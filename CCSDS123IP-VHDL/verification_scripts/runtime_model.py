@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Simulation runtime model of the generated tests, used by sim_runner.py (order of the tests and
+# timeouts) and test_budget.py.
+#
+# The prior estimation of a test is a cost model: number of samples (Nx*Ny*Nz) times (P + 1) times
+# the period of the IP core clock (clk_ip, relative to 100 ns) times a factor of the architecture
+# (the -mem architectures read and write the external memory through AHB), times a default rate in
+# seconds. The measured wall-clock times of the simulated tests (test_times.json of the result cache,
+# written by sim_runner.py together with their simulated times) correct it: the logarithm of the
+# ratio between measured time and prior estimation is fitted by ridge regression on the logarithm of
+# the image dimensions, of P + 1, of clk_ip and of HMAXBURST (for the -mem architectures) and on
+# the architecture and ENCODER_SELECTION. With few measurements the model stays close to the prior;
+# a test that has been simulated is expected to take its last measured time.
+#
+# The simulated time of a test is bounded too (watchdog of the simulation, run <bound> in the
+# generated scripts instead of run -all): the number of samples (Nx*Ny*Nz) times the worst number of
+# IP core clock cycles per sample for the architecture and P (plus, for the -mem architectures, the
+# AHB cycles to move the P + 3 words of every sample with bursts of HMAXBURST beats), times the
+# number of compressions of the test, with a margin of BOUND_MARGIN; the fixed waits of tests 80 and
+# 83 (stalls of the output and of the AHB bus) are added to it. A test still running at its bound
+# has hung (handshake deadlock): sim_runner.py reports it as timeout.
+#
+# Module usage:
+#   duration, parameters = runtime_model.durations(modelsim_folder, tests)
+#   assignments, makespan = runtime_model.lpt_schedule(duration, jobs)
+#   bound_us = runtime_model.simulation_bound(runtime_model.test_parameters(modelsim_folder, test_id))
+
+import os, re, math
+from result_cache import read_times
+
+ARCHITECTURES = {'0': 'bip', '1': 'bip-mem', '2': 'bsq', '3': 'bil', '4': 'bil-mem'}
+# Relative simulation cost per sample and band of every architecture
+ARCHITECTURE_COST = {'bip': 1.0, 'bip-mem': 2.0, 'bsq': 1.0, 'bil': 1.0, 'bil-mem': 2.0}
+# Seconds per unit of cost of the prior estimation
+DEFAULT_RATE = 2e-3
+# Weight of the prior in the regression (ridge penalty) and of the prior of the intercept
+RIDGE = 1.0
+RIDGE_INTERCEPT = 0.01
+# Worst IP core clock cycles per sample and per band used for prediction (P + 3) of every architecture
+BOUND_CYCLES = {'bip': 2, 'bip-mem': 2, 'bsq': 4, 'bil': 4, 'bil-mem': 4}
+# Period of the AHB clock of the testbench (ns) and cycles added to every burst (arbitration, address)
+AHB_PERIOD = 100
+AHB_BURST_OVERHEAD = 3
+# Reset and configuration of the IP core (ns), margin of the bound and compressions of every test_id
+BOUND_SETUP = 100000
+BOUND_MARGIN = 10
+COMPRESSIONS = {2: 2, 4: 2, 5: 3, 9: 2, 10: 4}
+# Fixed waits of the testbench (ns) for test_id 80 (output not ready) and 83 (AHB bus blocked)
+TEST_WAITS = {80: 60000, 83: 440000000}
+
+def read_constants(file_name):
+  constants = {}
+  if os.path.exists(file_name):
+    file_handle = open(file_name, 'r')
+    for match in re.finditer(r'constant\s+(\w+)\s*:\s*\w+\s*:=\s*([^;]*);', file_handle.read()):
+      constants[match.group(1)] = match.group(2).strip()
+    file_handle.close()
+  return constants
+
+def test_parameters(modelsim_folder, test_id):
+  # Constants of the generated parameter packages of the test (IP core and testbench)
+  test_folder = os.path.join(modelsim_folder, 'tb_stimuli', test_id)
+  constants = read_constants(os.path.join(test_folder, 'ccsds123_parameters.vhd'))
+  constants.update(read_constants(os.path.join(test_folder, 'ccsds123_tb_parameters.vhd')))
+  return constants
+
+def integer(constants, name, default=0):
+  try:
+    return int(re.match(r'-?\d+', constants.get(name, '')).group(0))
+  except AttributeError:
+    return default
+
+def architecture(constants):
+  return ARCHITECTURES.get(constants.get('PREDICTION_TYPE_tb', constants.get('PREDICTION_TYPE')), 'bip')
+
+def model_cost(constants):
+  samples = integer(constants, 'Nx_tb', 1) * integer(constants, 'Ny_tb', 1) * integer(constants, 'Nz_tb', 1)
+  return samples * (integer(constants, 'P_tb') + 1) * integer(constants, 'clk_ip', 100) / 100.0 * ARCHITECTURE_COST[architecture(constants)]
+
+def simulation_bound(constants):
+  # Upper bound (us) of the simulated time of a test
+  arch = architecture(constants)
+  samples = integer(constants, 'Nx_tb', 1) * integer(constants, 'Ny_tb', 1) * integer(constants, 'Nz_tb', 1)
+  words = integer(constants, 'P_tb') + 3
+  sample_time = BOUND_CYCLES[arch] * words * 2 * integer(constants, 'clk_ip', 100)
+  if arch.endswith('-mem'):
+    beats = max(1, integer(constants, 'HMAXBURST_123', 1))
+    # Every word is read and written back
+    sample_time += 2 * words * AHB_PERIOD * (1.0 + float(AHB_BURST_OVERHEAD) / beats)
+  test_id = integer(constants, 'test_id')
+  bound = BOUND_MARGIN * (BOUND_SETUP + COMPRESSIONS.get(test_id, 1) * samples * sample_time) + TEST_WAITS.get(test_id, 0)
+  return int(math.ceil(bound / 1000.0))
+
+def regressors(constants):
+  arch = architecture(constants)
+  memory = 1.0 if arch.endswith('-mem') else 0.0
+  values = [1.0]
+  for name in ['Nx_tb', 'Ny_tb', 'Nz_tb']:
+    values.append(math.log(max(1, integer(constants, name, 1))))
+  values.append(math.log(integer(constants, 'P_tb') + 1))
+  values.append(math.log(max(1, integer(constants, 'clk_ip', 100)) / 100.0))
+  values.append(memory * math.log(integer(constants, 'HMAXBURST_123', 1) + 1))
+  values += [1.0 if arch == a else 0.0 for a in sorted(ARCHITECTURE_COST)]
+  values += [1.0 if integer(constants, 'ENCODER_SELECTION_tb') == e else 0.0 for e in [0, 1, 2]]
+  return values
+
+def solve(matrix, vector):
+  # Solution of the linear system (Gaussian elimination with partial pivoting)
+  n = len(vector)
+  rows = [matrix[i][:] + [vector[i]] for i in range(n)]
+  for i in range(n):
+    pivot = max(range(i, n), key=lambda r: abs(rows[r][i]))
+    rows[i], rows[pivot] = rows[pivot], rows[i]
+    for r in range(i + 1, n):
+      factor = rows[r][i] / rows[i][i]
+      for c in range(i, n + 1):
+        rows[r][c] -= factor * rows[i][c]
+  solution = [0.0] * n
+  for i in reversed(range(n)):
+    solution[i] = (rows[i][n] - sum([rows[i][c] * solution[c] for c in range(i + 1, n)])) / rows[i][i]
+  return solution
+
+class RuntimeModel(object):
+  def __init__(self):
+    size = len(regressors({}))
+    # Weights of the correction of the prior (logarithm), the intercept starts at the default rate
+    self.prior = [math.log(DEFAULT_RATE)] + [0.0] * (size - 1)
+    self.weights = self.prior[:]
+
+  def fit(self, samples):
+    # samples: list of (constants, measured seconds)
+    size = len(self.prior)
+    penalty = [RIDGE_INTERCEPT] + [RIDGE] * (size - 1)
+    matrix = [[penalty[i] if i == j else 0.0 for j in range(size)] for i in range(size)]
+    vector = [penalty[i] * self.prior[i] for i in range(size)]
+    for constants, seconds in samples:
+      x = regressors(constants)
+      y = math.log(max(seconds, 1e-2)) - math.log(max(model_cost(constants), 1e-9))
+      for i in range(size):
+        vector[i] += x[i] * y
+        for j in range(size):
+          matrix[i][j] += x[i] * x[j]
+    self.weights = solve(matrix, vector)
+
+  def predict(self, constants):
+    correction = sum([w * x for w, x in zip(self.weights, regressors(constants))])
+    return model_cost(constants) * math.exp(correction)
+
+def durations(modelsim_folder, tests):
+  # Expected duration (seconds) of every test (manifest rows) and the constants of its parameters:
+  # its last measured time, or the prediction of the model fitted on the measured tests
+  times = read_times(os.path.join(modelsim_folder, 'result_cache'))
+  parameters = dict([(t['TestId'], test_parameters(modelsim_folder, t['TestId'])) for t in tests])
+  model = RuntimeModel()
+  model.fit([(parameters[t], times[t]) for t in parameters if t in times])
+  result = {}
+  for t in parameters:
+    result[t] = times[t] if t in times else model.predict(parameters[t])
+  return result, parameters
+
+def lpt_schedule(durations, jobs):
+  # Longest processing time first schedule of the tests on jobs processes: (assignments, makespan)
+  loads = [0.0] * max(1, jobs)
+  assignments = [[] for n in loads]
+  for test in sorted(durations, key=lambda t: (-durations[t], t)):
+    n = loads.index(min(loads))
+    loads[n] += durations[test]
+    assignments[n].append(test)
+  return assignments, max(loads)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Sharding of a regression over several machines (or several copies of the database on one machine),
+# used by run_vhdl_tests_123.py --shard i/N, also runnable as a script to show the partition and to
+# merge the results of the shards.
+#
+# The tests of the *.csv file are split in N shards with the same predicted simulation time: the
+# tests are assigned longest first to the shard with the lowest load (see runtime_model.lpt_schedule).
+# The prediction is the prior of runtime_model.py, computed only from the generated parameter
+# packages: the times measured in previous runs are kept by every machine in its own result cache and
+# would give different partitions on every machine. Every machine generating the scripts of the same
+# *.csv file with --shard i/N gets the same partition, and only the tests of shard i in all_tests.do
+# and in test_manifest.csv; tb_scripts/shard.txt records the shard and the position of its tests in
+# the *.csv file.
+# Every shard is run as a normal regression in its own copy of the database (git worktree, clone or
+# copy on every machine), with its own run journal, result cache and coverage databases. The merge
+# command, run in the database that collects the results, reads the modelsim folders of the shards
+# (on a shared file system or copied back from the machines) and writes:
+#   - tb_scripts/verification_report.txt with the results of all the shards, in the order of the
+#     *.csv file (tests without result in their shard are reported as error), and
+#     tb_scripts/verification_report_not_performed.txt
+#   - cover/merged_result.ucdb and cover/merged_result.txt, from the coverage databases of the tests
+#     of all the shards, copied to the cover folder (see coverage_merge.py)
+#
+# Some command line examples:
+# run_vhdl_tests_123.py testcases_123_e_all.csv ../images/raw ../images/compressed ../images/reference ../ ../../CCSDS121IP-VHDL modelsim --shard 2/4
+# shards.py ../modelsim 4
+# shards.py ../modelsim merge /shards/1/modelsim /shards/2/modelsim /shards/3/modelsim /shards/4/modelsim
+#
+#How to run this script
+#  shards.py
+#(1) path to the modelsim folder of the IP core database
+#(2) number of shards: prints the partition of the generated tests (test_manifest.csv), or merge
+#(3..) with merge, modelsim folders of the shards
+#-j N  number of vcover processes used by merge (default 1)
+#
+# Module usage (see run_vhdl_tests_123.py):
+#   index, count = shards.parse_shard('2/4')
+#   test_ids = shards.select(modelsim_folder, test_ids, index, count)
+
+from __future__ import print_function
+import os, csv, shutil, argparse
+import runtime_model
+import coverage_merge
+
+SHARD_FILE = 'shard.txt'
+
+def parse_shard(text):
+  # (index, count) of a shard given as i/N, with 1 <= i <= N
+  try:
+    index, count = [int(n) for n in text.split('/')]
+  except ValueError:
+    raise Exception('Shard ' + text + ' is not valid, it must be given as i/N (e.g. 2/4)')
+  if count < 1 or not 1 <= index <= count:
+    raise Exception('Shard ' + text + ' is not valid, i must be between 1 and N')
+  return index, count
+
+def predicted(modelsim_folder, test_ids):
+  # Predicted duration (seconds) of the tests, only from their parameters (same on every machine)
+  model = runtime_model.RuntimeModel()
+  return dict([(t, model.predict(runtime_model.test_parameters(modelsim_folder, t))) for t in test_ids])
+
+def partition(modelsim_folder, test_ids, count):
+  # Tests of every shard (in the order of test_ids) and their predicted durations
+  duration = predicted(modelsim_folder, test_ids)
+  assignments = runtime_model.lpt_schedule(duration, count)[0]
+  return [[t for t in test_ids if t in assigned] for assigned in assignments], duration
+
+def select(modelsim_folder, test_ids, index, count):
+  # Tests of shard index/count, recorded in tb_scripts/shard.txt with their position in test_ids
+  tests = partition(modelsim_folder, test_ids, count)[0][index - 1]
+  shard_handle = open(os.path.join(modelsim_folder, 'tb_scripts', SHARD_FILE), 'w')
+  shard_handle.write('%d/%d\n' % (index, count))
+  for test_id in tests:
+    shard_handle.write('%d %s\n' % (test_ids.index(test_id), test_id))
+  shard_handle.close()
+  return tests
+
+def read_shard(modelsim_folder):
+  # (index, count, [(position, TestId)]) of the shard generated in the modelsim folder
+  shard_file = os.path.join(modelsim_folder, 'tb_scripts', SHARD_FILE)
+  if not os.path.exists(shard_file):
+    raise Exception(modelsim_folder + ' is not a shard: ' + shard_file + ' not found')
+  shard_handle = open(shard_file, 'r')
+  lines = shard_handle.read().split('\n')
+  shard_handle.close()
+  index, count = parse_shard(lines[0].strip())
+  tests = [(int(line.split()[0]), line.split()[1]) for line in lines[1:] if line.strip()]
+  return index, count, tests
+
+def read_report(report_file):
+  # Lines of a verification report, by TestId
+  lines = {}
+  if os.path.exists(report_file):
+    report_handle = open(report_file, 'r')
+    for line in report_handle:
+      if line.strip():
+        lines.setdefault(line.split()[0], line.rstrip('\n'))
+    report_handle.close()
+  return lines
+
+def merge(modelsim_folder, shard_folders, jobs=1):
+  # Writes the verification reports and the merged coverage of the shards into modelsim_folder.
+  # Returns the number of tests of every status
+  shards = {}
+  count = None
+  for folder in shard_folders:
+    index, shard_count, tests = read_shard(folder)
+    if count is not None and shard_count != count:
+      raise Exception('Shards of different partitions: %d and %d shards' % (count, shard_count))
+    if index in shards:
+      raise Exception('Shard %d/%d given twice' % (index, shard_count))
+    count = shard_count
+    shards[index] = (folder, tests)
+  missing = [str(i) for i in range(1, count + 1) if not i in shards]
+  if missing:
+    print('Warning: shards ' + ', '.join(missing) + ' of ' + str(count) + ' not given, their tests are not reported')
+  results = []
+  not_performed = {}
+  tb_scripts_folder = os.path.join(modelsim_folder, 'tb_scripts')
+  merger = coverage_merge.TreeMerger(modelsim_folder, jobs)
+  for index in sorted(shards):
+    folder, tests = shards[index]
+    report = read_report(os.path.join(folder, 'tb_scripts', 'verification_report.txt'))
+    for position, test_id in tests:
+      results.append((position, report.get(test_id, test_id + ' error')))
+      database = coverage_merge.test_database(folder, test_id)
+      if report.get(test_id, '').endswith('passed') and os.path.exists(database):
+        destination = coverage_merge.test_database(modelsim_folder, test_id)
+        if os.path.abspath(database) != os.path.abspath(destination):
+          shutil.copyfile(database, destination)
+        merger.add(destination)
+    not_performed.update(read_report(os.path.join(folder, 'tb_scripts', 'verification_report_not_performed.txt')))
+  report_handle = open(os.path.join(tb_scripts_folder, 'verification_report.txt'), 'w')
+  for position, line in sorted(results):
+    report_handle.write(line + '\n')
+  report_handle.close()
+  report_file = os.path.join(tb_scripts_folder, 'verification_report_not_performed.txt')
+  if not_performed:
+    report_handle = open(report_file, 'w')
+    for test_id in sorted(not_performed):
+      report_handle.write(not_performed[test_id] + '\n')
+    report_handle.close()
+  elif os.path.exists(report_file):
+    os.remove(report_file)
+  if not merger.finish():
+    print('Coverage could not be merged, see cover/vcover.log')
+  totals = {}
+  for position, line in results:
+    status = line.split()[-1]
+    totals[status] = totals.get(status, 0) + 1
+  return totals
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Show the partition of the generated tests in shards or merge the results of the shards')
+  parser.add_argument('modelsim_folder', help='modelsim folder of the IP core database')
+  parser.add_argument('shards', help='number of shards, or merge')
+  parser.add_argument('shard_folders', nargs='*', help='modelsim folders of the shards (merge)')
+  parser.add_argument('-j', '--jobs', type=int, default=1, help='number of vcover processes used by merge')
+  args = parser.parse_args()
+  modelsim_folder = os.path.abspath(args.modelsim_folder)
+  if args.shards == 'merge':
+    if not args.shard_folders:
+      parser.error('merge needs the modelsim folders of the shards')
+    totals = merge(modelsim_folder, [os.path.abspath(f) for f in args.shard_folders], args.jobs)
+    counted = [totals.get(status, 0) for status in ['passed', 'failed', 'timeout']]
+    print('Passed: %d  Failed: %d  Timeouts: %d  Errors: %d' % tuple(counted + [sum(totals.values()) - sum(counted)]))
+    print('**** Verification report has been written to modelsim/tb_scripts/verification_report.txt')
+  else:
+    manifest_handle = open(os.path.join(modelsim_folder, 'tb_scripts', 'test_manifest.csv'), 'r')
+    test_ids = [row['TestId'] for row in csv.DictReader(manifest_handle)]
+    manifest_handle.close()
+    tests, duration = partition(modelsim_folder, test_ids, int(args.shards))
+    for index, shard_tests in enumerate(tests):
+      print('Shard %d/%s: %d tests, predicted %.1f min: %s' % (index + 1, args.shards, len(shard_tests), sum([duration[t] for t in shard_tests]) / 60.0, ' '.join(shard_tests)))
@@ -0,0 +1,948 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Some command line examples:
+# sim_runner.py ../modelsim
+# sim_runner.py ../modelsim -j 32
+# sim_runner.py ../modelsim -j 8 -t 20_Test -t 24_test
+# sim_runner.py ../modelsim -j 8 --session 10
+# sim_runner.py ../modelsim -j 8 --force
+# sim_runner.py ../modelsim -j 8 --since HEAD~1
+# sim_runner.py ../modelsim -j 8 --fast
+# sim_runner.py ../modelsim -j 8 --budget 20
+# sim_runner.py ../modelsim -j 8 --timeout-factor 0
+# sim_runner.py ../modelsim -j 8 --resume
+
+#How to run this script
+#  sim_runner.py
+#(1) path to the modelsim folder of the IP core database (the folder containing tb_scripts and tb_stimuli)
+#-j, --jobs  number of simulator processes launched concurrently (default: number of cores)
+#-t, --test  run only the given test (can be repeated)
+#--no-cache  run the complete <TestId>.do script of every test (deletes and compiles all libraries)
+#--session N  run up to N tests of the same configuration in one simulator session (default 1: one
+#             session per test)
+#--force     simulate every test, even when its result is in the result cache (the cache is updated)
+#--since REV  run only the tests affected by the files changed since the git revision REV (see vhdl_deps.py)
+#--no-check  do not compare the compressed images with the references after the simulation
+#--early-abort  compare the compressed image while it is simulated and stop the simulation at the first
+#               mismatch (not available on Windows nor with --no-cache)
+#--simulator questa|ghdl|nvc  simulator used to compile and run the tests (default questa)
+#--budget MINUTES  run only the tests that fit in the time budget with the given number of processes,
+#                  chosen to cover most features first (see test_budget.py)
+#--timeout-factor F  stop a simulation after F times its expected duration plus 5 minutes (default 4,
+#                    0: no timeout); a stopped test is reported as timeout
+#--fast     simulate an optimized testbench without code coverage, and run every failed test again with
+#           full visibility, coverage and a wave dump (not available with --no-cache)
+#--resume   continue the last run if it was interrupted or had errors: run its tests again, except the
+#           ones completed (passed or failed) whose inputs did not change, also with --force (see
+#           run_journal.py)
+#
+# The tests are taken from tb_scripts/test_manifest.csv, which is written by run_vhdl_tests_123.py
+# together with the rest of the simulation scripts (options modelsim and modelsim-ps).
+# Every simulator process runs in its own folder (modelsim/workers/wN) with its own work, grlib,
+# techmap, gaisler, shyloc_utils, shyloc_123, shyloc_121 and post_syn_lib libraries, and takes tests
+# from a shared queue until the queue is empty. The vendor libraries are compiled only once, in
+# modelsim/lib_cache, and every worker only recompiles the units whose inputs changed since its
+# previous test (see compile_cache.py). Tests with the same generic configuration (ConfigHash column
+# of the manifest) are kept on the same worker while possible, so the IP core is compiled once per
+# configuration and worker and only the testbench parameters change between them.
+# The expected duration of every test (its last measured time, or the prediction of runtime_model.py,
+# fitted on the wall-clock times measured in previous runs) decides the order: the configurations and
+# tests with the longest expected durations are started first (longest processing time first), so no
+# long simulation is left for the end of the run, and sets the timeout of the simulations. The
+# wall-clock and simulated times of every simulation are stored in result_cache/test_times.json.
+# The simulated time of every test is bounded too (run <bound> instead of run -all, see
+# runtime_model.simulation_bound): a test that reaches its bound without finishing nor stopping at a
+# failure has hung, and is reported as timeout, as a test stopped by its wall-clock timeout.
+# With --session, the CCSDS-123 testbench is optimized (vopt) once for a batch of tests of the same
+# configuration and every test of the batch is loaded from it in the same simulator session, with its
+# own values (images, sizes, run-time configuration) given as generics of ccsds_shyloc_tb (vsim -g).
+# Tests with the CCSDS-121 testbench, whose parameters are not generics, are run one per session.
+# The testbench only tells whether the simulation finished; the compressed image written by a
+# finished test is then compared with its reference by compare_output.py, which decides whether the
+# test passed and writes the first difference (if any) to tb_stimuli/<TestId>/compare_report.txt.
+# Many tests write the same output file (images/compressed/<reference>.vhd), so the tests of the
+# CCSDS-123 testbench write their image to tb_stimuli/<TestId>/out.esa instead (out_file generic), and
+# parallel tests never overwrite each other's output.
+# With --early-abort, the output file of the testbench is a named pipe in the worker folder, read by a
+# StreamChecker of compare_output.py that compares the image while it is simulated (and copies it to
+# the output file of the test); the simulator is killed at the first mismatch and the test fails. Killing a
+# session also stops its remaining tests, which are then run one by one.
+# compare_output.py (and numpy, which it needs) is only imported to compare the outputs: without
+# numpy the runner starts and the outputs are not compared, as with --no-check.
+# With --simulator ghdl or nvc, the compile units of the generated scripts are analysed and the
+# testbench is run with the open-source simulator (see open_simulators.py), which has no license
+# limit on the number of parallel processes. The libraries are kept in lib_cache_<simulator> and
+# workers_<simulator>; sessions, code coverage and --no-cache are only available with QuestaSim.
+# With --fast, the testbench is optimized with visibility of its own signals only (read by eval_result)
+# and without code coverage. A test that fails is simulated again on its own with full visibility
+# (+acc) and coverage, with all the signals logged to tb_stimuli/<TestId>/vsim.wlf (or the wave file of
+# the open-source simulators), ready for debugging. Coverage is not merged after a fast run.
+# Tests whose inputs did not change since they were last simulated are not simulated again: their
+# result and coverage files are taken from modelsim/result_cache (see result_cache.py).
+# A failed test does not stop the run, and the outcome of every test is appended to
+# modelsim/run_journal.csv as soon as it is known (see run_journal.py), so an interrupted run can be
+# continued with --resume without simulating again the tests it completed.
+# The result of every test is also added to the results database (modelsim/results.db, see
+# results_db.py) with its measures (wall-clock, simulated, elaboration and compile times, coverage,
+# first differing bit of a failed test), kept across runs for trend queries.
+# The results are merged into tb_scripts/verification_report.txt in the order of the manifest, and
+# the coverage databases are merged into cover/merged_result.ucdb, as all_tests.do does for serial runs:
+# pairwise while the tests run, so only a short final merge is left after the last test (see
+# coverage_merge.py). The simulations only save the coverage database of every passed test: the
+# per-test coverage reports are written on request by coverage_merge.py.
+
+from __future__ import print_function
+import sys, os, re, csv, time, signal, hashlib, argparse, subprocess, threading, multiprocessing
+from os.path import sep
+import compile_cache
+from compile_cache import tool_path
+from result_cache import ResultCache
+import vhdl_deps
+from vhdl_deps import read_tb_parameters
+import open_simulators
+import coverage_merge
+import test_budget
+import runtime_model
+import run_journal
+import results_db
+
+# Libraries created by the generated <TestId>.do scripts, mapped locally in every worker folder
+LIBRARIES = ['work', 'grlib', 'techmap', 'gaisler', 'shyloc_utils', 'shyloc_123', 'shyloc_121', 'post_syn_lib']
+# Constants of ccsds123_tb_parameters that are also generics of the CCSDS-123 testbench (src/tb/ccsds_shyloc_tb.vhd)
+TB_GENERICS = ['stim_file', 'ref_file', 'out_file', 'test_id', 'test_identifier', 'clk_ip', 'Nx_tb', 'Ny_tb', 'Nz_tb',
+               'DISABLE_HEADER_tb', 'ENCODER_SELECTION_tb', 'D_tb', 'IS_SIGNED_tb', 'ENDIANESS_tb', 'BYPASS_tb', 'P_tb',
+               'PREDICTION_tb', 'LOCAL_SUM_tb', 'OMEGA_tb', 'R_tb', 'VMAX_tb', 'VMIN_tb', 'TINC_tb', 'WEIGHT_INIT_tb',
+               'INIT_COUNT_E_tb', 'ACC_INIT_TYPE_tb', 'ACC_INIT_CONST_tb', 'RESC_COUNT_SIZE_tb', 'U_MAX_tb', 'W_BUFFER_tb',
+               'Q_tb', 'WR_tb', 'CWI_tb']
+# Output file of a test of the CCSDS-123 testbench, in its tb_stimuli/<TestId> folder
+OUTPUT_FILE = 'out.esa'
+# Name of the optimized testbench shared by the tests of a session
+SESSION_DESIGN = 'session_opt'
+# Values of test_id of the tests that compress several times (configuration errors, ForceStop, second
+# image with its own reference): their output is only compared when the simulation has finished
+EARLY_ABORT_EXCLUDED = ['2', '4', '5', '9', '10']
+# Seconds added to the timeout of every simulation
+TIMEOUT_MARGIN = 300
+# Visibility of the optimized testbench of the fast profile: the signals of ccsds_shyloc_tb only
+FAST_ACC = '+acc=n+ccsds_shyloc_tb'
+
+def tcl_path(path):
+  return '{' + os.path.abspath(path).replace(sep, '/') + '}'
+
+def read_manifest(modelsim_folder):
+  manifest = os.path.join(modelsim_folder, 'tb_scripts', 'test_manifest.csv')
+  if not os.path.exists(manifest):
+    raise Exception('Test manifest ' + manifest + ' not found, please generate the simulation scripts first with run_vhdl_tests_123.py')
+  csv_file_handle = open(manifest, 'r')
+  tests = [row for row in csv.DictReader(csv_file_handle)]
+  csv_file_handle.close()
+  return tests
+
+def write_modelsim_ini(modelsim_folder, folder, shared_libraries={}):
+  # Copy modelsim.ini with the IP core libraries mapped to folders local to the given folder, except
+  # the libraries in shared_libraries, mapped to the given (shared) folders
+  if not os.path.exists(folder):
+    os.makedirs(folder)
+  lines = []
+  ini_file = os.path.join(modelsim_folder, 'modelsim.ini')
+  if os.path.exists(ini_file):
+    ini_handle = open(ini_file, 'r')
+    lines = ini_handle.read().splitlines()
+    ini_handle.close()
+  if not '[Library]' in lines:
+    lines = ['[Library]', 'others = $MODEL_TECH/../modelsim.ini'] + lines
+  ini = []
+  section = ''
+  for line in lines:
+    if line.startswith('['):
+      section = line.strip()
+    elif section == '[Library]' and line.split('=')[0].strip() in LIBRARIES:
+      continue
+    ini.append(line)
+    if line.strip() == '[Library]':
+      for lib in LIBRARIES:
+        ini.append(lib + ' = ' + shared_libraries.get(lib, './' + lib).replace(sep, '/'))
+  ini_handle = open(os.path.join(folder, 'modelsim.ini'), 'w')
+  ini_handle.write('\n'.join(ini) + '\n')
+  ini_handle.close()
+
+def read_results(result_file):
+  # Lines "<TestId> passed|failed" written by eval_result
+  results = {}
+  if os.path.exists(result_file):
+    result_handle = open(result_file, 'r')
+    for line in result_handle:
+      result = line.split()
+      if len(result) == 2 and result[1] in ['passed', 'failed']:
+        results[result[0]] = result[1]
+    result_handle.close()
+  return results
+
+def has_tb_generics(modelsim_folder, test):
+  # Tests of the CCSDS-123 testbench, whose TB_GENERICS can be given when loading it (the testbench
+  # of the CCSDS-121 tests reads its parameters from the packages only)
+  script_handle = open(os.path.join(modelsim_folder, 'tb_scripts', test['Script']), 'r')
+  script = script_handle.read()
+  script_handle.close()
+  return not 'ccsds121_tb_parameters' in script
+
+def session_key(modelsim_folder, test):
+  # Tests can share a session when they have the same generic configuration and the same testbench
+  # parameters apart from TB_GENERICS. Returns '' for tests that need their own session
+  if not has_tb_generics(modelsim_folder, test):
+    return ''
+  digest = hashlib.sha1((test.get('ConfigHash', '') + '\n').encode('utf-8'))
+  for name, value in read_tb_parameters(os.path.join(modelsim_folder, 'tb_stimuli', test['TestId'])):
+    if not name in TB_GENERICS:
+      digest.update((name + '=' + value + '\n').encode('utf-8'))
+  return digest.hexdigest()[:12]
+
+def tb_generics(modelsim_folder, test, values={}):
+  # vsim -g options (as Tcl words) giving the values of the test to the shared testbench; values
+  # replaces some of them
+  generics = []
+  for name, value in read_tb_parameters(os.path.join(modelsim_folder, 'tb_stimuli', test['TestId'])):
+    if name in TB_GENERICS:
+      generics.append('{-g' + name + '=' + values.get(name, value) + '}')
+  return generics
+
+def output_file(modelsim_folder, test):
+  # Compressed image written by the test (given as out_file generic), or None for the tests of the
+  # CCSDS-121 testbench, which write the out_file of their parameters package
+  if not has_tb_generics(modelsim_folder, test):
+    return None
+  return os.path.join(modelsim_folder, 'tb_stimuli', test['TestId'], OUTPUT_FILE)
+
+def compare_module():
+  # compare_output.py, imported only when the outputs are compared (it needs numpy); None without numpy
+  try:
+    import compare_output
+  except ImportError:
+    return None
+  return compare_output
+
+def design_instance(script):
+  # Instance of the IP core in the testbench, as in sim_env.do: gen_syn for the post-synthesis tests
+  # (*_ps.do scripts), gen_beh otherwise
+  return '/ccsds_shyloc_tb/' + ('gen_syn' if script.endswith('_ps.do') else 'gen_beh') + '/shyloc'
+
+def eval_result_proc(cover_folder, instance):
+  # eval_result of sim_env.do without the coverage reports (written on request by coverage_merge.py):
+  # a passed test only saves the coverage database of instance to cover_folder (none for the fast
+  # profile)
+  save = ''
+  if cover_folder is not None:
+    save = (' coverage save -assert -directive -cvg -codeAll -instance ' + instance + ' ' +
+            '"' + os.path.abspath(cover_folder).replace(sep, '/') + '/${test_id}_cover.ucdb";')
+  return ('proc eval_result {SRC fp test_id} {\n'
+          'set result_test [examine sim:/ccsds_shyloc_tb/sim_successful]\n'
+          'if $result_test==TRUE {echo "Simulation finished, test $test_id PASSED"; puts $fp "$test_id passed";' + save + ' return false}\n'
+          'if $result_test==FALSE {echo "Simulation finished, test FAILED"; puts $fp "$test_id failed"; return true}}\n')
+
+def profile_sim_lines(sim_lines, profile, wave_file=None):
+  # Simulation commands of a test script for the fast profile (optimized testbench without coverage)
+  # or the debug profile (full visibility, all the signals logged to wave_file)
+  lines = []
+  for line in sim_lines:
+    if not line.strip().startswith('vsim '):
+      lines.append(line)
+      continue
+    words = [w for w in line.split() if not w.startswith('-voptargs=')]
+    if profile == 'fast':
+      lines.append(' '.join([w for w in words if w != '-coverage'] + ['-voptargs=' + FAST_ACC]))
+    else:
+      lines.append(' '.join(words + ['-voptargs=+acc', '-wlf', tcl_path(wave_file)]))
+      lines.append('log -r /*')
+  return lines
+
+def simulated_time(log_file):
+  # Last simulation time (ns) reported in a transcript (QuestaSim "Time: 100 ns", GHDL "@100ns",
+  # nvc "100ns+0"), or None
+  units = {'fs': 1e-6, 'ps': 1e-3, 'ns': 1.0, 'us': 1e3, 'ms': 1e6, 'sec': 1e9}
+  last = None
+  if not os.path.exists(log_file):
+    return None
+  log_handle = open(log_file, 'r')
+  for line in log_handle:
+    for match in re.finditer(r'(?:Time: |@)(\d+(?:\.\d+)?) ?(fs|ps|ns|us|ms|sec)\b|\b(\d+(?:\.\d+)?)(fs|ps|ns|us|ms)\+\d+', line):
+      value, unit = match.group(1, 2) if match.group(1) else match.group(3, 4)
+      last = float(value) * units[unit]
+  log_handle.close()
+  return last
+
+def mark_elaboration(sim_lines):
+  # Simulation commands with the time (ms) written to the transcript before and after loading the
+  # testbench (vsim), read by elaboration_time
+  lines = []
+  for line in sim_lines:
+    if line.strip().startswith('vsim '):
+      lines += ['echo "#### LOAD [clock milliseconds]"', line, 'echo "#### LOADED [clock milliseconds]"']
+    else:
+      lines.append(line)
+  return lines
+
+def elaboration_time(log_file):
+  # Seconds taken to load the testbench, from the marks of mark_elaboration in a transcript, or None
+  marks = {}
+  if not os.path.exists(log_file):
+    return None
+  log_handle = open(log_file, 'r')
+  for line in log_handle:
+    match = re.search(r'#### (LOAD|LOADED) (\d+)', line)
+    if match and not 'echo' in line:
+      marks[match.group(1)] = int(match.group(2)) / 1000.0
+  log_handle.close()
+  if 'LOAD' in marks and 'LOADED' in marks:
+    return marks['LOADED'] - marks['LOAD']
+  return None
+
+def bound_reached(log_file):
+  # Whether the simulation of a failed test stopped at the bound of its simulated time: the testbench
+  # neither finished nor stopped at a failure (QuestaSim, GHDL and nvc messages)
+  if not os.path.exists(log_file):
+    return False
+  log_handle = open(log_file, 'r')
+  log = log_handle.read()
+  log_handle.close()
+  return not 'Testbench done' in log and not re.search(r'\*\* (Failure|Fatal)|assertion failure|severity failure', log, re.IGNORECASE)
+
+def stop_process(process):
+  # Kills the simulator with its child processes (started in their own process group)
+  try:
+    if hasattr(os, 'killpg'):
+      os.killpg(process.pid, signal.SIGKILL)
+    else:
+      process.kill()
+  except OSError:
+    pass
+
+class TestQueue(object):
+  # Pending tests grouped by generic configuration. A worker keeps taking tests of the configuration
+  # it has compiled; when there are none left, it takes a configuration not started by any worker
+  # (the one with the longest expected duration), or else helps with the configuration with the
+  # longest expected duration left. The tests of a configuration are taken longest first
+  def __init__(self, tests, durations={}):
+    self.durations = durations
+    self.groups = {}
+    self.order = []
+    self.started = set()
+    for test in tests:
+      config = (test.get('ConfigHash') or test['TestId']) + test.get('Session', '')
+      if not config in self.groups:
+        self.groups[config] = []
+        self.order.append(config)
+      self.groups[config].append(test)
+    for config in self.order:
+      self.groups[config].sort(key=lambda t: -durations.get(t['TestId'], 0))
+    self.lock = threading.Lock()
+
+  def load(self, config):
+    # Expected duration of the pending tests of a configuration (their number when it is unknown)
+    return sum([self.durations.get(t['TestId'], 1) for t in self.groups[config]])
+
+  def get(self, config=None, size=1):
+    # Returns the configuration taken and up to size tests of it (only one if they can not share a session)
+    self.lock.acquire()
+    try:
+      if not self.groups.get(config):
+        pending = [c for c in self.order if self.groups[c]]
+        if not pending:
+          return None, []
+        not_started = [c for c in pending if not c in self.started]
+        config = max(not_started or pending, key=self.load)
+        self.started.add(config)
+      if not self.groups[config][0].get('Session'):
+        size = 1
+      tests = self.groups[config][:size]
+      del self.groups[config][:size]
+      return config, tests
+    finally:
+      self.lock.release()
+
+class SimRunner(object):
+  def __init__(self, modelsim_folder, use_cache=True, session=1, force=False, check=True, early_abort=False, simulator=None, fast=False, timeout_factor=0):
+    self.modelsim_folder = modelsim_folder
+    self.tb_scripts_folder = os.path.join(modelsim_folder, 'tb_scripts')
+    self.use_cache = use_cache
+    self.session = session
+    self.force = force
+    self.check = check
+    self.early_abort = early_abort
+    self.fast = fast
+    # Coverage databases merged while the tests run (not for the fast profile nor the open simulators)
+    self.merger = None
+    self.aborted = set()
+    self.timeout_factor = timeout_factor
+    # Timeout (seconds) of the simulation of every test, and tests stopped by their timeout
+    self.timeouts = {}
+    self.timed_out = set()
+    self.variables = compile_cache.read_variables(self.tb_scripts_folder)
+    # Open-source simulator of open_simulators.py, None for QuestaSim
+    self.simulator = simulator
+    self.folder_suffix = '_' + simulator.tool if simulator is not None else ''
+    self.vendor_folder = os.path.join(modelsim_folder, 'lib_cache' + self.folder_suffix)
+    self.vendor_base = ''
+    self.result_cache = ResultCache(os.path.join(modelsim_folder, 'result_cache'))
+    self.journal = run_journal.RunJournal(modelsim_folder)
+    self.database = results_db.ResultsDatabase(modelsim_folder)
+    self.run_id = None
+    self.start_time = time.time()
+    # Compile time (seconds) of the units of every simulated test, and first differing bit of the
+    # output of every failed test
+    self.compile_times = {}
+    self.failure_bits = {}
+    self.result_keys = {}
+    self.results = {}
+    self.total = 0
+    self.lock = threading.Lock()
+
+  def simulator_version(self):
+    if self.simulator is not None:
+      return self.simulator.version()
+    try:
+      process = subprocess.Popen([tool_path('vsim'), '-version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+      return process.communicate()[0].decode('utf-8', 'replace').strip()
+    except OSError:
+      return 'unknown'
+
+  def result_files(self, test):
+    # Files produced by eval_result for a passed test, stored with its result
+    return {'cover.ucdb': coverage_merge.test_database(self.modelsim_folder, test['TestId'])}
+
+  def result_keys_of(self, tests):
+    # Key of the result of every test: hash of the simulator version, the sim_env.do procedures, the
+    # compiled units of the test (vendor libraries included), its simulation commands and its stimulus
+    # and reference images. The units only cover the libraries the test compiles, so CCSDS-123 tests
+    # do not depend on the CCSDS-121 sources
+    base = hashlib.sha1(self.simulator_version().encode('utf-8'))
+    if self.fast:
+      base.update(b'fast')
+    env_handle = open(os.path.join(self.tb_scripts_folder, 'sim_env.do'), 'rb')
+    base.update(env_handle.read())
+    env_handle.close()
+    base.update(compile_cache.units_fingerprint(compile_cache.vendor_units(self.tb_scripts_folder, self.variables)).encode('utf-8'))
+    for test in tests:
+      digest = base.copy()
+      units, sim_lines = compile_cache.test_units(self.tb_scripts_folder, test['Script'], self.variables)
+      for unit in units:
+        digest.update((' '.join(unit.key()) + '\n').encode('utf-8'))
+      digest.update('\n'.join(sim_lines).encode('utf-8'))
+      for name, value in read_tb_parameters(os.path.join(self.modelsim_folder, 'tb_stimuli', test['TestId'])):
+        if name in ['stim_file', 'ref_file']:
+          digest.update(self.result_cache.file_hash(value.strip('"')).encode('utf-8'))
+      self.result_keys[test['TestId']] = digest.hexdigest()
+    self.result_cache.save_hashes()
+
+  def report(self, test, status, text, source='simulated', measures={}):
+    # source: simulated, cached (result cache) or resumed (journal of the interrupted run)
+    key = self.result_keys.get(test['TestId'], '')
+    self.journal.record(test['TestId'], status, measures.get('wall_s') or 0.0, key)
+    self.database.add(self.run_id, test['TestId'], status, source, test.get('ConfigHash', ''), key, measures)
+    self.lock.acquire()
+    self.results[test['TestId']] = status
+    print('[%d/%d] %s %s (%s)' % (len(self.results), self.total, test['TestId'], status, text))
+    sys.stdout.flush()
+    self.lock.release()
+
+  def check_output(self, test, status):
+    # Status of a simulated test after comparing its compressed image with the reference. Test 5
+    # compresses a second image with its own reference, so only the testbench result is used for it.
+    # Tests stopped by the early abort are compared too, to locate their first difference
+    if not self.check or not (status == 'passed' or test['TestId'] in self.aborted):
+      return status
+    test_folder = os.path.join(self.modelsim_folder, 'tb_stimuli', test['TestId'])
+    if dict(read_tb_parameters(test_folder)).get('test_id') == '5':
+      return status
+    try:
+      passed, report = compare_module().check_test(test_folder, output_file(self.modelsim_folder, test))
+    except Exception as e:
+      passed, report = False, 'Comparison not possible: ' + str(e)
+    match = re.match(r'First difference at bit (\d+)', report)
+    if match:
+      self.failure_bits[test['TestId']] = int(match.group(1))
+    report_handle = open(os.path.join(test_folder, 'compare_report.txt'), 'w')
+    report_handle.write(report + '\n')
+    report_handle.close()
+    return 'passed' if passed else 'failed'
+
+  def build_vendor_libraries(self):
+    # GRLIB, techmap and gaisler are the same for every test: compile them once (only if they changed
+    # since the last run) in a folder shared by all the workers
+    units = compile_cache.vendor_units(self.tb_scripts_folder, self.variables)
+    if self.simulator is None:
+      write_modelsim_ini(self.modelsim_folder, self.vendor_folder)
+    elif not os.path.exists(self.vendor_folder):
+      os.makedirs(self.vendor_folder)
+    log_handle = open(os.path.join(self.vendor_folder, 'compile.log'), 'w')
+    compiled = compile_cache.CompileCache(self.vendor_folder).compile(units, log_handle, simulator=self.simulator)
+    log_handle.close()
+    if compiled < 0:
+      raise Exception('Error compiling the vendor libraries, see ' + os.path.join(self.vendor_folder, 'compile.log'))
+    print('Vendor libraries: %d units compiled, %d up to date\n' % (compiled, len(units) - compiled))
+    self.vendor_base = compile_cache.units_fingerprint(units)
+
+  def shared_libraries(self):
+    shared = {}
+    if self.use_cache:
+      for lib in compile_cache.VENDOR_LIBRARIES:
+        shared[lib] = os.path.abspath(os.path.join(self.vendor_folder, lib))
+    return shared
+
+  def prepare_worker(self, worker_folder):
+    if self.simulator is None:
+      write_modelsim_ini(self.modelsim_folder, worker_folder, self.shared_libraries())
+    elif not os.path.exists(worker_folder):
+      os.makedirs(worker_folder)
+
+  def write_test_script(self, worker_folder, test, sim_lines=None, fast=False):
+    # Same sequence as one iteration of all_tests.do, followed by quit. With sim_lines, the libraries
+    # have already been compiled and only the simulation commands of the test script are run. With
+    # fast, eval_result does not save the coverage database
+    result_file = os.path.join(worker_folder, 'result.txt')
+    script = os.path.join(worker_folder, 'run_test.do')
+    script_handle = open(script, 'w')
+    script_handle.write('onerror {quit -f -code 1}\n')
+    script_handle.write('do ' + tcl_path(os.path.join(self.tb_scripts_folder, 'sim_env.do')) + '\n')
+    script_handle.write(eval_result_proc(None if fast else os.path.join(self.modelsim_folder, 'cover'), design_instance(test['Script'])))
+    script_handle.write('set fp [open ' + tcl_path(result_file) + ' w]\n')
+    if sim_lines is None:
+      script_handle.write('do ' + tcl_path(os.path.join(self.tb_scripts_folder, test['Script'])) + '\n')
+    else:
+      script_handle.write('\n'.join(mark_elaboration(sim_lines)) + '\n')
+    script_handle.write('onbreak resume\n')
+    script_handle.write('eval_result $SRC $fp ' + test['TestId'] + '\n')
+    script_handle.write('close $fp\n')
+    script_handle.write('quit -f\n')
+    script_handle.close()
+    return script, result_file
+
+  def stream_checker(self, worker_folder, test, debug=False):
+    # StreamChecker of the output of the test (written to a named pipe of the worker folder), or None
+    # when the output of the test is only compared at the end (always for a debug run, to simulate
+    # the whole test)
+    if debug or not self.early_abort or not has_tb_generics(self.modelsim_folder, test):
+      return None
+    parameters = dict(read_tb_parameters(os.path.join(self.modelsim_folder, 'tb_stimuli', test['TestId'])))
+    if parameters.get('test_id') in EARLY_ABORT_EXCLUDED:
+      return None
+    fifo = os.path.join(worker_folder, test['TestId'] + '.fifo')
+    if os.path.exists(fifo):
+      os.remove(fifo)
+    os.mkfifo(fifo)
+    return compare_module().StreamChecker(fifo, output_file(self.modelsim_folder, test), parameters['ref_file'].strip('"'))
+
+  def simulate(self, worker_folder, command, log_handle, checkers={}, timeout=None):
+    # Runs the simulator command. checkers maps test identifiers to the StreamChecker of their output:
+    # the process is killed at the first mismatch, or after timeout seconds. Returns the exit code,
+    # the tests with a mismatch and whether the timeout expired
+    null_handle = open(os.devnull, 'r')
+    returncode = -1
+    expired = []
+    log_handle.flush()
+    try:
+      if checkers or timeout:
+        process = subprocess.Popen(command, cwd=worker_folder, stdin=null_handle, stdout=log_handle,
+                                   stderr=subprocess.STDOUT, preexec_fn=getattr(os, 'setsid', None))
+        for checker in checkers.values():
+          checker.start(lambda: stop_process(process))
+        timer = None
+        if timeout:
+          def expire():
+            expired.append(timeout)
+            stop_process(process)
+          timer = threading.Timer(timeout, expire)
+          timer.daemon = True
+          timer.start()
+        returncode = process.wait()
+        if timer is not None:
+          timer.cancel()
+      else:
+        returncode = subprocess.call(command, cwd=worker_folder, stdin=null_handle, stdout=log_handle, stderr=subprocess.STDOUT)
+    except OSError as e:
+      log_handle.write('Could not launch ' + command[0] + ': ' + str(e) + '\n')
+    null_handle.close()
+    if expired:
+      log_handle.write('# Simulation stopped: timeout of %d s expired\n' % timeout)
+    aborted = []
+    for test_id, checker in checkers.items():
+      checker.stop()
+      os.remove(checker.fifo)
+      if checker.mismatch is not None:
+        log_handle.write('# Simulation stopped: output of ' + test_id + ' differs from the reference at bit ' + str(checker.mismatch) + '\n')
+        aborted.append(test_id)
+    self.lock.acquire()
+    self.aborted.update(aborted)
+    self.lock.release()
+    return returncode, aborted, bool(expired)
+
+  def run_test(self, worker_folder, test, debug=False):
+    # Compiles and simulates one test, with the fast profile when enabled. With debug, the test is
+    # simulated with full visibility and a wave dump instead (its log is written to debug.log)
+    log_folder = os.path.join(self.modelsim_folder, 'tb_stimuli', test['TestId'])
+    if not os.path.exists(log_folder):
+      os.makedirs(log_folder)
+    log_file = os.path.join(log_folder, 'debug.log' if debug else 'sim.log')
+    log_handle = open(log_file, 'w')
+    start = time.time()
+    # Debug runs (full visibility) are slower than expected: they have no timeout
+    timeout = None if debug else self.timeouts.get(test['TestId'])
+    sim_lines = None
+    if self.use_cache:
+      units, sim_lines = compile_cache.test_units(self.tb_scripts_folder, test['Script'], self.variables)
+      cache = compile_cache.CompileCache(worker_folder, self.vendor_base)
+      compiled = cache.compile(units, log_handle, simulator=self.simulator, shared_libraries=self.shared_libraries())
+      self.compile_times[test['TestId']] = time.time() - start
+      if compiled < 0:
+        log_handle.close()
+        return 'error', time.time() - start
+    checkers = {}
+    generics = {}
+    output = output_file(self.modelsim_folder, test)
+    if output is not None:
+      generics['out_file'] = output
+      if os.path.exists(output):
+        os.remove(output)
+    if sim_lines is not None:
+      checker = self.stream_checker(worker_folder, test, debug)
+      if checker is not None:
+        # The output file of the testbench is replaced by the pipe read by the checker
+        checkers[test['TestId']] = checker
+        generics['out_file'] = checker.fifo
+    if self.simulator is not None:
+      wave_file = os.path.join(log_folder, test['TestId'] + self.simulator.wave_extension) if debug else None
+      bound = runtime_model.simulation_bound(runtime_model.test_parameters(self.modelsim_folder, test['TestId']))
+      command = self.simulator.run_command(worker_folder, self.shared_libraries(), generics, wave_file, bound)
+      log_handle.write('# ' + ' '.join(command) + '\n')
+      returncode, aborted, expired = self.simulate(worker_folder, command, log_handle, checkers, timeout)
+      elapsed = time.time() - start
+      log_handle.close()
+      if aborted:
+        return 'failed', elapsed
+      if expired:
+        self.timed_out.add(test['TestId'])
+        return 'timeout', elapsed
+      log_handle = open(log_file, 'r')
+      log = log_handle.read()
+      log_handle.close()
+      return 'passed' if self.simulator.passed(returncode, log) else 'failed', elapsed
+    if sim_lines is not None and (debug or self.fast):
+      sim_lines = profile_sim_lines(sim_lines, 'debug' if debug else 'fast', os.path.join(log_folder, 'vsim.wlf'))
+    if generics:
+      if sim_lines is None:
+        # Without the compile cache the whole test script is run, with its output file replaced
+        script_handle = open(os.path.join(self.tb_scripts_folder, test['Script']), 'r')
+        sim_lines = script_handle.read().splitlines()
+        script_handle.close()
+      sim_lines = [line + ' {-gout_file=' + generics['out_file'] + '}' if line.strip().startswith('vsim ') else line for line in sim_lines]
+    script, result_file = self.write_test_script(worker_folder, test, sim_lines, self.fast and not debug)
+    if os.path.exists(result_file):
+      os.remove(result_file)
+    aborted, expired = self.simulate(worker_folder, [tool_path('vsim'), '-c', '-do', os.path.basename(script)], log_handle, checkers, timeout)[1:]
+    elapsed = time.time() - start
+    log_handle.close()
+    if aborted:
+      return 'failed', elapsed
+    if expired:
+      self.timed_out.add(test['TestId'])
+      return 'timeout', elapsed
+    return read_results(result_file).get(test['TestId'], 'error'), elapsed
+
+  def run_session(self, worker_folder, tests):
+    # Runs the tests (same generic configuration and session key) in one simulator session: the
+    # libraries are compiled for the first test, the testbench is optimized once and loaded for every
+    # test with its values as generics. Returns (test, status, elapsed) for every test
+    log_file = os.path.join(worker_folder, 'session.log')
+    log_handle = open(log_file, 'w')
+    start = time.time()
+    units = compile_cache.test_units(self.tb_scripts_folder, tests[0]['Script'], self.variables)[0]
+    cache = compile_cache.CompileCache(worker_folder, self.vendor_base)
+    compiled = cache.compile(units, log_handle) >= 0
+    # The libraries of the session are compiled with its first test
+    self.compile_times[tests[0]['TestId']] = time.time() - start
+    aborted = []
+    result_file = os.path.join(worker_folder, 'result.txt')
+    if os.path.exists(result_file):
+      os.remove(result_file)
+    if compiled:
+      script = os.path.join(worker_folder, 'session.do')
+      script_handle = open(script, 'w')
+      script_handle.write('onerror {quit -f -code 1}\n')
+      script_handle.write('do ' + tcl_path(os.path.join(self.tb_scripts_folder, 'sim_env.do')) + '\n')
+      script_handle.write(eval_result_proc(None if self.fast else os.path.join(self.modelsim_folder, 'cover'), design_instance(tests[0]['Script'])))
+      script_handle.write('set fp [open ' + tcl_path(result_file) + ' w]\n')
+      acc = FAST_ACC if self.fast else '+acc=bcglnprst+ccsds_shyloc_tb'
+      script_handle.write('vopt work.ccsds_shyloc_tb(arch) ' + acc + ' +floatgenerics -o ' + SESSION_DESIGN + '\n')
+      checkers = {}
+      for test in tests:
+        values = {'out_file': output_file(self.modelsim_folder, test)}
+        if os.path.exists(values['out_file']):
+          os.remove(values['out_file'])
+        checker = self.stream_checker(worker_folder, test)
+        if checker is not None:
+          checkers[test['TestId']] = checker
+          values['out_file'] = checker.fifo
+        script_handle.write('echo "#### TEST ' + test['TestId'] + ' [clock milliseconds]"\n')
+        vsim = 'vsim ' + ('' if self.fast else '-coverage ') + ' '.join(tb_generics(self.modelsim_folder, test, values)) + ' ' + SESSION_DESIGN
+        script_handle.write('\n'.join(mark_elaboration([vsim])) + '\n')
+        script_handle.write('onbreak {resume}\n')
+        script_handle.write('run %d us\n' % runtime_model.simulation_bound(runtime_model.test_parameters(self.modelsim_folder, test['TestId'])))
+        script_handle.write('onbreak resume\n')
+        script_handle.write('eval_result $SRC $fp ' + test['TestId'] + '\n')
+        script_handle.write('quit -sim\n')
+      script_handle.write('echo "#### END [clock milliseconds]"\n')
+      script_handle.write('close $fp\n')
+      script_handle.write('quit -f\n')
+      script_handle.close()
+      timeout = None
+      if self.timeouts:
+        timeout = sum([self.timeouts[t['TestId']] for t in tests])
+      aborted = self.simulate(worker_folder, [tool_path('vsim'), '-c', '-do', os.path.basename(script)], log_handle, checkers, timeout)[1]
+    log_handle.close()
+    results = read_results(result_file)
+    for test_id in aborted:
+      results[test_id] = 'failed'
+    # Split the session transcript in the sim.log of every test, using the markers written before
+    # every test to get their simulation times
+    log_handle = open(log_file, 'r')
+    test_logs = {}
+    marks = []
+    current = None
+    for line in log_handle:
+      match = re.search(r'#### (TEST (\S+)|END) (\d+)', line)
+      if match and not 'echo' in line:
+        current = match.group(2)
+        marks.append((current, int(match.group(3)) / 1000.0))
+      if current is not None:
+        test_logs.setdefault(current, []).append(line)
+    log_handle.close()
+    elapsed = {}
+    for i in range(len(marks) - 1):
+      elapsed[marks[i][0]] = marks[i + 1][1] - (start if i == 0 else marks[i][1])
+    if marks and marks[-1][0] in aborted:
+      elapsed[marks[-1][0]] = time.time() - marks[-1][1]
+    outcomes = []
+    for test in tests:
+      status = results.get(test['TestId'], 'error')
+      if status == 'error':
+        # Session broken before this test finished (or not started): run it on its own
+        status, test_elapsed = self.run_test(worker_folder, test)
+      else:
+        test_elapsed = elapsed.get(test['TestId'], 0.0)
+        log_folder = os.path.join(self.modelsim_folder, 'tb_stimuli', test['TestId'])
+        test_log_handle = open(os.path.join(log_folder, 'sim.log'), 'w')
+        test_log_handle.write(''.join(test_logs.get(test['TestId'], [])))
+        test_log_handle.close()
+      outcomes.append((test, status, test_elapsed))
+    return outcomes
+
+  def worker(self, worker_folder, pending):
+    self.prepare_worker(worker_folder)
+    config = None
+    while True:
+      config, tests = pending.get(config, self.session)
+      if not tests:
+        return
+      if len(tests) > 1:
+        outcomes = self.run_session(worker_folder, tests)
+      else:
+        outcomes = [(tests[0],) + self.run_test(worker_folder, tests[0])]
+      for test, status, elapsed in outcomes:
+        status = self.check_output(test, status)
+        text = '%.1f s, %s' % (elapsed, os.path.basename(worker_folder))
+        if test['TestId'] in self.aborted:
+          text += ', stopped at the first mismatch'
+        if test['TestId'] in self.timed_out:
+          text += ', wall-clock timeout'
+        test_folder = os.path.join(self.modelsim_folder, 'tb_stimuli', test['TestId'])
+        log_file = os.path.join(test_folder, 'sim.log')
+        if status == 'failed' and not test['TestId'] in self.aborted and bound_reached(log_file):
+          status = 'timeout'
+          text += ', simulated time bound reached'
+        measures = {'wall_s': elapsed, 'simulated_ns': simulated_time(log_file), 'elaboration_s': elaboration_time(log_file),
+                    'compile_s': self.compile_times.get(test['TestId'])}
+        if status in ['passed', 'failed']:
+          self.result_cache.set_time(test['TestId'], elapsed, measures['simulated_ns'])
+        rerun = self.fast and status == 'failed'
+        if rerun:
+          # Simulated again with full visibility and coverage, to debug it from the wave dump
+          status, elapsed = self.run_test(worker_folder, test, debug=True)
+          status = self.check_output(test, status)
+          text += ', rerun with full visibility in %.1f s: %s' % (elapsed, status)
+        # The coverage files are only written by the simulations with coverage
+        if status == 'passed' and (rerun or not self.fast):
+          self.result_cache.put(self.result_keys[test['TestId']], status, self.result_files(test))
+          self.add_coverage(test)
+          if self.simulator is None:
+            measures['coverage'] = coverage_merge.summary_coverage(self.modelsim_folder, test['TestId'])
+        else:
+          self.result_cache.put(self.result_keys[test['TestId']], status, {})
+        measures['failure_bit'] = self.failure_bits.get(test['TestId']) if status == 'failed' else None
+        self.report(test, status, text, 'simulated', measures)
+
+  def add_coverage(self, test):
+    database = coverage_merge.test_database(self.modelsim_folder, test['TestId'])
+    if self.merger is not None and os.path.exists(database):
+      self.merger.add(database)
+
+  def run(self, tests, jobs, completed=None):
+    # completed: tests completed by the interrupted run that is resumed (see run_journal.py), None when
+    # it is a new run
+    self.total = len(tests)
+    self.result_keys_of(tests)
+    if self.simulator is None and not self.fast:
+      self.merger = coverage_merge.TreeMerger(self.modelsim_folder, jobs)
+    self.journal.start([test['TestId'] for test in tests], ' '.join(sys.argv[1:]), completed is not None)
+    self.run_id = self.database.start_run(self.simulator.tool if self.simulator is not None else 'questa', ' '.join(sys.argv[1:]))
+    pending_tests = []
+    for test in tests:
+      key = self.result_keys[test['TestId']]
+      status, source, text = None, 'cached', 'cached'
+      if completed and completed.get(test['TestId'], (None, None))[1] == key:
+        status, source, text = completed[test['TestId']][0], 'resumed', 'completed before the interruption'
+      elif not self.force:
+        status = self.result_cache.get(key)
+      if status is None:
+        pending_tests.append(test)
+      else:
+        self.result_cache.restore(key, self.result_files(test))
+        self.report(test, status, text, source)
+        if status == 'passed':
+          self.add_coverage(test)
+    tests = pending_tests
+    if tests:
+      self.run_pending(tests, jobs)
+    # A run with errors (license drop, timeout, simulator crash) is left open, to be resumed
+    if len([s for s in self.results.values() if s in ['passed', 'failed']]) == self.total:
+      self.journal.end()
+    return self.results
+
+  def run_pending(self, tests, jobs):
+    if self.use_cache:
+      self.build_vendor_libraries()
+    if self.session > 1:
+      for test in tests:
+        test['Session'] = session_key(self.modelsim_folder, test)
+    duration = runtime_model.durations(self.modelsim_folder, tests)[0]
+    if self.timeout_factor > 0:
+      self.timeouts = dict([(t, self.timeout_factor * duration[t] + TIMEOUT_MARGIN) for t in duration])
+    pending = TestQueue(tests, duration)
+    jobs = max(1, min(jobs, len(tests)))
+    print('Expected simulation time: %.1f min\n' % (runtime_model.lpt_schedule(duration, jobs)[1] / 60.0))
+    threads = []
+    for n in range(jobs):
+      worker_folder = os.path.join(self.modelsim_folder, 'workers' + self.folder_suffix, 'w' + str(n))
+      t = threading.Thread(target=self.worker, args=(worker_folder, pending))
+      t.daemon = True
+      t.start()
+      threads.append(t)
+    # join with a timeout so that Ctrl-C is still delivered to the main thread
+    try:
+      for t in threads:
+        while t.is_alive():
+          t.join(1)
+    finally:
+      self.result_cache.save_times()
+
+  def merge_coverage(self):
+    # Final merge of the coverage databases into cover/merged_result.ucdb
+    if self.merger is not None and not self.merger.finish():
+      print('Coverage could not be merged, see cover/vcover.log')
+
+def write_report(modelsim_folder, tests, results):
+  report_handle = open(os.path.join(modelsim_folder, 'tb_scripts', 'verification_report.txt'), 'w')
+  for test in tests:
+    report_handle.write(test['TestId'] + ' ' + results.get(test['TestId'], 'error') + '\n')
+  report_handle.close()
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Run the generated simulation scripts with several simulator processes in parallel')
+  parser.add_argument('modelsim_folder', help='modelsim folder of the IP core database')
+  parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='number of simulator processes launched concurrently')
+  parser.add_argument('-t', '--test', action='append', default=[], help='run only this test (can be repeated)')
+  parser.add_argument('--no-cache', action='store_true', help='run the complete test scripts, compiling all the libraries for every test')
+  parser.add_argument('--session', type=int, default=1, metavar='N', help='run up to N tests of the same configuration in one simulator session')
+  parser.add_argument('--force', action='store_true', help='simulate all the tests, even those with a result in the result cache')
+  parser.add_argument('--since', metavar='REV', help='run only the tests affected by the files changed since this git revision')
+  parser.add_argument('--no-check', action='store_true', help='do not compare the compressed images with the references after the simulation')
+  parser.add_argument('--early-abort', action='store_true', help='compare the compressed images while they are simulated and stop at the first mismatch')
+  parser.add_argument('--budget', type=float, metavar='MINUTES', help='run only the tests that fit in this time budget, covering most features first')
+  parser.add_argument('--timeout-factor', type=float, default=4.0, metavar='F', help='stop a simulation after F times its expected duration plus %d s (0: no timeout)' % TIMEOUT_MARGIN)
+  parser.add_argument('--fast', action='store_true', help='simulate an optimized testbench without coverage and run the failed tests again with full visibility')
+  parser.add_argument('--resume', action='store_true', help='continue the last run if it was interrupted, without simulating again its completed tests')
+  parser.add_argument('--simulator', choices=['questa'] + sorted(open_simulators.SIMULATORS), default='questa', help='simulator used to compile and run the tests')
+  args = parser.parse_args()
+  modelsim_folder = os.path.abspath(args.modelsim_folder)
+  tests = read_manifest(modelsim_folder)
+  completed = None
+  if args.resume:
+    if args.test or args.since or args.budget is not None:
+      parser.error('--resume runs the tests of the interrupted run and can not be used with -t, --since or --budget')
+    test_ids, completed = run_journal.RunJournal(modelsim_folder).interrupted_run()
+    if test_ids is None:
+      print('The last run is complete: nothing to resume')
+      sys.exit(0)
+    tests = [t for t in tests if t['TestId'] in test_ids]
+    print('Resuming a run of %d tests, %d of them completed' % (len(tests), len(completed)))
+  if args.test:
+    tests = [t for t in tests if t['TestId'] in args.test]
+  if args.since:
+    tests = vhdl_deps.affected_tests(modelsim_folder, tests, vhdl_deps.changed_files(args.since, modelsim_folder))
+  if args.budget is not None:
+    tests, duration = test_budget.plan(modelsim_folder, tests, args.budget * 60, args.jobs)
+    makespan = runtime_model.lpt_schedule(dict([(t['TestId'], duration[t['TestId']]) for t in tests]), args.jobs)[1]
+    print('%d tests selected for a budget of %g min (estimated %.1f min)' % (len(tests), args.budget, makespan / 60.0))
+  print('*****************************************\n')
+  configs = len(set([test.get('ConfigHash') or test['TestId'] for test in tests]))
+  print('Running %d tests (%d generic configurations) with %d parallel simulator processes\n' % (len(tests), configs, max(1, min(args.jobs, len(tests)))))
+  start = time.time()
+  if args.session > 1 and args.no_cache:
+    parser.error('--session can not be used with --no-cache')
+  if args.early_abort and (args.no_cache or not hasattr(os, 'mkfifo')):
+    parser.error('--early-abort needs named pipes and can not be used with --no-cache')
+  if args.fast and args.no_cache:
+    parser.error('--fast can not be used with --no-cache')
+  if (not args.no_check or args.early_abort) and compare_module() is None:
+    if args.early_abort:
+      parser.error('--early-abort compares the outputs with compare_output.py, which needs numpy')
+    print('numpy is not installed: the outputs are not compared with their references (as with --no-check)\n')
+    args.no_check = True
+  simulator = None
+  if args.simulator != 'questa':
+    if args.session > 1 or args.no_cache:
+      parser.error('--session and --no-cache can only be used with --simulator questa')
+    simulator = open_simulators.SIMULATORS[args.simulator]()
+  runner = SimRunner(modelsim_folder, not args.no_cache, args.session, args.force, not args.no_check, args.early_abort, simulator, args.fast, args.timeout_factor)
+  results = runner.run(tests, args.jobs, completed)
+  write_report(modelsim_folder, tests, results)
+  runner.merge_coverage()
+  passed = len([t for t in tests if results.get(t['TestId']) == 'passed'])
+  failed = len([t for t in tests if results.get(t['TestId']) == 'failed'])
+  timeouts = len([t for t in tests if results.get(t['TestId']) == 'timeout'])
+  print('\n**************** Simulations finished *******************')
+  print('Passed: %d  Failed: %d  Timeouts: %d  Errors: %d  Total time: %.1f s' % (passed, failed, timeouts, len(tests) - passed - failed - timeouts, time.time() - start))
+  print('**** Verification report has been written to modelsim/tb_scripts/verification_report.txt')
+  print('*********************************************************')
+  if passed != len(tests):
+    sys.exit(1)
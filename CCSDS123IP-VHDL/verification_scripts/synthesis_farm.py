@@ -0,0 +1,559 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+
+# Synthesis farm: runs the synthesis of every configuration of a *.csv file for every target
+# technology of a synthesis tool (Synplify, ISE, Vivado, Design Compiler or NanoXmap) as an
+# independent job, with several tool processes in parallel.
+#
+# The serial flows of run_vhdl_tests_123.py synthesize the configurations one after another in a
+# single project (all_synplify.tcl, all_ise.tcl, all_vivado.tcl, all_dc.tcl, all_nanoxplore.py). Here
+# every (configuration, target) pair is a job with its own project folder,
+# synthesis/syn_scripts/<tool>/farm/<Target>_<TestId>, where the script of the job (job.tcl or the
+# NanoXmap script) is written and the tool runs, so the jobs do not share any project, run or log
+# file. The jobs are taken from a shared queue by a bounded pool of workers (-j, default: number of
+# cores), each of them running one tool process at a time.
+# The jobs use the files generated by run_vhdl_tests_123.py for the same tool and *.csv file (premap
+# parameter packages, add_ip_core.tcl/add_ip_core.py, and the <TestId>.tcl or <TestId>_<tech>.py
+# scripts of Design Compiler and NanoXmap), which must be generated first (make scripts_<tool>).
+# The options of every target are the ones of the serial flows. When a job finishes, its reports are
+# collected into the report folder of the tool, with the names of the serial flows where they have
+# one:
+#   synplify  report/<Target>_<TestId>_synplify.srr and the mapper timing and area reports
+#   ise       report/<Target>_<TestId>_ise.syr
+#   vivado    report/<Target>_<TestId>_vivado.rds, and the hierarchical utilization and timing summary
+#             reports (clocks constrained to the frequency of Synplify) _vivado_hierarchy.rpt and
+#             _vivado_timing.rpt
+#   dc        report/<TestId> and results/<TestId>
+#   brave     report/<TestId> (with the general_<tech>.log of the job) and results/<TestId>
+# A job passes when the tool ends without error and all its reports are found. The outcome and time
+# of every job are written to report/farm_report.txt, and the output of the tool to the farm.log of
+# the job folder. The metrics of every passed job (Fmax, slack, resources) are parsed from its reports
+# and added to synthesis/synthesis_results.db (see synthesis_metrics.py).
+#
+# With --fmax (tools accepting a frequency constraint: synplify, vivado and dc), the constraint is not
+# the fixed frequency of the serial flows (150 MHz): the maximum frequency of every (configuration,
+# target) pair is searched by synthesizing it with several constraints (probes, see fmax_search.py).
+# Every probe is a job of its own, <Target>_<TestId>_<f>MHz, whose reports are collected into
+# fmax/<f>MHz/report, and the probes of all the searches share the pool of workers. The highest
+# constraint met (with the metrics of its probe) is added to the database as the achieved frequency,
+# and the probes of every search are written to report/fmax_report.txt (the probes that failed or
+# ended with an error apart, after "errors").
+#
+# Some command line examples:
+# synthesis_farm.py synthesis_params_123_e.csv ../ synplify
+# synthesis_farm.py synthesis_params_123_e.csv ../ synplify -j 8 --target RT4G4150
+# synthesis_farm.py synthesis_params_123_e.csv ../ brave -j 4 -t 20_Test
+# synthesis_farm.py synthesis_params_123_e.csv ../ dc -j 16
+# synthesis_farm.py synthesis_params_123_e.csv ../ synplify -j 16 --fmax --range 50 250 --probes 2
+#
+#How to run this script
+#  synthesis_farm.py
+#(1) *.csv file with the configurations (the one used to generate the synthesis scripts)
+#(2) path to the IP core database
+#(3) synthesis tool: synplify, ise, vivado, dc or brave
+#-j, --jobs  number of synthesis processes launched concurrently (default: number of cores)
+#-t, --test  synthesize only the given configuration (can be repeated)
+#--target    synthesize only for the given target (can be repeated)
+#--fmax      search the maximum frequency of every configuration and target
+#--range     lowest and highest frequencies (MHz) of the search (default: 20 400)
+#--tolerance precision (MHz) of the maximum frequency found (default: 1)
+#--probes    frequencies synthesized in parallel in every round of a search (default: 1)
+#--rounds    maximum number of rounds of a search (default: 8)
+#
+# Module usage:
+#   tool = synthesis_farm.SYNTHESIS_TOOLS['synplify'](database_folder)
+#   jobs = synthesis_farm.farm_jobs(tool, test_ids)
+#   results = synthesis_farm.SynthesisFarm(tool).run(jobs, jobs_count)
+#   results = synthesis_farm.SynthesisFarm(tool).run(jobs, jobs_count, (low, high, tolerance, probes, rounds))
+
+from __future__ import print_function
+import sys, os, csv, glob, time, shutil, argparse, subprocess, threading, multiprocessing
+from os.path import sep
+import synthesis_metrics
+import fmax_search
+from synthesis_metrics import FREQUENCY
+
+def tcl_path(path):
+  return os.path.abspath(path).replace(sep, '/')
+
+def write_clocks(file_name, frequency):
+  # Constraint file (XDC/SDC) of the IP core and AHB clocks at frequency (MHz)
+  clocks = open(file_name, 'w')
+  for clock in ['Clk_S', 'Clk_AHB']:
+    clocks.write('create_clock -name %s -period %.3f [get_ports %s]\n' % (clock, 1000.0 / frequency, clock))
+  clocks.close()
+
+def read_configurations(csv_file):
+  # Identifiers of the configurations of a *.csv file (first column, after the two header rows)
+  csv_handle = open(csv_file, 'r')
+  rows = list(csv.reader(csv_handle, delimiter=','))
+  csv_handle.close()
+  return [row[0] for row in rows[2:] if row and row[0].strip()]
+
+class SynthesisTool(object):
+  # tool: name of the tool (synthesis_farm.py and synthesis_metrics.py), name: folder of the tool in
+  # synthesis/syn_scripts, targets: (target, technology) pairs, frequency_constraint: whether the
+  # jobs can be given a frequency constraint (--fmax)
+  tool = None
+  name = None
+  targets = []
+  frequency_constraint = False
+
+  def __init__(self, database_folder):
+    self.database_folder = os.path.abspath(database_folder)
+    self.folder = os.path.join(self.database_folder, 'synthesis', 'syn_scripts', self.name)
+
+  def parameters(self, test_id):
+    return tcl_path(os.path.join(self.database_folder, 'synthesis', 'premap_parameters', test_id, 'ccsds123_parameters.vhd'))
+
+  def missing_inputs(self, test_id, target):
+    # Generated files needed by a job that are not found
+    files = [os.path.join(self.folder, 'add_ip_core.tcl'), self.parameters(test_id)]
+    return [f for f in files if not os.path.exists(f)]
+
+  def write_job(self, job_folder, test_id, target, technology, frequency=None):
+    # Writes the script of a job in its folder and returns the command running it. frequency: clock
+    # constraint in MHz (default of the tool when None)
+    raise NotImplementedError
+
+  def reports(self, test_id, target, technology):
+    # (pattern relative to the job folder, destination relative to the tool folder) of every report
+    # of a job; a destination ending with / is a folder receiving all the files of the pattern
+    raise NotImplementedError
+
+class Synplify(SynthesisTool):
+  tool = 'synplify'
+  name = 'synplify'
+  targets = [('XC5VFX130T', 'Virtex5'), ('XQR5VFX130', 'QProRVirtex5'), ('A3PE3000', 'ProASIC3E'),
+             ('RTAX4000S', 'Axcelerator'), ('RT4G4150', 'RTG4')]
+  frequency_constraint = True
+
+  def write_job(self, job_folder, test_id, target, technology, frequency=None):
+    impl = target + '_' + test_id
+    script = open(os.path.join(job_folder, 'job.tcl'), 'w')
+    script.write('set SRC ' + tcl_path(self.database_folder) + '\n' +
+                 'project -new ' + tcl_path(job_folder) + '/ccsds123_project.prj\n' +
+                 'add_file -fpga_constraint "' + tcl_path(self.folder) + '/ccsds123_project.fdc"\n' +
+                 'add_file -lib shyloc_123 -vhdl ' + self.parameters(test_id) + '\n' +
+                 'source $SRC/synthesis/syn_scripts/synplify/add_ip_core.tcl\n' +
+                 'impl -add ' + impl + '\n' +
+                 'impl -name ' + impl + ' -movedir\n' +
+                 'set_option -frequency %g\n' % (frequency or FREQUENCY) +
+                 'set_option -symbolic_fsm_compiler 1\n' +
+                 'set_option -use_fsm_explorer 1\n' +
+                 'set_option -technology ' + technology + '\n' +
+                 'set_option -part ' + target + '\n' +
+                 'set_option -top_module shyloc_123.ccsds123_top\n' +
+                 'puts "Running synthesis with configuration :' + test_id + '"\n' +
+                 'if {[catch {project -run} errormsg]} {\n' +
+                 'puts "No implementation"\n' +
+                 'exit 1\n' +
+                 '}\n' +
+                 'project -save\n')
+    script.close()
+    return ['synplify_premier', '-batch', 'job.tcl']
+
+  def reports(self, test_id, target, technology):
+    impl = target + '_' + test_id
+    return [(impl + '/*.srr', 'report/' + impl + '_synplify.srr'),
+            (impl + '/synlog/report/*mapper_timing_report.xml', 'report/' + impl + '_synplify_fpga_mapper_timing_report.xml'),
+            (impl + '/synlog/report/*mapper_area_report.xml', 'report/' + impl + '_synplify_fpga_mapper_area_report.xml')]
+
+class Ise(SynthesisTool):
+  tool = 'ise'
+  name = 'ise'
+  targets = [('XC5VFX130T', 'virtex5')]
+
+  def write_job(self, job_folder, test_id, target, technology, frequency=None):
+    script = open(os.path.join(job_folder, 'job.tcl'), 'w')
+    script.write('set SRC ' + tcl_path(self.database_folder) + '\n' +
+                 'project new ' + tcl_path(job_folder) + '/ccsds123_project.prj\n' +
+                 'project set family ' + technology + '\n' +
+                 'project set device ' + target + '\n' +
+                 'project set package ff1738\n' +
+                 'project set speed -1\n' +
+                 'lib_vhdl new shyloc_utils\n' +
+                 'lib_vhdl new shyloc_123\n' +
+                 'project set "Manual Compile Order" "true"\n' +
+                 'project set "Other XST Command Line Options" "-use_new_parser yes"\n' +
+                 'xfile add ' + self.parameters(test_id) + ' -lib_vhdl shyloc_123\n' +
+                 'source $SRC/synthesis/syn_scripts/ise/add_ip_core.tcl\n' +
+                 'project set top ccsds123_top\n' +
+                 'puts "Running synthesis with configuration:' + test_id + '"\n' +
+                 'if {![process run "Synthesize - XST"]} {\n' +
+                 'project close\n' +
+                 'exit 1\n' +
+                 '}\n' +
+                 'project close\n')
+    script.close()
+    return ['xtclsh', 'job.tcl']
+
+  def reports(self, test_id, target, technology):
+    return [('*.syr', 'report/' + target + '_' + test_id + '_ise.syr')]
+
+class Vivado(SynthesisTool):
+  # The add_ip_core.tcl of Vivado is generated in synthesis/syn_scripts/VIVADO
+  tool = 'vivado'
+  name = 'VIVADO'
+  targets = [('ZC706', 'xc7z045ffg900-2'), ('zedboard', 'xc7z020clg484-1')]
+  frequency_constraint = True
+
+  def write_job(self, job_folder, test_id, target, technology, frequency=None):
+    write_clocks(os.path.join(job_folder, 'clocks.xdc'), frequency or FREQUENCY)
+    script = open(os.path.join(job_folder, 'job.tcl'), 'w')
+    script.write('set SRC ' + tcl_path(self.database_folder) + '\n' +
+                 'create_project shyloc_123 ' + tcl_path(job_folder) + ' -part ' + technology + '\n' +
+                 'set_property target_language VHDL [current_project]\n' +
+                 'add_files -norecurse ' + self.parameters(test_id) + '\n' +
+                 'set_property library shyloc_123 [get_files ' + self.parameters(test_id) + ']\n' +
+                 'source $SRC/synthesis/syn_scripts/VIVADO/add_ip_core.tcl\n' +
+                 'add_files -fileset constrs_1 -norecurse clocks.xdc\n' +
+                 'set_property top ccsds123_top [current_fileset]\n' +
+                 'launch_runs synth_1 -jobs 1\n' +
+                 'wait_on_run synth_1\n' +
+                 'if {[get_property PROGRESS [get_runs synth_1]] != "100%"} {\n' +
+                 'puts "No implementation"\n' +
+                 'exit 1\n' +
+                 '}\n' +
+                 'open_run synth_1\n' +
+                 'report_timing_summary -file timing_summary.rpt\n' +
+                 'report_utilization -hierarchical -file utilization_hierarchical.rpt\n' +
+                 'exit\n')
+    script.close()
+    return ['vivado', '-mode', 'batch', '-source', 'job.tcl']
+
+  def reports(self, test_id, target, technology):
+    return [('shyloc_123.runs/synth_1/*.rds', 'report/' + target + '_' + test_id + '_vivado.rds'),
+            ('timing_summary.rpt', 'report/' + target + '_' + test_id + '_vivado_timing.rpt'),
+            ('utilization_hierarchical.rpt', 'report/' + target + '_' + test_id + '_vivado_hierarchy.rpt')]
+
+class DesignCompiler(SynthesisTool):
+  # dc.tcl (synthesis/syn_scripts/dc/base) reads the generated <TEST_ID>.tcl and writes the reports
+  # and results to report/<TEST_ID> and results/<TEST_ID> of the folder where dc_shell runs
+  tool = 'dc'
+  name = 'dc'
+  targets = [('dc', None)]
+  frequency_constraint = True
+
+  def missing_inputs(self, test_id, target):
+    return SynthesisTool.missing_inputs(self, test_id, target) + [f for f in [os.path.join(self.folder, test_id + '.tcl')] if not os.path.exists(f)]
+
+  def write_job(self, job_folder, test_id, target, technology, frequency=None):
+    # With a frequency, the SDC file read by dc.tcl is written in the job folder (first folder of the
+    # search path); otherwise the constraints of the dc folders are used
+    if frequency:
+      write_clocks(os.path.join(job_folder, 'ccsds123_top.sdc'), frequency)
+    script = open(os.path.join(job_folder, 'job.tcl'), 'w')
+    script.write('set SRC ' + tcl_path(self.database_folder) + '\n' +
+                 'set_app_var search_path ". ' + tcl_path(self.folder) + ' ' + tcl_path(self.folder) + '/base $search_path"\n' +
+                 'puts "Starting Synthesis of ' + test_id + '\\n"\n' +
+                 'set TEST_ID ' + test_id + '\n' +
+                 'if {[catch {source dc.tcl} errormsg]} {\n' +
+                 'puts $errormsg\n' +
+                 'exit 1\n' +
+                 '}\n' +
+                 'puts "Finished Synthesis of ' + test_id + '\\n"\n' +
+                 'exit\n')
+    script.close()
+    return ['dc_shell', '-f', 'job.tcl']
+
+  def reports(self, test_id, target, technology):
+    return [('report/' + test_id + '/*', 'report/' + test_id + '/'),
+            ('results/' + test_id + '/*', 'results/' + test_id + '/')]
+
+class NanoXmap(SynthesisTool):
+  # The generated <TestId>_<tech>.py script creates its NanoXmap project in its own folder and reads
+  # add_ip_core.py from the current folder: both are copied to the job folder, where it runs
+  tool = 'brave'
+  name = 'brave'
+  targets = synthesis_metrics.BRAVE_TARGETS
+
+  def script(self, test_id, technology):
+    return test_id + '_' + technology + '.py'
+
+  def missing_inputs(self, test_id, target):
+    technology = dict(self.targets)[target]
+    files = [os.path.join(self.folder, 'add_ip_core.py'), os.path.join(self.folder, self.script(test_id, technology)), self.parameters(test_id)]
+    return [f for f in files if not os.path.exists(f)]
+
+  def write_job(self, job_folder, test_id, target, technology, frequency=None):
+    shutil.copy(os.path.join(self.folder, self.script(test_id, technology)), job_folder)
+    shutil.copy(os.path.join(self.folder, 'add_ip_core.py'), job_folder)
+    for folder in ['report', 'results']:
+      os.makedirs(os.path.join(job_folder, folder))
+    return ['nxpython3', self.script(test_id, technology)]
+
+  def reports(self, test_id, target, technology):
+    return [('report/' + test_id + '/*', 'report/' + test_id + '/'),
+            ('logs/general.log', 'report/' + test_id + '/general_' + technology + '.log'),
+            ('results/' + test_id + '/*', 'results/' + test_id + '/')]
+
+SYNTHESIS_TOOLS = {'synplify': Synplify, 'ise': Ise, 'vivado': Vivado, 'dc': DesignCompiler, 'brave': NanoXmap}
+
+def farm_jobs(tool, test_ids, targets=None):
+  # One job for every configuration and target (all the targets of the tool when targets is None)
+  jobs = []
+  for target, technology in tool.targets:
+    if targets and not target in targets and not technology in targets:
+      continue
+    for test_id in test_ids:
+      jobs.append({'Job': target + '_' + test_id, 'TestId': test_id, 'Target': target, 'Technology': technology})
+  return jobs
+
+def collect(job_folder, tool_folder, reports):
+  # Copies the reports of a job to the tool folder; returns the patterns without any file
+  missing = []
+  for pattern, destination in reports:
+    files = sorted([f for f in glob.glob(os.path.join(job_folder, pattern)) if os.path.isfile(f)])
+    if not files:
+      missing.append(pattern)
+      continue
+    destination = os.path.join(tool_folder, destination)
+    if destination.endswith('/'):
+      if not os.path.isdir(destination):
+        os.makedirs(destination)
+      for f in files:
+        shutil.copy(f, destination)
+    else:
+      if not os.path.isdir(os.path.dirname(destination)):
+        os.makedirs(os.path.dirname(destination))
+      shutil.copy(files[0], destination)
+  return missing
+
+class SynthesisFarm(object):
+  def __init__(self, tool):
+    self.tool = tool
+    self.farm_folder = os.path.join(tool.folder, 'farm')
+    self.results = {}
+    self.times = {}
+    self.total = 0
+    self.lock = threading.Lock()
+    # Signals the workers waiting for the next probes of the searches
+    self.condition = threading.Condition(self.lock)
+    self.pending = []
+    self.running = 0
+    self.searches = {}
+    self.database = synthesis_metrics.SynthesisDatabase(tool.database_folder)
+
+  def report(self, job, status, text):
+    self.lock.acquire()
+    self.results[job['Job']] = status
+    print('[%d/%d] %s %s (%s)' % (len(self.results), self.total, job['Job'], status, text))
+    sys.stdout.flush()
+    self.lock.release()
+
+  def run_job(self, job):
+    # Runs a job in a new project folder and collects its reports into its report root (the tool
+    # folder, or the folder of the frequency of a probe); returns the status, metrics, hierarchy and
+    # a description of the run
+    job_folder = os.path.join(self.farm_folder, job['Job'])
+    missing = self.tool.missing_inputs(job['TestId'], job['Target'])
+    if missing:
+      return 'error', {}, [], 'missing ' + ', '.join(missing) + ', generate the synthesis scripts first'
+    if os.path.exists(job_folder):
+      shutil.rmtree(job_folder)
+    os.makedirs(job_folder)
+    command = self.tool.write_job(job_folder, job['TestId'], job['Target'], job['Technology'], job.get('Frequency'))
+    log_handle = open(os.path.join(job_folder, 'farm.log'), 'w')
+    null_handle = open(os.devnull, 'r')
+    start = time.time()
+    try:
+      returncode = subprocess.call(command, cwd=job_folder, stdin=null_handle, stdout=log_handle, stderr=subprocess.STDOUT)
+    except OSError as e:
+      log_handle.write('Could not launch ' + command[0] + ': ' + str(e) + '\n')
+      returncode = -1
+    elapsed = time.time() - start
+    null_handle.close()
+    log_handle.close()
+    self.times[job['Job']] = elapsed
+    # The reports of a failed run are collected too, they tell why it failed
+    root = job.get('Root', self.tool.folder)
+    missing = collect(job_folder, root, self.tool.reports(job['TestId'], job['Target'], job['Technology']))
+    text = '%.1f s' % elapsed
+    if returncode != 0:
+      text += ', exit code %d' % returncode
+    if missing:
+      text += ', no ' + ', '.join(missing)
+    status = 'passed' if returncode == 0 and not missing else 'failed'
+    metrics, hierarchy = {}, []
+    if status == 'passed':
+      metrics, hierarchy = synthesis_metrics.parse_reports(self.tool.tool, root, job['TestId'], job['Target'], job.get('Frequency'))
+      if metrics.get('fmax_mhz') is not None:
+        text += ', Fmax %.1f MHz' % metrics['fmax_mhz']
+      if metrics.get('slack_ns') is not None:
+        text += ', slack %.3f ns' % metrics['slack_ns']
+    return status, metrics, hierarchy, text
+
+  def finish(self, job, status, metrics, hierarchy, text):
+    if not 'Search' in job:
+      if status == 'passed':
+        requested = FREQUENCY if self.tool.frequency_constraint else None
+        self.database.add(self.tool.tool, job['TestId'], job['Target'], metrics, hierarchy, requested)
+      self.report(job, status, text)
+      return
+    # Probe of a maximum frequency search: its next round is queued when all the probes of the
+    # round have finished, or the search is recorded when it is done
+    search = self.searches[job['Search']]
+    self.lock.acquire()
+    print('  %s probe at %g MHz %s (%s)' % (job['Search'], job['Frequency'], status, text))
+    sys.stdout.flush()
+    search.add(job['Frequency'], status, metrics, hierarchy)
+    frequencies = search.next_frequencies()
+    self.pending[0:0] = [self.probe(job, frequency) for frequency in frequencies]
+    done = not frequencies and not search.outstanding
+    self.lock.release()
+    if done:
+      search_job = dict(job, Job=job['Search'])
+      self.times[search_job['Job']] = sum([self.times.get(self.probe(job, f)['Job'], 0.0) for f in set([r[0] for r in search.results])])
+      achieved = search.achieved()
+      probes = ', '.join(['%g MHz %s' % (r[0], 'met' if r[1] else 'not met') for r in sorted(search.results) if r[2] == 'passed'])
+      if search.errors():
+        probes += '; probes not finished: ' + ', '.join(['%g MHz %s' % error for error in sorted(search.errors())])
+      if achieved is None:
+        self.report(search_job, 'failed', 'no frequency met, probes: ' + probes)
+        return
+      frequency, metrics, hierarchy = achieved
+      self.database.add(self.tool.tool, job['TestId'], job['Target'], metrics, hierarchy, frequency, frequency)
+      self.report(search_job, 'passed', 'Fmax %g MHz, probes: %s' % (frequency, probes))
+
+  def probe(self, job, frequency):
+    # Job synthesizing the configuration and target of a search with a frequency constraint
+    name = job['Target'] + '_' + job['TestId']
+    return {'Job': '%s_%gMHz' % (name, frequency), 'TestId': job['TestId'], 'Target': job['Target'], 'Technology': job['Technology'],
+            'Frequency': frequency, 'Search': name, 'Root': os.path.join(self.tool.folder, 'fmax', '%gMHz' % frequency)}
+
+  def worker(self):
+    while True:
+      self.condition.acquire()
+      # While jobs are running, the searches can still queue new probes
+      while not self.pending and self.running:
+        self.condition.wait(1)
+      job = self.pending.pop(0) if self.pending else None
+      if job is not None:
+        self.running += 1
+      self.condition.release()
+      if job is None:
+        return
+      try:
+        self.finish(job, *self.run_job(job))
+      finally:
+        self.condition.acquire()
+        self.running -= 1
+        self.condition.notify_all()
+        self.condition.release()
+
+  def run(self, jobs, jobs_count, search=None):
+    # search: (low, high, tolerance, probes, rounds) of a maximum frequency search of every job
+    self.total = len(jobs)
+    self.pending = list(jobs)
+    if search is not None:
+      self.pending = []
+      for job in jobs:
+        self.searches[job['Job']] = fmax_search.FmaxSearch(*search)
+        self.pending += [self.probe(job, frequency) for frequency in self.searches[job['Job']].next_frequencies()]
+    threads = []
+    for n in range(max(1, jobs_count)):
+      t = threading.Thread(target=self.worker)
+      t.daemon = True
+      t.start()
+      threads.append(t)
+    # join with a timeout so that Ctrl-C is still delivered to the main thread
+    for t in threads:
+      while t.is_alive():
+        t.join(1)
+    return self.results
+
+  def write_report(self, jobs):
+    report_folder = os.path.join(self.tool.folder, 'report')
+    if not os.path.isdir(report_folder):
+      os.makedirs(report_folder)
+    report_handle = open(os.path.join(report_folder, 'farm_report.txt'), 'w')
+    for job in jobs:
+      report_handle.write('%s %s %.1f\n' % (job['Job'], self.results.get(job['Job'], 'error'), self.times.get(job['Job'], 0.0)))
+    report_handle.close()
+    if self.searches:
+      # Achieved Fmax, passed probes (frequency, met, worst slack) and probes that failed or ended
+      # with an error (frequency, status) of every search
+      report_handle = open(os.path.join(report_folder, 'fmax_report.txt'), 'w')
+      for job in jobs:
+        search = self.searches[job['Job']]
+        achieved = search.achieved()
+        report_handle.write(job['Job'] + ' ' + ('-' if achieved is None else '%g' % achieved[0]))
+        for frequency, met, status, metrics, hierarchy in sorted(search.results):
+          if status == 'passed':
+            slack = metrics.get('slack_ns')
+            report_handle.write(' %g:%s:%s' % (frequency, 'met' if met else 'not_met', '-' if slack is None else '%.3f' % slack))
+        errors = search.errors()
+        if errors:
+          report_handle.write(' errors ' + ' '.join(['%g:%s' % error for error in sorted(errors)]))
+        report_handle.write('\n')
+      report_handle.close()
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Run the synthesis of every configuration and target as an independent job, with several tool processes in parallel')
+  parser.add_argument('csv_file', help='*.csv file with the configurations')
+  parser.add_argument('database_folder', help='path to the IP core database')
+  parser.add_argument('tool', choices=sorted(SYNTHESIS_TOOLS), help='synthesis tool')
+  parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='number of synthesis processes launched concurrently')
+  parser.add_argument('-t', '--test', action='append', default=[], help='synthesize only this configuration (can be repeated)')
+  parser.add_argument('--target', action='append', default=[], help='synthesize only for this target (can be repeated)')
+  parser.add_argument('--fmax', action='store_true', help='search the maximum frequency of every configuration and target')
+  parser.add_argument('--range', type=float, nargs=2, default=[20.0, 400.0], metavar=('LOW', 'HIGH'), help='frequencies (MHz) searched by --fmax')
+  parser.add_argument('--tolerance', type=float, default=1.0, metavar='MHZ', help='precision of the maximum frequency found by --fmax')
+  parser.add_argument('--probes', type=int, default=1, metavar='N', help='frequencies synthesized in parallel in every round of a search')
+  parser.add_argument('--rounds', type=int, default=8, metavar='N', help='maximum number of rounds of a search')
+  args = parser.parse_args()
+  tool = SYNTHESIS_TOOLS[args.tool](args.database_folder)
+  if args.fmax and not tool.frequency_constraint:
+    parser.error('--fmax needs a frequency constraint, only available with ' + ', '.join(sorted([n for n, t in SYNTHESIS_TOOLS.items() if t.frequency_constraint])))
+  test_ids = read_configurations(args.csv_file)
+  if args.test:
+    test_ids = [t for t in test_ids if t in args.test]
+  jobs = farm_jobs(tool, test_ids, args.target)
+  if not jobs:
+    parser.error('no configuration or target selected, the targets of %s are: %s' % (args.tool, ', '.join([t for t, _ in tool.targets])))
+  print('*****************************************\n')
+  if args.fmax:
+    print('Searching the maximum frequency of %d configurations and targets between %g and %g MHz with %d parallel %s processes\n' %
+          (len(jobs), args.range[0], args.range[1], args.jobs, args.tool))
+  else:
+    print('Running %d synthesis jobs (%d configurations, %d targets) with %d parallel %s processes\n' %
+          (len(jobs), len(set([j['TestId'] for j in jobs])), len(set([j['Target'] for j in jobs])), max(1, min(args.jobs, len(jobs))), args.tool))
+  start = time.time()
+  farm = SynthesisFarm(tool)
+  search = (args.range[0], args.range[1], args.tolerance, max(1, args.probes), args.rounds) if args.fmax else None
+  results = farm.run(jobs, args.jobs, search)
+  farm.write_report(jobs)
+  farm.database.close()
+  passed = len([j for j in jobs if results.get(j['Job']) == 'passed'])
+  failed = len([j for j in jobs if results.get(j['Job']) == 'failed'])
+  print('\n**************** Synthesis finished *******************')
+  print('Passed: %d  Failed: %d  Errors: %d  Total time: %.1f s' % (passed, failed, len(jobs) - passed - failed, time.time() - start))
+  print('**** Farm report has been written to ' + os.path.join('synthesis', 'syn_scripts', tool.name, 'report', 'farm_report.txt'))
+  if args.fmax:
+    print('**** Maximum frequencies have been written to ' + os.path.join('synthesis', 'syn_scripts', tool.name, 'report', 'fmax_report.txt'))
+  print('*******************************************************')
+  if passed != len(jobs):
+    sys.exit(1)
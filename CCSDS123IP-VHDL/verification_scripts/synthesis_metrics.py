@@ -0,0 +1,488 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+
+# Metrics of the synthesis runs (SQLite, synthesis/synthesis_results.db), parsed from the reports of
+# every synthesis tool. The results of synthesis_farm.py are added as soon as every job finishes;
+# the reports of the serial flows are added with the import command.
+#
+# The reports are read from the report folder of the tool (synthesis/syn_scripts/<tool>/report),
+# with the names given to them by synthesis_farm.py (and by the serial flows of Synplify, Design
+# Compiler and NanoXmap):
+#   synplify  <Target>_<TestId>_synplify.srr: Performance Summary (estimated frequency and slack of
+#             every clock) and Resource Usage Report (LUTs or core/combinational cells, register
+#             bits or sequential cells, block RAMs, DSP48/MACC blocks), and
+#             <Target>_<TestId>_synplify_fpga_mapper_area_report.xml (usage per instance: rows of
+#             the table, nested for the sub-instances, with the columns named as in AREA_COLUMNS)
+#   ise       <Target>_<TestId>_ise.syr: Device utilization summary and Timing Summary (minimum period)
+#   vivado    <Target>_<TestId>_vivado_hierarchy.rpt (report_utilization -hierarchical) and
+#             <Target>_<TestId>_vivado_timing.rpt (report_timing_summary with the clocks constrained
+#             to FREQUENCY, or to the frequency of the probe of a maximum frequency search, see
+#             synthesis_farm.py)
+#   dc        <TestId>/ccsds123_top.mapped.qor.rpt (critical path slack and clock period,
+#             sequential cells, macros) and <TestId>/ccsds123_top.mapped.area.rpt (total and
+#             hierarchical cell area)
+#   brave     <TestId>/<tech>_*.rpt and *.timing (resource tables and maximum frequency), where <tech>
+#             is the technology of the target (NG-MEDIUM for NX1H35S, NG-LARGE for NX1H140TSP)
+# Every result holds the estimated Fmax (MHz) and worst slack (ns) and the LUTs, flip-flops, block
+# RAMs (36 kb equivalents for Xilinx) and DSP blocks, or the cell area for Design Compiler; the
+# metrics not found in the reports are left empty. The usage of every instance of the hierarchy is
+# kept too where the reports have it (Synplify, Vivado and Design Compiler; the reports of ISE and
+# NanoXmap read here have no usage per instance).
+# The results are keyed by the configuration hash of the premap parameter package (the digest of
+# the generated ccsds123_parameters.vhd, as the ConfigHash of test_manifest.csv), the device (target
+# of the tool) and the tool: a new synthesis of the same configuration replaces the previous one.
+# They also hold the frequency constraint of the synthesis and, for the results of a maximum
+# frequency search (synthesis_farm.py --fmax, see fmax_search.py), the highest constraint met: the
+# achieved Fmax, which replaces the estimated one in the comparisons.
+# The architecture (bip, bip-mem, bsq, bil or bil-mem) and a throughput estimation in Msamples/s are
+# kept too: the achieved (or else estimated) Fmax over the nominal clock cycles per sample of the
+# architecture (SAMPLE_CYCLES), to compare the architectures by throughput per area. The BIP
+# architectures are pipelined across the bands and take a sample every clock cycle; BSQ and BIL take
+# the next sample of the same band, which waits for the weight update of the previous one: the
+# cycles of the loop from the dot product to the weight update (CYCLES_MAC_WEIGHT of
+# ccsds123_constants.vhd, 6 plus the height of the adder tree of the Cz products). Stalls of the
+# AHB bus (-mem architectures) and of the output are not counted. The bound of the simulated time
+# (runtime_model.BOUND_CYCLES) is a pessimistic worst case, not used here.
+#
+# Queries:
+#   list       every result, by device and architecture
+#   compare    per device and architecture: number of configurations, best (achieved or estimated)
+#              Fmax, mean usage and the configuration with the highest throughput per 1000 LUTs
+#              (per 1000 area units for DC)
+#   hierarchy  usage per instance of a configuration (-t) and device (--device)
+#   import     parse the reports of a tool (--tool) for the configurations of a *.csv file (--csv)
+#
+# Some command line examples:
+# synthesis_metrics.py ../ import --tool synplify --csv synthesis_params_123_e.csv
+# synthesis_metrics.py ../ list
+# synthesis_metrics.py ../ compare
+# synthesis_metrics.py ../ compare --device RT4G4150
+# synthesis_metrics.py ../ hierarchy -t 01_teletel --device ZC706
+
+#How to run this script
+#  synthesis_metrics.py
+#(1) path to the IP core database
+#(2) query: list, compare, hierarchy or import
+#--tool     synthesis tool of import: synplify, ise, vivado, dc or brave
+#--csv      *.csv file with the configurations of import
+#--device   only the results of this device (list, compare, hierarchy)
+#-t, --test configuration of hierarchy
+#
+# Module usage (see synthesis_farm.py):
+#   database = synthesis_metrics.SynthesisDatabase(database_folder)
+#   metrics, hierarchy = synthesis_metrics.parse_reports(tool_name, tool_folder, test_id, target, frequency)
+#   database.add(tool_name, test_id, target, metrics, hierarchy)
+#   database.close()
+
+from __future__ import print_function
+import os, re, csv, glob, hashlib, sqlite3, argparse, threading
+from xml.etree import ElementTree
+import runtime_model
+from memory_estimator import log2_floor, ceil
+from results_db import now, git_revision
+
+DATABASE_FILE = 'synthesis_results.db'
+# Clock frequency (MHz) requested to the tools, also the default constraint of the Vivado timing reports
+FREQUENCY = 150
+# Metrics of a synthesis result and of every instance of its hierarchy, columns of the tables
+METRICS = ['fmax_mhz', 'slack_ns', 'luts', 'ffs', 'brams', 'dsps', 'area']
+USAGE = ['luts', 'ffs', 'brams', 'dsps', 'area']
+SCHEMA = ['CREATE TABLE IF NOT EXISTS synthesis (config_hash TEXT, device TEXT, tool TEXT, test_id TEXT, architecture TEXT, '
+          'finished TEXT, revision TEXT, ' + ', '.join([m + ' REAL' for m in METRICS]) + ', msps REAL, '
+          'requested_mhz REAL, achieved_mhz REAL, PRIMARY KEY (config_hash, device, tool))',
+          'CREATE TABLE IF NOT EXISTS hierarchy (config_hash TEXT, device TEXT, tool TEXT, instance TEXT, ' +
+          ', '.join([m + ' REAL' for m in USAGE]) + ')',
+          'CREATE INDEX IF NOT EXISTS hierarchy_result ON hierarchy (config_hash, device, tool)']
+DC_DESIGN = 'ccsds123_top'
+# Columns of the Synplify area report of every usage metric (names depend on the family of the part)
+AREA_COLUMNS = [('luts', r'LUT|Core Cells|Combinational'), ('ffs', r'Reg|Flip|Sequential|SLE|DFF'),
+                ('brams', r'RAM'), ('dsps', r'DSP|MACC|Math')]
+# NanoXpore targets (device key of the results) and technology prefixing their reports
+BRAVE_TARGETS = [('NX1H35S', 'NG-MEDIUM'), ('NX1H140TSP', 'NG-LARGE')]
+# Nominal clock cycles per sample of every architecture: fixed cycles and cycles per level of the
+# adder tree of the dot product (see throughput)
+SAMPLE_CYCLES = {'bip': (1, 0), 'bip-mem': (1, 0), 'bsq': (6, 1), 'bil': (6, 1), 'bil-mem': (6, 1)}
+
+def read_file(file_name):
+  if not file_name or not os.path.exists(file_name):
+    return ''
+  file_handle = open(file_name, 'r')
+  text = file_handle.read()
+  file_handle.close()
+  return text
+
+def first(patterns, text, flags=re.MULTILINE):
+  # Value of the first group of the first match of the first matching pattern (a pattern or a list of
+  # alternatives, in order of preference), as a number (None without match)
+  for pattern in ([patterns] if isinstance(patterns, str) else patterns):
+    match = re.search(pattern, text, flags)
+    if match:
+      return float(match.group(1))
+  return None
+
+def total(pattern, text, flags=re.MULTILINE):
+  # Sum of the first group of all the matches of pattern (None without match)
+  values = [float(v) for v in re.findall(pattern, text, flags)]
+  return sum(values) if values else None
+
+def fmax_from_slack(period, slack):
+  if period is None or slack is None or period - slack <= 0:
+    return None
+  return 1000.0 / (period - slack)
+
+def parse_synplify_area(xml_file):
+  # Usage per instance of the mapper area report: a header row of column names and a row per
+  # instance, whose first cell is the instance name, with the rows of its sub-instances nested in it
+  try:
+    root = ElementTree.fromstring(read_file(xml_file))
+  except ElementTree.ParseError:
+    return []
+  def cells(element):
+    return [(c.text or '').strip() for c in element if not c.tag.lower().endswith('row')]
+  headers = [e for e in root.iter() if 'header' in e.tag.lower()]
+  header = cells(headers[0]) if headers else []
+  hierarchy = []
+  def visit(element, path):
+    for row in [e for e in element if e.tag.lower().endswith('row')]:
+      values = cells(row)
+      if not header:
+        header.extend(values)
+        continue
+      if not values:
+        continue
+      usage = {}
+      for name, pattern in AREA_COLUMNS:
+        columns = [i for i, h in enumerate(header) if i > 0 and re.search(pattern, h, re.IGNORECASE)]
+        numbers = [values[i] for i in columns if i < len(values) and re.match(r'^[\d.]+$', values[i])]
+        usage[name] = float(numbers[0]) if numbers else None
+      hierarchy.append(('/'.join(path + [values[0]]), usage))
+      visit(row, path + [values[0]])
+  for table in [root] + [e for e in root.iter() if e is not root]:
+    if [e for e in table if e.tag.lower().endswith('row')]:
+      visit(table, [])
+      break
+  return hierarchy
+
+def parse_synplify(srr_file, area_file=None):
+  text = read_file(srr_file)
+  metrics = {}
+  # Performance Summary: clock, requested and estimated frequency, requested and estimated period, slack
+  clocks = re.findall(r'^\S+\s+[\d.]+\s*MHz\s+([\d.]+)\s*MHz\s+[\d.]+\s+[\d.]+\s+(-?[\d.]+)', text, re.MULTILINE)
+  if clocks:
+    metrics['fmax_mhz'] = min([float(f) for f, s in clocks])
+    metrics['slack_ns'] = min([float(s) for f, s in clocks])
+  worst = first(r'Worst slack in design:\s*(-?[\d.]+)', text)
+  if worst is not None:
+    metrics['slack_ns'] = worst
+  # Resource Usage Report, whose lines depend on the family of the part
+  metrics['luts'] = first([r'Total\s+LUTs:\s*(\d+)', r'Core Cells\s*:\s*(\d+)', r'Combinational Cells:\s*(\d+)'], text)
+  metrics['ffs'] = first([r'Register bits not including I/Os:\s*(\d+)', r'^SLE\s+(\d+)\s+uses', r'Sequential Cells:\s*(\d+)'], text)
+  metrics['brams'] = total(r'Block Rams \(RAMB36\w*\)\s*:\s*(\d+)', text)
+  ramb18 = total(r'Block Rams \(RAMB18\w*\)\s*:\s*(\d+)', text)
+  if ramb18 is not None:
+    metrics['brams'] = (metrics['brams'] or 0) + ramb18 / 2.0
+  if metrics['brams'] is None:
+    metrics['brams'] = total(r'Block Rams \((?!RAMB)[^)]*\)\s*:\s*(\d+)', text)
+  metrics['dsps'] = first([r'DSP48\w*s?:\s*(\d+)', r'MACC\s*:\s*(\d+)', r'DSP Blocks:\s*(\d+)'], text)
+  return metrics, parse_synplify_area(area_file)
+
+def parse_ise(syr_file):
+  text = read_file(syr_file)
+  metrics = {'luts': first(r'Number of Slice LUTs:\s*(\d+)', text),
+             'ffs': first(r'Number of Slice Registers:\s*(\d+)', text),
+             'brams': first(r'Number of Block RAM/FIFO:\s*(\d+)', text),
+             'dsps': first(r'Number of DSP48\w*:\s*(\d+)', text),
+             'fmax_mhz': first(r'Maximum Frequency:\s*([\d.]+)\s*MHz', text)}
+  metrics['slack_ns'] = first(r'Slack:\s*(-?[\d.]+)\s*ns', text)
+  return metrics, []
+
+def table_rows(text, header_word):
+  # Rows of the first |-separated table whose header row contains header_word: list of cell lists,
+  # header first; the cells keep their leading spaces (indentation of the hierarchy)
+  rows = []
+  for line in text.splitlines():
+    if line.startswith('|'):
+      cells = [c.rstrip() for c in line.strip().strip('|').split('|')]
+      if rows or header_word in line:
+        rows.append(cells)
+    elif rows and not line.startswith('+'):
+      break
+  return rows
+
+def parse_vivado(hierarchy_file, timing_file, frequency=FREQUENCY):
+  metrics = {}
+  hierarchy = []
+  rows = table_rows(read_file(hierarchy_file), 'Instance')
+  if rows:
+    header = [c.strip() for c in rows[0]]
+    columns = {'luts': 'Total LUTs', 'ffs': 'FFs', 'dsps': 'DSP48 Blocks'}
+    path = []
+    for cells in rows[1:]:
+      instance = cells[0][1:] if cells[0].startswith(' ') else cells[0]
+      depth = (len(instance) - len(instance.lstrip())) // 2
+      path = path[:depth] + [instance.strip()]
+      values = dict(zip(header, [c.strip() for c in cells]))
+      usage = {}
+      for name, column in columns.items():
+        usage[name] = float(values[column]) if re.match(r'^[\d.]+$', values.get(column, '')) else None
+      ramb36 = float(values.get('RAMB36', 0) or 0)
+      ramb18 = float(values.get('RAMB18', 0) or 0)
+      usage['brams'] = ramb36 + ramb18 / 2.0
+      hierarchy.append(('/'.join(path), usage))
+    if hierarchy:
+      metrics.update(hierarchy[0][1])
+  # Design Timing Summary: the first value under WNS(ns) is the worst slack
+  lines = read_file(timing_file).splitlines()
+  for n, line in enumerate(lines):
+    if 'WNS(ns)' in line:
+      for value_line in lines[n + 1:n + 4]:
+        values = value_line.split()
+        if values and re.match(r'^-?[\d.]+$', values[0]):
+          metrics['slack_ns'] = float(values[0])
+          metrics['fmax_mhz'] = fmax_from_slack(1000.0 / frequency, metrics['slack_ns'])
+          break
+      break
+  return metrics, hierarchy
+
+def parse_dc(report_folder):
+  qor = read_file(os.path.join(report_folder, DC_DESIGN + '.mapped.qor.rpt'))
+  area = read_file(os.path.join(report_folder, DC_DESIGN + '.mapped.area.rpt'))
+  slack = first(r'Critical Path Slack:\s*(-?[\d.]+)', qor)
+  metrics = {'slack_ns': slack, 'fmax_mhz': fmax_from_slack(first(r'Critical Path Clk Period:\s*([\d.]+)', qor), slack),
+             'ffs': first(r'Sequential Cell Count:\s*(\d+)', qor), 'brams': first(r'Macro Count:\s*(\d+)', qor),
+             'area': first(r'Total cell area:\s*([\d.]+)', area)}
+  # Hierarchical area distribution: the rows follow the dashed line under the column titles
+  hierarchy = []
+  started = False
+  for line in area.splitlines():
+    if re.match(r'^-+\s+-+', line):
+      started = True
+      continue
+    if started:
+      fields = line.split()
+      if len(fields) < 2 or line.startswith('-') or fields[0] == 'Total':
+        if hierarchy:
+          break
+        continue
+      if re.match(r'^[\d.]+$', fields[1]):
+        hierarchy.append((fields[0], {'area': float(fields[1])}))
+  return metrics, hierarchy
+
+def parse_brave(report_folder, technology):
+  text = ''
+  for file_name in sorted(glob.glob(os.path.join(report_folder, technology + '_*'))):
+    text += read_file(file_name) + '\n'
+  # Resource tables: | <resource> | <used> [/ <available> (<percent>)] |
+  metrics = {'luts': first([r'^\|\s*4-LUT\s*\|\s*(\d+)', r'^\|\s*LUT\w*\s*\|\s*(\d+)'], text),
+             'ffs': first(r'^\|\s*DFF\s*\|\s*(\d+)', text),
+             'brams': first(r'^\|\s*RAM\s*\|\s*(\d+)', text),
+             'dsps': first(r'^\|\s*DSP\s*\|\s*(\d+)', text),
+             'fmax_mhz': first(r'(?:Fmax|Max(?:imum)? frequency)\s*[:=|]?\s*([\d.]+)\s*MHz', text, re.MULTILINE | re.IGNORECASE),
+             'slack_ns': first(r'(?:Worst|Minimum) slack\s*[:=|]?\s*(-?[\d.]+)', text, re.MULTILINE | re.IGNORECASE)}
+  return metrics, []
+
+def parse_reports(tool, tool_folder, test_id, target, frequency=None):
+  # Metrics and hierarchy ([(instance, usage)]) of a synthesis of test_id for target; frequency:
+  # clock constraint (MHz) of the synthesis when it is not FREQUENCY
+  report_folder = os.path.join(tool_folder, 'report')
+  prefix = os.path.join(report_folder, target + '_' + test_id)
+  if tool == 'synplify':
+    return parse_synplify(prefix + '_synplify.srr', prefix + '_synplify_fpga_mapper_area_report.xml')
+  elif tool == 'ise':
+    return parse_ise(prefix + '_ise.syr')
+  elif tool == 'vivado':
+    return parse_vivado(prefix + '_vivado_hierarchy.rpt', prefix + '_vivado_timing.rpt', frequency or FREQUENCY)
+  elif tool == 'dc':
+    return parse_dc(os.path.join(report_folder, test_id))
+  elif tool == 'brave':
+    return parse_brave(os.path.join(report_folder, test_id), dict(BRAVE_TARGETS).get(target, target))
+  raise ValueError('Unknown synthesis tool ' + tool)
+
+def report_targets(tool, tool_folder, test_id):
+  # Targets with reports of test_id in the report folder of the tool
+  report_folder = os.path.join(tool_folder, 'report')
+  if tool == 'dc':
+    return ['dc'] if os.path.isdir(os.path.join(report_folder, test_id)) else []
+  if tool == 'brave':
+    logs = glob.glob(os.path.join(report_folder, test_id, 'general_*.log'))
+    targets = dict([(technology, target) for target, technology in BRAVE_TARGETS])
+    technologies = [os.path.basename(f)[len('general_'):-len('.log')] for f in logs]
+    return sorted([targets.get(technology, technology) for technology in technologies])
+  suffix = {'synplify': '_synplify.srr', 'ise': '_ise.syr', 'vivado': '_vivado_hierarchy.rpt'}[tool]
+  files = glob.glob(os.path.join(report_folder, '*_' + test_id + suffix))
+  return sorted([os.path.basename(f)[:-len('_' + test_id + suffix)] for f in files])
+
+def parameters_file(database_folder, test_id):
+  return os.path.join(database_folder, 'synthesis', 'premap_parameters', test_id, 'ccsds123_parameters.vhd')
+
+def config_hash(file_name):
+  # Digest of the parameter package without its TEST comment, as run_vhdl_tests_123.py computes the
+  # ConfigHash of test_manifest.csv
+  digest = hashlib.sha1(b'ccsds123\n')
+  for line in read_file(file_name).splitlines():
+    if not line.startswith('-- TEST:'):
+      digest.update((line.strip() + '\n').encode('latin-1'))
+  return digest.hexdigest()[:12]
+
+def throughput(constants, fmax):
+  # Estimated Msamples/s at fmax: nominal cycles per sample of the architecture (SAMPLE_CYCLES)
+  if fmax is None:
+    return None
+  cz = (0 if runtime_model.integer(constants, 'PREDICTION_GEN') == 1 else 3) + runtime_model.integer(constants, 'P_MAX')
+  height_tree = log2_floor(ceil(cz, 2)) + 1
+  fixed, per_level = SAMPLE_CYCLES[runtime_model.architecture(constants)]
+  return fmax / (fixed + per_level * height_tree)
+
+class SynthesisDatabase(object):
+  def __init__(self, database_folder):
+    self.database_folder = os.path.abspath(database_folder)
+    # The results are added by the worker threads of synthesis_farm.py
+    self.connection = sqlite3.connect(os.path.join(self.database_folder, 'synthesis', DATABASE_FILE), check_same_thread=False)
+    for statement in SCHEMA:
+      self.connection.execute(statement)
+    # Columns added after the first version of the table
+    columns = [row[1] for row in self.connection.execute('PRAGMA table_info(synthesis)').fetchall()]
+    for column in ['requested_mhz', 'achieved_mhz']:
+      if not column in columns:
+        self.connection.execute('ALTER TABLE synthesis ADD COLUMN ' + column + ' REAL')
+    self.connection.commit()
+    self.lock = threading.Lock()
+    self.revision = git_revision(self.database_folder)
+
+  def query(self, statement, values=()):
+    return self.connection.execute(statement, values).fetchall()
+
+  def add(self, tool, test_id, device, metrics, hierarchy=[], requested=None, achieved=None):
+    # Result of a synthesis, replacing the previous one of the same configuration, device and tool.
+    # requested: frequency constraint (MHz), achieved: Fmax found by a maximum frequency search
+    parameters = parameters_file(self.database_folder, test_id)
+    key = config_hash(parameters)
+    constants = runtime_model.read_constants(parameters)
+    values = (key, device, tool, test_id, runtime_model.architecture(constants), now(), self.revision) + \
+             tuple([metrics.get(m) for m in METRICS]) + (throughput(constants, achieved or metrics.get('fmax_mhz')), requested, achieved)
+    self.lock.acquire()
+    try:
+      self.connection.execute('INSERT OR REPLACE INTO synthesis (config_hash, device, tool, test_id, architecture, finished, revision, ' +
+                              ', '.join(METRICS) + ', msps, requested_mhz, achieved_mhz) VALUES (' + ', '.join(['?'] * len(values)) + ')', values)
+      self.connection.execute('DELETE FROM hierarchy WHERE config_hash = ? AND device = ? AND tool = ?', (key, device, tool))
+      for instance, usage in hierarchy:
+        self.connection.execute('INSERT INTO hierarchy (config_hash, device, tool, instance, ' + ', '.join(USAGE) + ') VALUES (' +
+                                ', '.join(['?'] * (4 + len(USAGE))) + ')', (key, device, tool, instance) + tuple([usage.get(m) for m in USAGE]))
+      self.connection.commit()
+    finally:
+      self.lock.release()
+
+  def close(self):
+    self.connection.close()
+
+def import_reports(database, tool, configurations):
+  # Adds the results of the reports of a tool for the given configurations; returns their number
+  tool_folder = os.path.join(database.database_folder, 'synthesis', 'syn_scripts', 'VIVADO' if tool == 'vivado' else tool)
+  count = 0
+  for test_id in configurations:
+    for target in report_targets(tool, tool_folder, test_id):
+      metrics, hierarchy = parse_reports(tool, tool_folder, test_id, target)
+      database.add(tool, test_id, target, metrics, hierarchy)
+      count += 1
+  return count
+
+def results(database, device=None):
+  condition = '' if device is None else ' WHERE device = ?'
+  return database.query('SELECT device, tool, architecture, test_id, config_hash, ' + ', '.join(METRICS) + ', msps, requested_mhz, achieved_mhz FROM synthesis' + condition +
+                        ' ORDER BY device, architecture, test_id', () if device is None else (device,))
+
+def throughput_per_area(row):
+  # Msamples/s per 1000 LUTs, or per 1000 units of cell area (Design Compiler)
+  metrics = dict(zip(METRICS + ['msps'], row[5:]))
+  size = metrics['luts'] or metrics['area']
+  if metrics['msps'] is None or not size:
+    return None
+  return 1000.0 * metrics['msps'] / size
+
+def compare(database, device=None):
+  # Per device, tool and architecture: (device, tool, architecture, configurations, best Fmax, mean
+  # of every usage metric, best throughput per area, its TestId)
+  groups = {}
+  for row in results(database, device):
+    groups.setdefault(row[0:3], []).append(row)
+  comparison = []
+  for (device, tool, architecture), rows in sorted(groups.items()):
+    fmax = [r[14] or r[5] for r in rows if (r[14] or r[5]) is not None]
+    means = []
+    for m in USAGE:
+      values = [r[5 + METRICS.index(m)] for r in rows if r[5 + METRICS.index(m)] is not None]
+      means.append(sum(values) / len(values) if values else None)
+    ranked = sorted([(throughput_per_area(r), r[3]) for r in rows if throughput_per_area(r) is not None], reverse=True)
+    best = ranked[0] if ranked else (None, '-')
+    comparison.append((device, tool, architecture, len(rows), max(fmax) if fmax else None) + tuple(means) + best)
+  return comparison
+
+def hierarchy(database, test_id, device=None):
+  condition = '' if device is None else ' AND synthesis.device = ?'
+  return database.query('SELECT synthesis.device, synthesis.tool, hierarchy.instance, ' + ', '.join(['hierarchy.' + m for m in USAGE]) +
+                        ' FROM hierarchy JOIN synthesis ON synthesis.config_hash = hierarchy.config_hash AND synthesis.device = hierarchy.device'
+                        ' AND synthesis.tool = hierarchy.tool WHERE synthesis.test_id = ?' + condition + ' ORDER BY synthesis.device, hierarchy.rowid',
+                        (test_id,) if device is None else (test_id, device))
+
+def value(number, format='%.0f'):
+  return '-' if number is None else format % number
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Query the database of synthesis results or add the results parsed from the reports of a tool')
+  parser.add_argument('database_folder', help='path to the IP core database')
+  parser.add_argument('query', choices=['list', 'compare', 'hierarchy', 'import'], help='query')
+  parser.add_argument('--tool', choices=['synplify', 'ise', 'vivado', 'dc', 'brave'], help='synthesis tool (import)')
+  parser.add_argument('--csv', help='*.csv file with the configurations (import)')
+  parser.add_argument('--device', help='only the results of this device')
+  parser.add_argument('-t', '--test', help='configuration (hierarchy)')
+  args = parser.parse_args()
+  if args.query == 'import' and not (args.tool and args.csv):
+    parser.error('import needs --tool and --csv')
+  if args.query == 'hierarchy' and not args.test:
+    parser.error('hierarchy needs -t')
+  database = SynthesisDatabase(args.database_folder)
+  if args.query == 'import':
+    csv_handle = open(args.csv, 'r')
+    configurations = [row[0] for row in list(csv.reader(csv_handle, delimiter=','))[2:] if row and row[0].strip()]
+    csv_handle.close()
+    print('%d results added to ' % import_reports(database, args.tool, configurations) + DATABASE_FILE)
+  elif args.query == 'list':
+    print('Device       Tool      Arch     TestId                 Constraint  Fmax (MHz)  Slack (ns)  Achieved     LUTs      FFs  BRAMs  DSPs        Area   MS/s')
+    for row in results(database, args.device):
+      device, tool, architecture, test_id, key, fmax, slack, luts, ffs, brams, dsps, area, msps, requested, achieved = row
+      print('%-12s %-9s %-8s %-22s %10s  %10s  %10s  %8s  %7s  %7s  %5s  %4s  %10s  %5s' % (device, tool, architecture, test_id, value(requested, '%.1f'),
+            value(fmax, '%.1f'), value(slack, '%.3f'), value(achieved, '%.1f'), value(luts), value(ffs), value(brams, '%g'), value(dsps), value(area),
+            value(msps, '%.2f')))
+  elif args.query == 'compare':
+    print('Device       Tool      Arch     Configs  Best Fmax    Mean LUTs   Mean FFs  BRAMs  DSPs   Mean area   Best MS/s per k  (TestId)')
+    for row in compare(database, args.device):
+      device, tool, architecture, count, fmax, luts, ffs, brams, dsps, area, best, test_id = row
+      print('%-12s %-9s %-8s %7d  %9s  %11s  %9s  %5s  %4s  %10s  %15s  (%s)' % (device, tool, architecture, count, value(fmax, '%.1f'),
+            value(luts), value(ffs), value(brams, '%.1f'), value(dsps, '%.1f'), value(area), value(best, '%.3f'), test_id))
+  else:
+    print('Device       Tool      Instance                                               LUTs      FFs   BRAMs  DSPs        Area')
+    for device, tool, instance, luts, ffs, brams, dsps, area in hierarchy(database, args.test, args.device):
+      print('%-12s %-9s %-50s %9s  %7s  %6s  %4s  %10s' % (device, tool, instance, value(luts), value(ffs), value(brams, '%g'), value(dsps), value(area)))
+  database.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Time-budgeted selection of the generated tests, used by sim_runner.py --budget and runnable as a
+# script to write a serial all_tests.do for the selection (tb_scripts/budget_tests.do).
+#
+# The duration of every test is its last simulation time or, for tests never simulated, the
+# prediction of the runtime model fitted on the measured times (see runtime_model.py).
+# Tests are taken while they fit in the budget with the given number of parallel simulator processes
+# (longest processing time schedule of the selection): first the test covering most features not
+# covered yet per second, until all the features are covered; then the shortest tests left. The
+# features of a test are its architecture (bip, bip-mem, bsq, bil, bil-mem), EDAC, EN_RUNCFG,
+# ENCODER_SELECTION, signedness and endianness, and every pair of architecture and other feature.
+# The selected tests are run in the order of selection, so an interrupted serial run has covered
+# most features.
+#
+# Some command line examples:
+# test_budget.py ../modelsim 20
+# test_budget.py ../modelsim 60 -j 8
+
+#How to run this script
+#  test_budget.py
+#(1) path to the modelsim folder of the IP core database (generated with run_vhdl_tests_123.py)
+#(2) time budget in minutes
+#-j, --jobs  number of parallel simulator processes (default 1: serial run with budget_tests.do)
+
+from __future__ import print_function
+import os, re, csv, argparse
+from runtime_model import durations, lpt_schedule, test_parameters, architecture
+
+# Constants of the generated parameter packages giving the features of a test
+FEATURES = [('EDAC', 'EDAC'), ('EN_RUNCFG', 'EN_RUNCFG'), ('ENCODER_SELECTION', 'ENCODER_SELECTION_tb'),
+            ('IS_SIGNED', 'IS_SIGNED_tb'), ('ENDIANESS', 'ENDIANESS_tb')]
+
+def features(constants):
+  values = [(name, constants.get(constant)) for name, constant in FEATURES if constant in constants]
+  arch = architecture(constants)
+  return set([('architecture', arch)] + values + [(arch,) + value for value in values])
+
+def plan(modelsim_folder, tests, budget, jobs=1):
+  # Tests (manifest rows) selected for the budget in seconds, in order of selection, and the
+  # estimated duration of every test
+  duration, parameters = durations(modelsim_folder, tests)
+  test_features = dict([(t, features(parameters[t])) for t in parameters])
+  by_id = dict([(t['TestId'], t) for t in tests])
+  selected = []
+  def fits(test):
+    return lpt_schedule(dict([(t, duration[t]) for t in selected + [test]]), jobs)[1] <= budget
+  covered = set()
+  left = sorted(by_id)
+  while left:
+    gains = [t for t in left if test_features[t] - covered and fits(t)]
+    if not gains:
+      break
+    best = max(gains, key=lambda t: (len(test_features[t] - covered) / max(duration[t], 1e-3), -duration[t]))
+    selected.append(best)
+    covered |= test_features[best]
+    left.remove(best)
+  for test in sorted(left, key=lambda t: (duration[t], t)):
+    if fits(test):
+      selected.append(test)
+  return [by_id[t] for t in selected], duration
+
+def write_all_tests(tb_scripts_folder, tests, file_name='budget_tests.do'):
+  # Copy of all_tests.do running only the given tests, in their order
+  all_tests_handle = open(os.path.join(tb_scripts_folder, 'all_tests.do'), 'r')
+  text = all_tests_handle.read()
+  all_tests_handle.close()
+  blocks = list(re.finditer(r'if \$quit_flag!=true \{\n do \$SRC/modelsim/tb_scripts/(\S+)\n.*?\nputs "End of Tests[^\n]*\n', text, re.S))
+  if not blocks:
+    raise Exception('No tests found in ' + os.path.join(tb_scripts_folder, 'all_tests.do'))
+  scripts = dict([(block.group(1), block.group(0)) for block in blocks])
+  tests = [test for test in tests if test['Script'] in scripts]
+  body = ''.join([scripts[test['Script']] for test in tests])
+  # The journal start row lists the selected tests instead of all the generated ones
+  preamble = re.sub(r'(puts \$journal "start,[^,\n]*),[^,\n]*,[^,"\n]*"',
+                    lambda match: match.group(1) + ',' + ' '.join([test['TestId'] for test in tests]) + ',' + file_name + '"',
+                    text[:blocks[0].start()], 1)
+  output_handle = open(os.path.join(tb_scripts_folder, file_name), 'w')
+  output_handle.write(preamble + body + text[blocks[-1].end():])
+  output_handle.close()
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Select the generated tests that fit in a time budget')
+  parser.add_argument('modelsim_folder', help='modelsim folder of the IP core database')
+  parser.add_argument('minutes', type=float, help='time budget in minutes')
+  parser.add_argument('-j', '--jobs', type=int, default=1, help='number of parallel simulator processes')
+  args = parser.parse_args()
+  modelsim_folder = os.path.abspath(args.modelsim_folder)
+  tb_scripts_folder = os.path.join(modelsim_folder, 'tb_scripts')
+  manifest_handle = open(os.path.join(tb_scripts_folder, 'test_manifest.csv'), 'r')
+  tests = [row for row in csv.DictReader(manifest_handle)]
+  manifest_handle.close()
+  selected, duration = plan(modelsim_folder, tests, args.minutes * 60, args.jobs)
+  write_all_tests(tb_scripts_folder, selected)
+  for test in selected:
+    print('%-16s %8.1f s  %s' % (test['TestId'], duration[test['TestId']], ' '.join(['%s=%s' % f for f in sorted(features(test_parameters(modelsim_folder, test['TestId']))) if len(f) == 2])))
+  makespan = lpt_schedule(dict([(t['TestId'], duration[t['TestId']]) for t in selected]), args.jobs)[1]
+  print('%d of %d tests selected, estimated time %.1f min with %d processes' % (len(selected), len(tests), makespan / 60.0, args.jobs))
+  print('Serial run of the selection: modelsim/tb_scripts/budget_tests.do; parallel run: sim_runner.py --budget %g -j %d' % (args.minutes, args.jobs))
@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+# -*- coding: iso-8859-1 -*-
+
+# All Distribution of the Software and/or Modifications, as Source Code or Object Code,
+# must be, as a whole, under the terms of the European Space Agency Public License  v2.0.
+# If You Distribute the Software and/or Modifications as Object Code, You must:
+# (a) provide in addition a copy of the Source Code of the Software and/or
+# Modifications to each recipient; or
+# (b) make the Source Code of the Software and/or Modifications freely accessible by reasonable
+# means for anyone who possesses the Object Code or received the Software and/or Modifications
+# from You, and inform recipients how to obtain a copy of the Source Code.
+
+# The Software is provided to You on an as is basis and without warranties of any
+# kind, including without limitation merchantability, fitness for a particular purpose,
+# absence of defects or errors, accuracy or non-infringement of intellectual property
+# rights.
+# Except as expressly set forth in the "European Space Agency Public License  v2.0",
+# neither Licensor nor any Contributor shall be liable, including, without limitation, for direct, indirect,
+# incidental, or consequential damages (including without limitation loss of profit),
+# however caused and on any theory of liability, arising in any way out of the use or
+# Distribution of the Software or the exercise of any rights under this License, even
+# if You have been advised of the possibility of such damages.
+#
+
+# Some command line examples:
+# vhdl_deps.py ../modelsim
+# vhdl_deps.py ../modelsim HEAD~3
+
+#How to run this script
+#  vhdl_deps.py
+#(1) path to the modelsim folder of the IP core database, with the scripts generated by run_vhdl_tests_123.py
+#(2) git revision to compare the sources with (optional, HEAD by default: uncommitted changes)
+#
+# Lightweight VHDL dependency analysis of the units compiled by the generated simulation scripts.
+# Every source file is scanned (comments removed, case insensitive) for the design units it declares,
+# its use clauses, expanded names (lib.pkg.item), entity and component instantiations, the if/for
+# generate statements around them and their generic maps.
+# - Static dependencies (any instantiation or use, whatever the generics) give the units that have to
+#   be recompiled when a file changes (used by compile_cache.py).
+# - Starting from the testbench, the design hierarchy of a test is elaborated with the constants of
+#   its generated parameter packages: generic maps and defaults are evaluated and if-generate
+#   conditions that are false are not followed (e.g. predictor_shyloc(arch_bsq) is only reached with
+#   PREDICTION_TYPE = 2). Expressions that can not be evaluated (function calls, unknown names) are
+#   taken as true, so the set of files of a test may be larger than needed but never smaller.
+# Run as a script, it lists the tests and units affected by the files changed since a git revision.
+
+from __future__ import print_function
+import sys, os, re, io, subprocess, threading
+
+# Identifiers that can precede "generic map" / "port map" without being a component name
+RESERVED = set(['entity', 'component', 'configuration', 'block', 'process', 'if', 'for', 'generate', 'begin', 'end'])
+
+def strip_comments(text):
+  return re.sub(r'--[^\n]*', '', text)
+
+def matching_parenthesis(text, start):
+  # Index of the parenthesis closing the one at text[start]
+  depth = 0
+  for i in range(start, len(text)):
+    if text[i] == '(':
+      depth += 1
+    elif text[i] == ')':
+      depth -= 1
+      if depth == 0:
+        return i
+  return len(text)
+
+def split_top(text, separator):
+  # Splits text by separator, ignoring the separators inside parentheses
+  parts = []
+  depth = 0
+  current = ''
+  for c in text:
+    if c == '(':
+      depth += 1
+    elif c == ')':
+      depth -= 1
+    if c == separator and depth == 0:
+      parts.append(current)
+      current = ''
+    else:
+      current += c
+  parts.append(current)
+  return parts
+
+TOKEN = re.compile(r'\d+#[0-9a-f_]+#|\d+(?:\.\d+)?|[a-z]\w*(?:\.\w+)*|/=|<=|>=|\*\*|[=<>()+\-*/,]|\S')
+OPERATORS = {'=': '==', '/=': '!=', '/': '//', 'mod': '%', 'rem': '%', 'and': 'and', 'or': 'or', 'not': 'not',
+             'xor': '!=', 'true': 'True', 'false': 'False', 'abs': 'abs'}
+
+def evaluate(expression, lookup):
+  # Value (integer or boolean) of a VHDL static expression, or None if it can not be evaluated.
+  # lookup(name) gives the value of a (possibly expanded) name, or None
+  tokens = TOKEN.findall(expression.strip())
+  python = []
+  for i, token in enumerate(tokens):
+    if token in OPERATORS:
+      python.append(OPERATORS[token])
+    elif re.match(r'^\d+#[0-9a-f_]+#$', token):
+      base, digits = token[:-1].split('#')
+      python.append(str(int(digits.replace('_', ''), int(base))))
+    elif re.match(r'^\d+$', token):
+      python.append(token)
+    elif re.match(r'^[a-z]', token):
+      if i + 1 < len(tokens) and tokens[i + 1] == '(':
+        return None
+      value = lookup(token)
+      if value is None:
+        return None
+      python.append(str(value))
+    elif token in ['(', ')', '+', '-', '*', '**', '<', '>', '<=', '>=']:
+      python.append(token)
+    else:
+      return None
+  if not python:
+    return None
+  try:
+    value = eval(' '.join(python), {'__builtins__': {'abs': abs}}, {})
+  except Exception:
+    return None
+  if isinstance(value, bool) or isinstance(value, int):
+    return value
+  return None
+
+class Architecture(object):
+  def __init__(self, name, entity, text):
+    self.name = name
+    self.entity = entity
+    # Constants declared in the architecture, in order
+    self.constants = re.findall(r'\bconstant\s+(\w+)\s*:[^;]*?:=\s*([^;]+);', text)
+    # Instantiations: (conditions, library or None, unit name, architecture or None, generic map, is_entity)
+    self.instances = []
+    conditions = []
+    pattern = re.compile(r'(\w+)\s*:\s*if\b([^;]*?)\bgenerate\b|(\w+)\s*:\s*for\b[^;]*?\bgenerate\b|\bend\s+generate\b|'
+                         r'(\w+)\s*:\s*entity\s+(\w+)\.(\w+)\s*(?:\(\s*(\w+)\s*\))?|'
+                         r'(\w+)\s*:\s*(?:component\s+)?(\w+)\s+(?:generic|port)\s+map\b')
+    for match in pattern.finditer(text):
+      if match.group(1):
+        conditions.append(match.group(2))
+      elif match.group(3):
+        conditions.append('true')
+      elif match.group(0).startswith('end'):
+        if conditions:
+          conditions.pop()
+      elif match.group(4):
+        generic_map = self.generic_map(text, match.end())
+        self.instances.append((list(conditions), match.group(5), match.group(6), match.group(7), generic_map, True))
+      elif not match.group(9) in RESERVED:
+        start = text.find('generic', match.end(9))
+        generic_map = {}
+        if start >= 0 and re.match(r'generic\s+map', text[start:]) and not text[match.end(9):start].strip():
+          generic_map = self.generic_map(text, match.end(9))
+        self.instances.append((list(conditions), None, match.group(9), None, generic_map, False))
+
+  def generic_map(self, text, position):
+    # Named associations of the generic map starting at position (if any)
+    match = re.match(r'\s*generic\s+map\s*\(', text[position:])
+    if not match:
+      return {}
+    start = position + match.end() - 1
+    associations = {}
+    for association in split_top(text[start + 1:matching_parenthesis(text, start)], ','):
+      if '=>' in association:
+        formal, actual = association.split('=>', 1)
+        associations[formal.strip()] = actual.strip()
+    return associations
+
+class DesignFile(object):
+  # Design units declared and referenced in a VHDL file
+  def __init__(self, path):
+    self.path = path
+    try:
+      file_handle = io.open(path, 'r', encoding='iso-8859-1')
+      text = strip_comments(file_handle.read()).lower()
+      file_handle.close()
+    except IOError:
+      text = ''
+    self.uses = set(re.findall(r'\buse\s+(\w+)\.(\w+)\.', text))
+    # Expanded names lib.pkg.item (libraries are checked when resolving)
+    self.expanded = set(re.findall(r'\b(\w+)\.(\w+)\.\w+', text))
+    self.entities = {}
+    self.packages = {}
+    self.bodies = set()
+    self.architectures = []
+    pattern = re.compile(r'\bpackage\s+body\s+(\w+)\s+is\b|\bpackage\s+(\w+)\s+is\b|\bentity\s+(\w+)\s+is\b|\barchitecture\s+(\w+)\s+of\s+(\w+)\s+is\b')
+    matches = list(pattern.finditer(text))
+    for i, match in enumerate(matches):
+      unit_text = text[match.end():matches[i + 1].start() if i + 1 < len(matches) else len(text)]
+      if match.group(1):
+        self.bodies.add(match.group(1))
+      elif match.group(2):
+        self.packages[match.group(2)] = re.findall(r'\bconstant\s+(\w+)\s*:[^;]*?:=\s*([^;]+);', unit_text)
+      elif match.group(3):
+        self.entities[match.group(3)] = self.generics(unit_text)
+      else:
+        self.architectures.append(Architecture(match.group(4), match.group(5), unit_text))
+
+  def generics(self, text):
+    # (name, default) of the generics of an entity
+    match = re.match(r'\s*generic\s*\(', text)
+    if not match:
+      return []
+    start = match.end() - 1
+    generics = []
+    for declaration in split_top(text[start + 1:matching_parenthesis(text, start)], ';'):
+      if not ':' in declaration:
+        continue
+      names, rest = declaration.split(':', 1)
+      default = None
+      if ':=' in rest:
+        default = rest.split(':=', 1)[1].strip()
+      for name in names.replace('constant', ' ').split(','):
+        generics.append((name.strip(), default))
+    return generics
+
+_parsed = {}
+_parsed_lock = threading.Lock()
+
+def parse(path):
+  # Parsed files are shared (by path, size and modification time) by all the graphs
+  try:
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime)
+  except OSError:
+    signature = None
+  _parsed_lock.acquire()
+  try:
+    known = _parsed.get(path)
+    if known is None or known[0] != signature:
+      known = (signature, DesignFile(path))
+      _parsed[path] = known
+    return known[1]
+  finally:
+    _parsed_lock.release()
+
+class DesignGraph(object):
+  # Dependencies between the units of one compile list (compile_cache.CompileUnit), each one a
+  # source file compiled into a library
+  def __init__(self, units):
+    self.files = {}
+    self.library = {}
+    self.order = []
+    self.index = {}
+    for unit in units:
+      if unit.source in self.files:
+        continue
+      design = parse(unit.source)
+      self.files[unit.source] = design
+      self.library[unit.source] = unit.library
+      self.order.append(unit.source)
+      # Later units replace earlier ones with the same name, as when compiling in this order
+      for name in design.entities:
+        self.index[(unit.library, 'entity', name)] = unit.source
+      for name in design.packages:
+        self.index[(unit.library, 'package', name)] = unit.source
+      for name in design.bodies:
+        self.index[(unit.library, 'body', name)] = unit.source
+      for architecture in design.architectures:
+        self.index[(unit.library, 'architecture', architecture.entity, architecture.name)] = unit.source
+    self.libraries = set(self.library.values())
+    self._dependencies = None
+    self._constants = {}
+
+  def resolve(self, source, library, kind, name):
+    # File declaring the unit, from the point of view of source ('work' is the library of source)
+    if library == 'work' or library is None:
+      own = self.index.get((self.library[source], kind, name))
+      if own or library == 'work':
+        return own
+      for other in sorted(self.libraries):
+        if (other, kind, name) in self.index:
+          return self.index[(other, kind, name)]
+      return None
+    return self.index.get((library, kind, name))
+
+  def static_dependencies(self, source):
+    # Files source depends on, whatever the values of the generics
+    design = self.files[source]
+    dependencies = set()
+    for library, name in design.uses | design.expanded:
+      for kind in ['package', 'entity']:
+        found = self.resolve(source, library, kind, name)
+        if found:
+          dependencies.add(found)
+    for name in design.bodies:
+      found = self.resolve(source, 'work', 'package', name)
+      if found:
+        dependencies.add(found)
+    for architecture in design.architectures:
+      found = self.resolve(source, 'work', 'entity', architecture.entity)
+      if found:
+        dependencies.add(found)
+      for conditions, library, name, arch, generic_map, is_entity in architecture.instances:
+        found = self.resolve(source, library, 'entity', name)
+        if found:
+          dependencies.add(found)
+    dependencies.discard(source)
+    return dependencies
+
+  def dependents(self, sources):
+    # Files that have to be recompiled when sources change: the sources and every file depending on
+    # them, directly or not
+    if self._dependencies is None:
+      self._dependencies = dict((source, self.static_dependencies(source)) for source in self.order)
+    affected = set([s for s in sources if s in self.files])
+    changed = True
+    while changed:
+      changed = False
+      for source in self.order:
+        if not source in affected and self._dependencies[source] & affected:
+          affected.add(source)
+          changed = True
+    return affected
+
+  def package_constants(self, source, name):
+    # Values of the constants of a package (None when they can not be evaluated)
+    key = (source, name)
+    if not key in self._constants:
+      self._constants[key] = {}
+      values = self.visible_constants(source)
+      for constant, expression in self.files[source].packages.get(name, []):
+        values[constant] = evaluate(expression, self.lookup(source, values))
+        self._constants[key][constant] = values[constant]
+    return self._constants[key]
+
+  def visible_constants(self, source):
+    # Constants made visible in source by its use clauses
+    values = {}
+    for library, name in sorted(self.files[source].uses):
+      found = self.resolve(source, library, 'package', name)
+      if found and found != source:
+        values.update(self.package_constants(found, name))
+    return values
+
+  def lookup(self, source, values):
+    def find(name):
+      if '.' in name:
+        parts = name.split('.')
+        if len(parts) == 3:
+          found = self.resolve(source, parts[0], 'package', parts[1])
+          if found:
+            return self.package_constants(found, parts[1]).get(parts[2])
+        return None
+      return values.get(name)
+    return find
+
+  def elaborate(self, library, entity, architecture=None, generics=None, visited=None):
+    # Files needed by the instance of library.entity(architecture) with the given generic values.
+    # Without architecture, the last one compiled is used (default binding)
+    if visited is None:
+      visited = set()
+    entity_file = self.index.get((library, 'entity', entity))
+    if entity_file is None:
+      return set()
+    generics = generics or {}
+    key = (library, entity, architecture, tuple(sorted(generics.items())))
+    if key in visited:
+      return set()
+    visited.add(key)
+    files = self.package_files(entity_file, set())
+    candidates = []
+    for design_file in self.order:
+      if self.library[design_file] == library:
+        for arch in self.files[design_file].architectures:
+          if arch.entity == entity and (architecture is None or arch.name == architecture):
+            candidates.append((design_file, arch))
+    if not candidates:
+      return files
+    design_file, arch = candidates[-1]
+    files |= self.package_files(design_file, set())
+    values = self.visible_constants(design_file)
+    values.update(generics)
+    for constant, expression in arch.constants:
+      values[constant] = evaluate(expression, self.lookup(design_file, values))
+    find = self.lookup(design_file, values)
+    for conditions, inst_library, name, inst_arch, generic_map, is_entity in arch.instances:
+      if [c for c in conditions if evaluate(c, find) is False]:
+        continue
+      child_file = self.resolve(design_file, inst_library, 'entity', name)
+      if child_file is None:
+        continue
+      child_generics = {}
+      child_find = self.lookup(child_file, self.visible_constants(child_file))
+      for generic, default in self.files[child_file].entities.get(name, []):
+        if generic in generic_map:
+          child_generics[generic] = evaluate(generic_map[generic], find)
+        elif default is not None:
+          child_generics[generic] = evaluate(default, child_find)
+        else:
+          child_generics[generic] = None
+      files |= self.elaborate(self.library[child_file], name, inst_arch, child_generics, visited)
+    return files
+
+  def package_files(self, source, seen):
+    # source and the files of the packages (and package bodies) it uses, recursively
+    if source in seen:
+      return set()
+    seen.add(source)
+    files = set([source])
+    design = self.files[source]
+    for library, name in design.uses | design.expanded:
+      found = self.resolve(source, library, 'package', name)
+      if found:
+        files |= self.package_files(found, seen)
+        body = self.resolve(found, 'work', 'body', name)
+        if body:
+          files |= self.package_files(body, seen)
+    return files
+
+def read_tb_parameters(test_folder):
+  # (name, value) of the constants of the generated ccsds123_tb_parameters.vhd, in file order
+  parameters = []
+  parameters_handle = open(os.path.join(test_folder, 'ccsds123_tb_parameters.vhd'), 'r')
+  for match in re.finditer(r'constant\s+(\w+)\s*:\s*\w+\s*:=\s*([^;]*);', parameters_handle.read()):
+    parameters.append((match.group(1), match.group(2).strip()))
+  parameters_handle.close()
+  return parameters
+
+def test_files(units, top='ccsds_shyloc_tb'):
+  # Source files the simulation of a test depends on, elaborating the testbench with its parameters
+  graph = DesignGraph(units)
+  return graph.elaborate('work', top)
+
+def changed_files(revision, folder):
+  # Absolute paths of the tracked files changed since the git revision (uncommitted changes included).
+  # Untracked files are not taken into account: the generated parameter packages are not in git
+  top = subprocess.check_output(['git', 'rev-parse', '--show-toplevel'], cwd=folder).decode('utf-8').strip()
+  names = subprocess.check_output(['git', 'diff', '--name-only', revision], cwd=folder).decode('utf-8').split('\n')
+  return set([os.path.normpath(os.path.join(top, name)) for name in names if name.strip()])
+
+def affected_tests(modelsim_folder, tests, changed):
+  # Tests whose elaborated design or images use one of the changed files, and the files each one depends on
+  import compile_cache
+  tb_scripts_folder = os.path.join(modelsim_folder, 'tb_scripts')
+  variables = compile_cache.read_variables(tb_scripts_folder)
+  vendor = compile_cache.vendor_units(tb_scripts_folder, variables)
+  affected = []
+  for test in tests:
+    units = compile_cache.test_units(tb_scripts_folder, test['Script'], variables)[0]
+    files = set([os.path.normpath(f) for f in test_files(vendor + units)])
+    for name, value in read_tb_parameters(os.path.join(modelsim_folder, 'tb_stimuli', test['TestId'])):
+      if name in ['stim_file', 'ref_file']:
+        files.add(os.path.normpath(os.path.abspath(value.strip('"'))))
+    if files & changed:
+      affected.append(test)
+  return affected
+
+if __name__ == "__main__":
+  import compile_cache
+  import sim_runner
+  if len(sys.argv) < 2:
+    print('Usage: vhdl_deps.py <modelsim folder> [git revision]')
+    sys.exit(1)
+  modelsim_folder = os.path.abspath(sys.argv[1])
+  revision = 'HEAD'
+  if len(sys.argv) > 2:
+    revision = sys.argv[2]
+  changed = changed_files(revision, modelsim_folder)
+  tests = sim_runner.read_manifest(modelsim_folder)
+  affected = affected_tests(modelsim_folder, tests, changed)
+  print('*****************************************\n')
+  print('Files changed since ' + revision + ': ' + str(len(changed)))
+  print('Tests affected: ' + str(len(affected)) + ' of ' + str(len(tests)))
+  for test in affected:
+    print('  ' + test['TestId'])
+  # Units to recompile, over all the units compiled by the tests
+  tb_scripts_folder = os.path.join(modelsim_folder, 'tb_scripts')
+  variables = compile_cache.read_variables(tb_scripts_folder)
+  recompile = set()
+  for test in tests:
+    units = compile_cache.test_units(tb_scripts_folder, test['Script'], variables)[0]
+    graph = DesignGraph(units)
+    recompile |= graph.dependents([unit.source for unit in units if os.path.normpath(unit.source) in changed])
+  print('Units to recompile: ' + str(len(recompile)))
+  for source in sorted(recompile):
+    print('  ' + source)
+  print('*****************************************')